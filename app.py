@@ -1,28 +1,85 @@
 from fastapi import FastAPI, HTTPException, Request
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse, StreamingResponse
+from fastapi.responses import HTMLResponse, JSONResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from pydantic import BaseModel
-
-# Import necessary libraries to handle rate limiting
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
-from slowapi.errors import RateLimitExceeded
+from typing import Literal
 
 import os
+import signal
+import asyncio
+import logging
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 
-# Import your AI teacher class
-from src.ai_iit_teacher import IIT_Teacher
+# Import the registry that holds one long-lived AI teacher per subject
+from src.teacher_registry import TeacherRegistry
+from src.ai_iit_teacher import semantic_cache, response_cache, speculation_stats
+from src import rag_engine, metrics
+
+# Cost-aware token-bucket rate limiting, shared by all workers through Redis
+from src.rate_limiter import TokenBucketLimiter, RateLimitExceeded, client_key
+
+# The index page and static assets, held in memory with fingerprints and precompressed variants
+from src.static_assets import AssetStore
 
 load_dotenv()
 
-app = FastAPI(title="IIT JEE AI Tutor API", version="1.0.0")
+logger = logging.getLogger(__name__)
+
+# Initialize AI teachers for each subject
+api_key = os.getenv("GOOGLE_API_KEY")
+if not api_key:
+    raise Exception("Please set GOOGLE_API_KEY environment variable")
+
+teacher_registry = TeacherRegistry(api_key)
+
+def reload_config():
+    """Re-reads .env and rebuilds the model clients, e.g. after LLM_MODEL was changed."""
+    load_dotenv(override=True)
+    teacher_registry.reload()
+    logger.info("Reloaded the LLM configuration (LLM_MODEL=%s)", os.getenv("LLM_MODEL"))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Build the teachers (model client + compiled graphs) once per worker process
+    teacher_registry.start()
+    # `kill -HUP <worker pid>` applies a changed configuration without a restart
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, reload_config)
+    except (AttributeError, NotImplementedError, RuntimeError, ValueError):
+        pass  # no SIGHUP (Windows) or not in the main thread (e.g. the test client)
+    # The embedding model and vector store load lazily on first use; optionally start
+    # loading them in the background now so the first request doesn't wait for them
+    if os.getenv("RAG_WARMUP", "false").lower() == "true":
+        rag_engine.start_background_warm_up()
+    yield
+    # Hand this worker's last request counts to the hot-key ranking used by the pre-warmer
+    await response_cache.aflush_hot_keys()
+
+app = FastAPI(title="IIT JEE AI Tutor API", version="1.0.0", lifespan=lifespan)
+
+# Configure rate limiting: each client gets RATE_LIMIT_CAPACITY tokens, refilled at
+# RATE_LIMIT_REFILL_PER_MINUTE per minute; a full pipeline run costs one token and
+# cheaper answers (cache hits, casual replies, fast mode) a fraction of one
+rate_limiter = TokenBucketLimiter(
+    capacity=float(os.getenv("RATE_LIMIT_CAPACITY", "5")),
+    refill_per_minute=float(os.getenv("RATE_LIMIT_REFILL_PER_MINUTE", "5")),
+    host=os.getenv("REDIS_HOST", "localhost"),
+    port=int(os.getenv("REDIS_PORT", "6379")),
+    use_redis=os.getenv("REDIS_ENABLED", "true").lower() == "true",
+    enabled=os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true",
+)
 
-# Configure rate limiting
-limiter = Limiter(key_func=get_remote_address)
-app.state.limiter = limiter
-app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
+def rate_limit_key(request: Request) -> str:
+    """Buckets are per API key (X-API-Key, if listed in RATE_LIMIT_API_KEYS), else per IP"""
+    return client_key(request.headers.get("x-api-key"), request.client.host if request.client else None)
+
+@app.exception_handler(RateLimitExceeded)
+async def rate_limit_exceeded(request: Request, exc: RateLimitExceeded):
+    retry_after = max(1, round(exc.retry_after))
+    return JSONResponse(status_code=429, headers={"Retry-After": str(retry_after)},
+                        content={"error": f"Rate limit exceeded, try again in {retry_after} seconds"})
 
 # Enable CORS
 app.add_middleware(
@@ -33,85 +90,128 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Mount static files (CSS, JS)
-app.mount("/static", StaticFiles(directory="static"), name="static")
+# Compress JSON answers (the generated HTML can be large). Only the JSON API goes through
+# gzip: Server-Sent Events must reach the client as they are generated, and the index page
+# and static assets are precompressed. Choosing by path keeps this independent of which
+# content types the installed Starlette version excludes from compression.
+class APIGZipMiddleware(GZipMiddleware):
+    async def __call__(self, scope, receive, send):
+        path = scope.get("path", "")
+        if scope["type"] == "http" and path.startswith("/api/") and path != "/api/chat/stream":
+            await super().__call__(scope, receive, send)
+        else:
+            await self.app(scope, receive, send)
+
+app.add_middleware(APIGZipMiddleware, minimum_size=1000)
+
+# Load the index page and static files (CSS, JS) once
+assets = AssetStore(static_dir="static", template_path="templates/index.html")
 
 # Request/Response models
 class ChatRequest(BaseModel):
     message: str
     subject: str = "maths"  # default subject
+    mode: Literal["thorough", "fast"] = "thorough"  # "fast" answers with a single LLM call
 
 class ChatResponse(BaseModel):
     response: str
     status: str
 
-# Initialize AI teachers for each subject
-api_key = os.getenv("GOOGLE_API_KEY")
-if not api_key:
-    raise Exception("Please set GOOGLE_API_KEY environment variable")
-
 @app.get("/", response_class=HTMLResponse)
-async def read_index():
-    """Serve the main HTML page"""
-    with open("templates/index.html") as f:
-        html_content = f.read()
-    return HTMLResponse(content=html_content)
+async def read_index(request: Request):
+    """Serve the main HTML page from memory; browsers revalidate it with its ETag"""
+    return assets.index_response(request)
+
+@app.api_route("/static/{name:path}", methods=["GET", "HEAD"])
+async def static_file(request: Request, name: str):
+    """Serve a static asset; fingerprinted URLs (?v=...) are cached as immutable"""
+    return assets.static_response(request, name)
 
 @app.post("/api/chat", response_model=ChatResponse)
-@limiter.limit("5/minute")  # Allow max 5 requests per minute per IP
 async def chat(request: Request, chat_request: ChatRequest):
     """Handle chat requests from the frontend"""
+    if not chat_request.message.strip():
+        raise HTTPException(status_code=400, detail="Message cannot be empty")
+    # Charge the cheapest cost now (or reject with 429) and the rest once answered
+    key = rate_limit_key(request)
+    await rate_limiter.admit(key, endpoint="chat")
     try:
-        if not chat_request.message.strip():
-            raise HTTPException(status_code=400, detail="Message cannot be empty")
+        # Get the shared teacher for the subject (unknown subjects fall back to maths)
+        teacher = teacher_registry.get(chat_request.subject)
         
-        # Determine which subject teacher to use
-        subject = chat_request.subject.lower()
-        if subject not in ["maths", "physics", "chemistry"]:
-            subject = "maths"  # default fallback
-        
-        # Get response from your AI teacher
-        teacher = IIT_Teacher(subject, api_key)
-        ai_response = teacher.teach(chat_request.message)
+        # Get response from your AI teacher without blocking the event loop
+        with metrics.requests_in_flight.labels("chat").track_inprogress(), metrics.request_latency.labels("chat").time():
+            try:
+                ai_response = await teacher.ateach(chat_request.message, mode=chat_request.mode)
+            finally:
+                await rate_limiter.settle(key)
         
         return ChatResponse(
             response=ai_response,
             status="success"
         )
         
-    except Exception as e:
-        print(f"Error: {e}")  # For debugging
+    except HTTPException:
+        raise
+    except Exception:
+        metrics.request_errors.labels("chat").inc()
+        logger.exception("Chat request failed")
         raise HTTPException(status_code=500, detail="Sorry, I encountered an error. Please try again.")
 
 @app.post("/api/chat/stream")
-@limiter.limit("5/minute")
 async def chat_stream(request: Request, chat_request: ChatRequest):
     """Stream chat responses for real-time UI updates, with rate limiting and error handling."""
+    # Validate the incoming message
+    if not chat_request.message.strip():
+        raise HTTPException(status_code=400, detail="Message cannot be empty")
+    key = rate_limit_key(request)
+    await rate_limiter.admit(key, endpoint="chat_stream")
     try:
-        # Validate the incoming message
-        if not chat_request.message.strip():
-            raise HTTPException(status_code=400, detail="Message cannot be empty")
-        
-        # Determine which subject teacher to use
-        subject = chat_request.subject.lower()
-        if subject not in ["maths", "physics", "chemistry"]:
-            subject = "maths"
-        
-        # Initialize the AI teacher for streaming
-        teacher = IIT_Teacher(subject, api_key)
-        def event_stream():
-            for chunk in teacher.teach_stream(chat_request.message):
-                yield chunk
+        # Get the shared teacher for streaming (unknown subjects fall back to maths)
+        teacher = teacher_registry.get(chat_request.subject)
+        async def event_stream():
+            # The request is in flight until the last event has been sent
+            with metrics.requests_in_flight.labels("chat_stream").track_inprogress(), metrics.request_latency.labels("chat_stream").time():
+                try:
+                    async for chunk in teacher.ateach_stream(chat_request.message, mode=chat_request.mode):
+                        yield chunk
+                except Exception:
+                    metrics.request_errors.labels("chat_stream").inc()
+                    logger.exception("Chat stream failed")
+                    raise
+                finally:
+                    # The stream runs in its own task; the outcome the teacher noted is visible here
+                    await rate_limiter.settle(key)
         return StreamingResponse(event_stream(), media_type="text/event-stream")
     
     # Handle specific exceptions for better error messages
-    except Exception as e:
-        print(f"Error: {e}")
+    except HTTPException:
+        raise
+    except Exception:
+        metrics.request_errors.labels("chat_stream").inc()
+        logger.exception("Chat stream request failed")
         raise HTTPException(status_code=500, detail="Sorry, I encountered an error. Please try again.")
 
 @app.get("/api/health")
 async def health_check():
-    return {"status": "healthy", "message": "AI Tutor API is running"}
+    return {
+        "status": "healthy",
+        "message": "AI Tutor API is running",
+        # With a retrieval service this is an HTTP call; keep it off the event loop
+        "rag_ready": await asyncio.to_thread(rag_engine.is_ready),
+        "semantic_cache": semantic_cache.stats(),
+        "response_cache": response_cache.stats(),
+        "speculation": speculation_stats.stats(),
+        "embedding_batcher": rag_engine.query_embedder.stats(),
+        "retrieval_service": rag_engine.RETRIEVAL_SERVICE_URL or "in-process",
+        "rate_limiter": rate_limiter.stats(),
+    }
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus metrics: node and LLM latency, tokens, cache hit rates, retrieval, rate limiting"""
+    content, content_type = metrics.render()
+    return Response(content=content, media_type=content_type)
 
 if __name__ == "__main__":
     import uvicorn
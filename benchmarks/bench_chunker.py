@@ -0,0 +1,79 @@
+"""
+bench_chunker.py
+
+Compares the token-aware chunker (text_extraction.chunk_text) with the old
+500-word splitter (text_extraction.chunk_text_words) on real textbooks.
+
+For each chunker it reports:
+- index size:      number of chunks, stored text and embedding bytes
+- ingestion time:  chunking + embedding time
+- truncation:      share of chunk tokens the embedding model never sees
+- recall@k:        sentences sampled from the book are used as queries; a query is a
+                   hit if a top-k chunk (in-memory cosine search) contains the sentence
+
+Usage (from the repository root):
+    python -m benchmarks.bench_chunker path/to/book.pdf [more.pdf ...] --queries 200 --k 5
+"""
+
+import argparse
+import random
+import time
+
+import numpy as np
+from sentence_transformers import SentenceTransformer
+
+from src.text_extraction import iter_pdf_pages, chunk_text, chunk_text_words, split_sentences, get_tokenizer, CHUNK_TOKENS
+
+
+def _pages(paths):
+    for path in paths:
+        if path.lower().endswith('.pdf'):
+            for _, text in iter_pdf_pages(path):
+                yield text
+        else:
+            with open(path, 'r', encoding='utf-8') as f:
+                yield f.read()
+
+
+def _evaluate(name, chunker, pages, queries, model, k):
+    tokenizer = get_tokenizer()
+    start = time.perf_counter()
+    chunks = [chunk for page in pages for chunk in chunker(page)]
+    embeddings = model.encode(chunks, batch_size=64, normalize_embeddings=True)
+    elapsed = time.perf_counter() - start
+
+    token_counts = [len(ids) for ids in tokenizer(chunks, add_special_tokens=True)["input_ids"]]
+    seen = sum(min(count, CHUNK_TOKENS) for count in token_counts)
+    truncated = 1 - seen / sum(token_counts)
+
+    query_embeddings = model.encode(queries, batch_size=64, normalize_embeddings=True)
+    top = np.argsort(-(query_embeddings @ embeddings.T), axis=1)[:, :k]
+    hits = sum(any(query in chunks[i] for i in row) for query, row in zip(queries, top))
+
+    text_bytes = sum(len(chunk.encode('utf-8')) for chunk in chunks)
+    print(f"{name:<8} chunks={len(chunks):6d}  text={text_bytes / 1e6:6.2f} MB  vectors={embeddings.nbytes / 1e6:6.2f} MB  "
+          f"time={elapsed:7.1f} s  truncated={truncated:6.1%}  recall@{k}={hits / len(queries):6.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the token-aware chunker with the 500-word splitter")
+    parser.add_argument("paths", nargs="+", help="PDF or TXT files")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    pages = list(_pages(args.paths))
+    # Queries: sentences of a reasonable length, taken verbatim from the books
+    sentences = [s for page in pages for paragraph in split_sentences(page) for s in paragraph if 8 <= len(s.split()) <= 40]
+    random.Random(args.seed).shuffle(sentences)
+    queries = sentences[:args.queries]
+    print(f"{len(pages)} pages, {len(queries)} queries")
+
+    model = SentenceTransformer('all-MiniLM-L6-v2')
+    _evaluate("words", chunk_text_words, pages, queries, model, args.k)
+    _evaluate("tokens", chunk_text, pages, queries, model, args.k)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+bench_embed_batching.py
+
+Measures query embedding with and without micro-batching (see embedding_batcher.py).
+
+For each concurrency level, that many threads embed distinct short questions as fast as
+they can, either:
+- direct:  each thread calls model.encode(question) itself (one forward pass per query)
+- batched: each thread calls EmbeddingBatcher.embed(question)
+
+and it reports throughput (queries per second), per-query latency p50/p95, and for the
+batched runs the average batch size and the queueing delay added before encoding.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_embed_batching --concurrency 1 2 4 8 16 32 --queries 512 --wait-ms 2
+"""
+
+import argparse
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import percentile
+from src.embedding_batcher import EmbeddingBatcher
+from src.rag_engine import get_embed_model
+from src.subject_data import SAMPLE_QUESTIONS
+
+
+def _questions(n: int) -> list:
+    samples = [q for questions in SAMPLE_QUESTIONS.values() for q in questions]
+    return [f"{samples[i % len(samples)]} (variant {i})" for i in range(n)]
+
+
+def _run(embed, questions: list, concurrency: int) -> dict:
+    latencies = []
+    lock = threading.Lock()
+
+    def worker(question):
+        start = time.perf_counter()
+        embed(question)
+        with lock:
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, questions))
+    seconds = time.perf_counter() - start
+    return {"qps": len(questions) / seconds, "p50": statistics.median(latencies),
+            "p95": percentile(latencies, 0.95)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare direct and micro-batched query embedding")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--queries", type=int, default=512, help="queries per run")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--wait-ms", type=float, default=2.0)
+    args = parser.parse_args()
+
+    model = get_embed_model()
+    model.encode(_questions(8))  # load weights and warm up before timing
+    questions = _questions(args.queries)
+
+    def encode(texts):
+        return model.encode(texts, batch_size=len(texts), normalize_embeddings=True)
+
+    for concurrency in args.concurrency:
+        direct = _run(lambda q: model.encode(q, normalize_embeddings=True), questions, concurrency)
+        batcher = EmbeddingBatcher(encode, max_batch_size=args.batch_size, max_wait_ms=args.wait_ms)
+        batched = _run(batcher.embed, questions, concurrency)
+        stats = batcher.stats()
+        print(f"concurrency={concurrency:3d}  direct  {direct['qps']:8.1f} q/s  p50={direct['p50']:7.2f} ms  p95={direct['p95']:7.2f} ms")
+        print(f"{'':17}batched {batched['qps']:8.1f} q/s  p50={batched['p50']:7.2f} ms  p95={batched['p95']:7.2f} ms  "
+              f"batch={stats['avg_batch_size']:5.1f}  queue wait={stats['avg_queue_wait_ms']:6.2f} ms  "
+              f"speedup={batched['qps'] / direct['qps']:5.2f}x")
+
+
+if __name__ == "__main__":
+    main()
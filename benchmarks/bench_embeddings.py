@@ -0,0 +1,118 @@
+"""
+bench_embeddings.py
+
+Compares the embedding backends (PyTorch and int8-quantized ONNX Runtime) on textbooks.
+
+Each backend runs in a fresh interpreter, embedding the same chunks, and reports:
+- throughput: chunks embedded per second (model load time excluded)
+- memory:     peak RSS of the process, model included
+Then the outputs are compared:
+- drift:      cosine similarity between the two backends' vectors for each chunk
+- retrieval:  for sampled queries, overlap of the top-k chunks and recall@k per backend
+              (a query is a hit when its source chunk is in the top-k)
+
+Usage (from the repository root):
+    python -m benchmarks.bench_embeddings path/to/book.pdf [more.pdf ...] --queries 200 --k 5
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+
+from benchmarks.common import sample_query
+from src.text_extraction import iter_file_chunks
+
+BACKENDS = ("torch", "onnx")
+
+# Runs in a child interpreter: embeds the texts in argv[1], saves them to argv[2] and
+# prints {"load_seconds": ..., "chunks_per_second": ..., "rss_mb": ...}
+_CHILD = """
+import json, resource, sys, time
+import numpy as np
+from src.embeddings import load_embedding_model
+from src.rag_engine import EMBED_MODEL_NAME
+with open(sys.argv[1], encoding="utf-8") as f:
+    texts = json.load(f)
+start = time.perf_counter()
+model = load_embedding_model(EMBED_MODEL_NAME)
+model.encode(texts[:8])
+load_seconds = time.perf_counter() - start
+start = time.perf_counter()
+embeddings = model.encode(texts, batch_size=64, normalize_embeddings=True)
+seconds = time.perf_counter() - start
+np.save(sys.argv[2], np.asarray(embeddings, dtype=np.float32))
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+rss_mb = rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+print(json.dumps({"load_seconds": load_seconds, "chunks_per_second": len(texts) / seconds, "rss_mb": rss_mb}))
+"""
+
+
+def _embed(backend: str, texts_path: str, workdir: str):
+    out_path = os.path.join(workdir, f"{backend}.npy")
+    env = dict(os.environ, EMBED_BACKEND=backend)
+    output = subprocess.run([sys.executable, "-c", _CHILD, texts_path, out_path],
+                            capture_output=True, text=True, check=True, env=env).stdout
+    return json.loads(output.strip().splitlines()[-1]), np.load(out_path)
+
+
+def _queries(texts: list, n: int, rng: random.Random) -> list:
+    """Short runs of words from random chunks, with the index of their source chunk."""
+    queries = []
+    for i in rng.sample(range(len(texts)), len(texts)):
+        query = sample_query(texts[i], rng)
+        if query is None:
+            continue
+        queries.append((query, i))
+        if len(queries) == n:
+            break
+    return queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the PyTorch and ONNX embedding backends")
+    parser.add_argument("paths", nargs="+", help="PDF or TXT files")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    texts = [chunk['text'] for path in args.paths for chunk in iter_file_chunks(path, path)]
+    queries = _queries(texts, args.queries, random.Random(args.seed))
+    print(f"{len(texts)} chunks, {len(queries)} queries")
+
+    workdir = tempfile.mkdtemp(prefix="bench_embeddings_")
+    chunks_path = os.path.join(workdir, "chunks.json")
+    queries_path = os.path.join(workdir, "queries.json")
+    with open(chunks_path, "w", encoding="utf-8") as f:
+        json.dump(texts, f)
+    with open(queries_path, "w", encoding="utf-8") as f:
+        json.dump([q for q, _ in queries], f)
+
+    chunk_vectors, query_vectors = {}, {}
+    for backend in BACKENDS:
+        stats, chunk_vectors[backend] = _embed(backend, chunks_path, workdir)
+        _, query_vectors[backend] = _embed(backend, queries_path, workdir)
+        print(f"{backend:<6} load={stats['load_seconds']:6.1f} s  throughput={stats['chunks_per_second']:8.1f} chunks/s  "
+              f"peak RSS={stats['rss_mb']:7.0f} MB")
+
+    torch_vectors, onnx_vectors = chunk_vectors["torch"], chunk_vectors["onnx"]
+    similarity = np.sum(torch_vectors * onnx_vectors, axis=1)
+    print(f"drift: cosine(torch, onnx) mean={similarity.mean():.4f}  min={similarity.min():.4f}")
+
+    top = {backend: np.argsort(-(query_vectors[backend] @ chunk_vectors[backend].T), axis=1)[:, :args.k]
+           for backend in BACKENDS}
+    overlap = np.mean([len(set(a) & set(b)) / args.k for a, b in zip(top["torch"], top["onnx"])])
+    print(f"top-{args.k} overlap between backends: {overlap:.1%}")
+    for backend in BACKENDS:
+        hits = sum(source in row for (_, source), row in zip(queries, top[backend]))
+        print(f"{backend:<6} recall@{args.k}={hits / len(queries):6.1%}")
+
+
+if __name__ == "__main__":
+    main()
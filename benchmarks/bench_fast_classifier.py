@@ -0,0 +1,84 @@
+"""
+bench_fast_classifier.py
+
+Offline accuracy and latency benchmark for the local fast-path classifier.
+- coverage: share of messages decided locally (the rest still go to the LLM)
+- accuracy: share of locally decided messages that got the right label
+- latency:  time per classify_fast() call
+
+Usage (from the repository root):
+    python -m benchmarks.bench_fast_classifier --repeat 1000
+"""
+
+import argparse
+import statistics
+import time
+
+from src.fast_classifier import classify_fast
+from src.subject_data import SAMPLE_QUESTIONS
+
+# Labelled messages: (message, expected label). Ambiguous messages are expected to
+# be left to the LLM, so they only count against coverage.
+CASUAL_MESSAGES = [
+    "hi", "Hello!", "hey there", "good morning sir", "Good evening", "how are you?", "what's up",
+    "thanks", "thank you so much", "thx", "ok", "okay cool", "great", "bye", "see ya later",
+    "good night", "namaste teacher", "hii", "I am fine", "yes",
+]
+SUBJECT_MESSAGES = [
+    "What is Newton's second law?", "Explain Le Chatelier's principle", "dy/dx of x^2",
+    "solve 2x + 3 = 7", "What is the SN2 mechanism?", "How does Kirchhoff's current law work?",
+    "what is hybridization of carbon in methane", "explain projectile motion",
+    "What is the unit of electric charge?", "How do I find the determinant of a 3x3 matrix?",
+    "what is entropy", "why is the sky blue? is it refraction?", "How to balance a redox reaction",
+    "What's the integral of sin x?", "what are isomers",
+]
+AMBIGUOUS_MESSAGES = [
+    "can you help me?", "I am confused", "what is love", "tell me something interesting",
+    "I have an exam tomorrow", "who are you",
+]
+
+
+def _dataset():
+    data = [(m, "casual") for m in CASUAL_MESSAGES] + [(m, "subject") for m in SUBJECT_MESSAGES]
+    for questions in SAMPLE_QUESTIONS.values():
+        data += [(q, "subject") for q in questions]
+    data += [(m, None) for m in AMBIGUOUS_MESSAGES]
+    return data
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the local fast-path classifier")
+    parser.add_argument("--repeat", type=int, default=1000, help="timed calls per message")
+    args = parser.parse_args()
+
+    data = _dataset()
+    decided = correct = 0
+    mistakes = []
+    for message, expected in data:
+        label = classify_fast(message)
+        if label is None:
+            continue
+        decided += 1
+        if label == expected:
+            correct += 1
+        else:
+            mistakes.append((message, expected, label))
+
+    timings = []
+    for message, _ in data:
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            classify_fast(message)
+        timings.append((time.perf_counter() - start) / args.repeat * 1e6)
+    timings.sort()
+
+    print(f"messages: {len(data)}")
+    print(f"coverage: {decided / len(data):.1%} decided locally")
+    print(f"accuracy: {correct / decided:.1%} of decided messages" if decided else "accuracy: n/a")
+    print(f"latency:  mean={statistics.mean(timings):.1f} us  p50={statistics.median(timings):.1f} us  max={timings[-1]:.1f} us")
+    for message, expected, label in mistakes:
+        print(f"  wrong: {message!r} expected={expected} got={label}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,317 @@
+"""
+bench_load.py
+
+Offline load test of the tutor with a local stand-in LLM and Redis (see fakes.py).
+
+Scenarios (pick with --scenarios):
+- teach:        IIT_Teacher.teach from a thread pool
+- teach_stream: IIT_Teacher.teach_stream from a thread pool
+- api_chat:     POST /api/chat against the app served by uvicorn in this process
+- api_stream:   POST /api/chat/stream, reading the Server-Sent Events as they arrive
+
+Each scenario sends --requests questions at --concurrency and reports:
+- latency p50/p95/p99 and time to first token (first answer text; equals latency
+  when the answer is not streamed)
+- throughput (requests per second)
+- per-node latency of the graph (classify, analyze, explain, finalize) and per LLM call,
+  collected with a LangChain callback handler
+
+Questions are the sample questions made unique per request, so every request runs the
+pipeline; use --distinct to repeat questions and measure the cache paths. Caches are
+emptied between scenarios. Textbook retrieval is off unless --retrieval is given, since
+it needs the vector store. Rate limiting is disabled for the in-process app.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_load --requests 200 --concurrency 20 --latency 0.3 --tps 80 \\
+        --output results/load.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+
+# Configure the app for an offline run before it is imported
+os.environ.setdefault("GOOGLE_API_KEY", "bench")
+os.environ.setdefault("LLM_MODEL", "fake")
+os.environ["BENCH_NODE_TIMING"] = "true"
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.tracers.context import register_configure_hook
+
+from benchmarks.common import percentile
+from benchmarks.fakes import FakeChatModel, InMemoryRedis, AsyncInMemoryRedis, fake_embed
+
+SCENARIOS = ("teach", "teach_stream", "api_chat", "api_stream")
+NODES = ("classify_question", "analyze_and_identify", "explain_with_analogy", "finalize_response")
+
+
+# --- Per-node timing ---
+class NodeTimer(BaseCallbackHandler):
+    """
+    Records how long each graph node and each LLM call takes. LangChain creates one
+    handler per run (see register_configure_hook below), so the records are shared.
+    """
+
+    _starts = {}
+    _lock = threading.Lock()
+    records = []  # (name, milliseconds)
+
+    def _start(self, run_id, name):
+        with self._lock:
+            self._starts[run_id] = (name, time.perf_counter())
+
+    def _end(self, run_id):
+        with self._lock:
+            started = self._starts.pop(run_id, None)
+            if started is not None:
+                self.records.append((started[0], (time.perf_counter() - started[1]) * 1000))
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, metadata=None, name=None, **kwargs):
+        node = (metadata or {}).get("langgraph_node")
+        # A node's own runnable may share its name; time only the outermost run
+        if node in NODES and name == node and self._starts.get(parent_run_id, (None,))[0] != node:
+            self._start(run_id, node)
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        with self._lock:
+            self._starts.pop(run_id, None)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._start(run_id, "llm_call")
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        with self._lock:
+            self._starts.pop(run_id, None)
+
+
+# Attach a NodeTimer to every LangChain run in the process (BENCH_NODE_TIMING is set)
+register_configure_hook(ContextVar("bench_node_timer", default=None), True, NodeTimer, "BENCH_NODE_TIMING")
+
+
+# --- Helpers ---
+def summarize(values: list) -> dict:
+    """Count, mean and p50/p95/p99 of a list of milliseconds."""
+    if not values:
+        return {"count": 0}
+    return {"count": len(values), "mean": round(statistics.mean(values), 2),
+            "p50": round(percentile(values, 0.50), 2), "p95": round(percentile(values, 0.95), 2),
+            "p99": round(percentile(values, 0.99), 2)}
+
+
+def questions(scenario: str, count: int, distinct: int) -> list:
+    from src.subject_data import SAMPLE_QUESTIONS
+    samples = [q for qs in SAMPLE_QUESTIONS.values() for q in qs]
+    distinct = distinct or count
+    return [f"{samples[i % distinct % len(samples)]} ({scenario} variant {i % distinct})" for i in range(count)]
+
+
+def first_answer_event(sse_text: str) -> bool:
+    """True if the SSE text holds an answer event (not a stage or done event) with data."""
+    for event in sse_text.split("\n\n"):
+        lines = event.strip().split("\n")
+        if lines and lines[0] and not lines[0].startswith("event:") and any(l[len("data: "):] for l in lines):
+            return True
+    return False
+
+
+def reset_caches():
+    """Empties every cache, so each scenario starts cold."""
+    from src import ai_iit_teacher
+    from src.response_cache import LocalLRUCache
+    from src.semantic_cache import SemanticCache
+
+    cache = ai_iit_teacher.response_cache
+    cache.local = LocalLRUCache(cache.local.max_entries, cache.local.max_bytes)
+    store = InMemoryRedis()
+    cache._redis, cache._aredis, cache._redis_down_until = store, AsyncInMemoryRedis(store), 0.0
+    semantic = ai_iit_teacher.semantic_cache
+    ai_iit_teacher.semantic_cache = SemanticCache(embed_fn=fake_embed, threshold=semantic.threshold,
+                                                  ttl_seconds=semantic.ttl_seconds,
+                                                  max_entries_per_subject=semantic.max_entries_per_subject)
+
+
+# --- Drivers ---
+def run_threads(call, items: list, concurrency: int) -> list:
+    """Runs call(item) -> (latency_ms, ttft_ms) from a thread pool; returns results or errors."""
+    def safe(item):
+        try:
+            return call(item)
+        except Exception as e:
+            return e
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return list(pool.map(safe, items))
+
+
+def teach_call(teacher, mode):
+    def call(question):
+        start = time.perf_counter()
+        teacher.teach(question, mode=mode)
+        latency = (time.perf_counter() - start) * 1000
+        return latency, latency
+    return call
+
+
+def teach_stream_call(teacher, mode):
+    def call(question):
+        start = time.perf_counter()
+        ttft = None
+        for event in teacher.teach_stream(question, mode=mode):
+            if ttft is None and first_answer_event(event):
+                ttft = (time.perf_counter() - start) * 1000
+        return (time.perf_counter() - start) * 1000, ttft
+    return call
+
+
+async def run_http(url: str, stream: bool, items: list, concurrency: int, subject: str, mode: str) -> list:
+    import httpx
+
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, timeout=300, limits=limits) as client:
+        async def one(question):
+            payload = {"message": question, "subject": subject, "mode": mode}
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    if not stream:
+                        response = await client.post("/api/chat", json=payload)
+                        response.raise_for_status()
+                        latency = (time.perf_counter() - start) * 1000
+                        return latency, latency
+                    ttft, buffer = None, ""
+                    async with client.stream("POST", "/api/chat/stream", json=payload) as response:
+                        response.raise_for_status()
+                        async for text in response.aiter_text():
+                            buffer += text
+                            if ttft is None and first_answer_event(buffer):
+                                ttft = (time.perf_counter() - start) * 1000
+                    return (time.perf_counter() - start) * 1000, ttft
+                except Exception as e:
+                    return e
+        return await asyncio.gather(*(one(q) for q in items))
+
+
+def start_app_server():
+    """Serves app.py with uvicorn in a background thread; returns (url, server)."""
+    import uvicorn
+    import app as app_module
+
+    # Requests must not be throttled during a load test
+    app_module.rate_limiter.enabled = False
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app_module.app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}", server
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline load test with a stand-in LLM and Redis")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--distinct", type=int, default=0, help="distinct questions (0 = all unique)")
+    parser.add_argument("--subject", default="physics")
+    parser.add_argument("--mode", choices=("thorough", "fast"), default="thorough")
+    parser.add_argument("--latency", type=float, default=0.3, help="fake LLM seconds to first token")
+    parser.add_argument("--tps", type=float, default=80.0, help="fake LLM tokens per second")
+    parser.add_argument("--retrieval", action="store_true", help="keep textbook retrieval on")
+    parser.add_argument("--url", help="load-test a running server instead of the in-process app")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    if not args.retrieval:
+        os.environ["RETRIEVAL_ENABLED"] = "false"
+    llm = FakeChatModel(latency=args.latency, tokens_per_second=args.tps)
+
+    # Every teacher, including the app's registry, uses the stand-in model
+    import src.teacher_registry as teacher_registry
+    teacher_registry.init_chat_model = lambda *a, **k: llm
+    from src.ai_iit_teacher import IIT_Teacher
+    teacher = IIT_Teacher(args.subject, "bench", llm=llm)
+
+    server, url = None, args.url
+    if url is None and {"api_chat", "api_stream"} & set(args.scenarios):
+        url, server = start_app_server()
+
+    results = []
+    for scenario in args.scenarios:
+        reset_caches()
+        NodeTimer.records = []
+        items = questions(scenario, args.requests, args.distinct)
+        start = time.perf_counter()
+        if scenario == "teach":
+            outcomes = run_threads(teach_call(teacher, args.mode), items, args.concurrency)
+        elif scenario == "teach_stream":
+            outcomes = run_threads(teach_stream_call(teacher, args.mode), items, args.concurrency)
+        else:
+            outcomes = asyncio.run(run_http(url, scenario == "api_stream", items, args.concurrency, args.subject, args.mode))
+        elapsed = time.perf_counter() - start
+
+        ok = [o for o in outcomes if not isinstance(o, Exception)]
+        errors = [repr(o) for o in outcomes if isinstance(o, Exception)]
+        nodes = {}
+        for name, ms in NodeTimer.records:
+            nodes.setdefault(name, []).append(ms)
+        result = {
+            "scenario": scenario,
+            "requests": len(items),
+            "errors": len(errors),
+            "error_samples": errors[:3],
+            "throughput_rps": round(len(ok) / elapsed, 2) if elapsed > 0 else 0.0,
+            "latency_ms": summarize([latency for latency, _ in ok]),
+            "ttft_ms": summarize([ttft for _, ttft in ok if ttft is not None]),
+            "nodes_ms": {name: summarize(values) for name, values in sorted(nodes.items())},
+        }
+        results.append(result)
+        latency, ttft = result["latency_ms"], result["ttft_ms"]
+        print(f"{scenario:<13} ok={len(ok):5d} errors={len(errors):3d} rps={result['throughput_rps']:7.2f}  "
+              f"latency p50={latency.get('p50', 0):8.1f} p95={latency.get('p95', 0):8.1f} p99={latency.get('p99', 0):8.1f} ms  "
+              f"ttft p50={ttft.get('p50', 0):8.1f} ms")
+        for name, summary in result["nodes_ms"].items():
+            print(f"    {name:<22} n={summary['count']:5d} p50={summary['p50']:8.1f} p95={summary['p95']:8.1f} ms")
+
+    if server is not None:
+        server.should_exit = True
+
+    if args.output:
+        report = {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "commit": git_commit(),
+            "python": sys.version.split()[0],
+            "config": vars(args),
+            "results": results,
+        }
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+bench_modes.py
+
+Compares the two teaching modes on real LLM calls:
+- thorough: the multi-step graph (classify, analyze, explain, finalize)
+- fast:     one structured-output call
+
+For each mode it reports p50/p95 latency and the mean input/output tokens per question.
+The answer caches are bypassed so every question pays for its LLM calls; the local fast
+classifier and textbook retrieval stay on, as in production.
+
+Usage (from the repository root, with LLM_MODEL and GOOGLE_API_KEY set):
+    python -m benchmarks.bench_modes --subject physics --rounds 3
+"""
+
+import argparse
+import os
+import statistics
+import time
+
+from dotenv import load_dotenv
+
+# Run with the local cache tier only, so Redis cannot serve cached stages
+os.environ.setdefault("REDIS_ENABLED", "false")
+
+from langchain_core.callbacks import get_usage_metadata_callback
+
+from benchmarks.common import percentile
+from src import ai_iit_teacher
+from src.ai_iit_teacher import IIT_Teacher, TEACHING_MODES
+from src.response_cache import LocalLRUCache
+from src.subject_data import SAMPLE_QUESTIONS
+
+
+def _answer(teacher: IIT_Teacher, question: str, mode: str) -> str:
+    """Answers without the exact-match and semantic caches."""
+    ai_iit_teacher.response_cache.local = LocalLRUCache()  # drop memoized stages
+    if mode == "fast":
+        answer = teacher._fast_answer(question)
+        if answer is not None:
+            return answer
+    config = teacher._run_config(question)
+    try:
+        return teacher.graph.invoke(teacher._initial_state(question), config=config)["final_response"]
+    finally:
+        teacher._discard_speculation(config)
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Compare latency and token usage of the fast and thorough modes")
+    parser.add_argument("--subject", default="maths", choices=sorted(SAMPLE_QUESTIONS))
+    parser.add_argument("--rounds", type=int, default=3, help="passes over the sample questions")
+    args = parser.parse_args()
+
+    teacher = IIT_Teacher(args.subject, os.getenv("GOOGLE_API_KEY"))
+    questions = SAMPLE_QUESTIONS[args.subject] * args.rounds
+    print(f"{len(questions)} questions per mode ({args.subject})")
+
+    for mode in TEACHING_MODES:
+        timings, input_tokens, output_tokens = [], [], []
+        for question in questions:
+            with get_usage_metadata_callback() as usage:
+                start = time.perf_counter()
+                _answer(teacher, question, mode)
+                timings.append((time.perf_counter() - start) * 1000)
+            input_tokens.append(sum(u.get("input_tokens", 0) for u in usage.usage_metadata.values()))
+            output_tokens.append(sum(u.get("output_tokens", 0) for u in usage.usage_metadata.values()))
+        print(f"{mode:<9} p50={statistics.median(timings):8.0f} ms  p95={percentile(timings, 0.95):8.0f} ms  "
+              f"tokens in={statistics.mean(input_tokens):7.0f}  out={statistics.mean(output_tokens):7.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+bench_partitions.py
+
+Compares one shared collection with per-subject collections as the library grows.
+
+The given books are chunked and embedded once. For growing slices of the library
+(--steps, e.g. 25%, 50%, 100% of every subject's chunks) both layouts are built in a
+temporary ChromaDB directory from the same embeddings, and the same queries are run:
+- shared:      every query searches all subjects' chunks
+- partitioned: every query searches only its own subject's collection
+
+For each layout and size it reports p50/p95 query latency, precision@k (share of returned
+chunks from the query's subject) and recall@k (share of queries whose source page is
+returned). Queries are short runs of words sampled from chunks in the smallest slice.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_partitions --maths m1.pdf m2.pdf --physics p.pdf --chemistry c.pdf
+"""
+
+import argparse
+import random
+import statistics
+import tempfile
+import time
+
+from chromadb import PersistentClient
+
+from benchmarks.common import percentile, sample_query
+from src.rag_engine import get_embed_model
+from src.text_extraction import iter_file_chunks
+from src.teacher_registry import SUBJECTS
+
+
+def _load(subject: str, paths: list) -> list:
+    chunks = [chunk for path in paths for chunk in iter_file_chunks(path, path, subject=subject)]
+    embeddings = get_embed_model().encode([c['text'] for c in chunks], batch_size=64).tolist()
+    for i, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
+        chunk['id'], chunk['embedding'] = f"{subject}_{i}", embedding
+    print(f"{subject}: {len(chunks)} chunks")
+    return chunks
+
+
+def _queries(chunks: list, n: int, rng: random.Random) -> list:
+    queries = []
+    for chunk in rng.sample(chunks, len(chunks)):
+        query = sample_query(chunk['text'], rng)
+        if query is None:
+            continue
+        queries.append({'query': query, 'subject': chunk['subject'],
+                        'book': chunk['book'], 'page': chunk['page']})
+        if len(queries) == n:
+            break
+    return queries
+
+
+def _add(collection, chunks: list):
+    for i in range(0, len(chunks), 1000):
+        batch = chunks[i:i + 1000]
+        collection.add(ids=[c['id'] for c in batch], embeddings=[c['embedding'] for c in batch],
+                       documents=[c['text'] for c in batch],
+                       metadatas=[{'book': c['book'], 'page': c['page'], 'subject': c['subject']} for c in batch])
+
+
+def _run(label: str, size: int, queries: list, collection_for, k: int):
+    timings, precision, recall = [], [], 0
+    for q in queries:
+        start = time.perf_counter()
+        results = collection_for(q['subject']).query(query_embeddings=[q['embedding']], n_results=k)
+        timings.append((time.perf_counter() - start) * 1000)
+        metadatas = results['metadatas'][0]
+        precision.append(sum(m['subject'] == q['subject'] for m in metadatas) / max(1, len(metadatas)))
+        recall += any(m['book'] == q['book'] and m['page'] == q['page'] for m in metadatas)
+    print(f"{size:8d} chunks  {label:<12} p50={statistics.median(timings):7.2f} ms  p95={percentile(timings, 0.95):7.2f} ms  "
+          f"precision@{k}={statistics.mean(precision):6.1%}  recall@{k}={recall / len(queries):6.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare a shared collection with per-subject collections")
+    for subject in SUBJECTS:
+        parser.add_argument(f"--{subject}", nargs="*", default=[], help=f"{subject} PDF or TXT files")
+    parser.add_argument("--queries", type=int, default=50, help="queries per subject")
+    parser.add_argument("--steps", type=float, nargs="+", default=[0.25, 0.5, 1.0], help="library fractions")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    library = {subject: _load(subject, getattr(args, subject)) for subject in SUBJECTS if getattr(args, subject)}
+    if len(library) < 2:
+        parser.error("give books for at least two subjects")
+
+    smallest = min(args.steps)
+    queries = [q for subject, chunks in library.items()
+               for q in _queries(chunks[:max(1, int(len(chunks) * smallest))], args.queries, rng)]
+    for q, embedding in zip(queries, get_embed_model().encode([q['query'] for q in queries]).tolist()):
+        q['embedding'] = embedding
+    print(f"{len(queries)} queries")
+
+    for step in sorted(args.steps):
+        sliced = {subject: chunks[:max(1, int(len(chunks) * step))] for subject, chunks in library.items()}
+        size = sum(len(chunks) for chunks in sliced.values())
+        client = PersistentClient(path=tempfile.mkdtemp(prefix="bench_partitions_"))
+        shared = client.create_collection("shared")
+        _add(shared, [chunk for chunks in sliced.values() for chunk in chunks])
+        partitions = {}
+        for subject, chunks in sliced.items():
+            partitions[subject] = client.create_collection(f"partition_{subject}")
+            _add(partitions[subject], chunks)
+        _run("shared", size, queries, lambda subject: shared, args.k)
+        _run("partitioned", size, queries, lambda subject: partitions[subject], args.k)
+
+
+if __name__ == "__main__":
+    main()
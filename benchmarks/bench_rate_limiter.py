@@ -0,0 +1,69 @@
+"""
+bench_rate_limiter.py
+
+Measures the per-request overhead of the token-bucket rate limiter (rate_limiter.py):
+one admit() plus one settle() for a full pipeline run, i.e. two bucket updates.
+
+Runs against the Redis configured with REDIS_HOST/REDIS_PORT (the Lua script path) and
+against the per-worker local buckets, with --concurrency requests in flight over
+--clients distinct buckets, and reports p50/p95/p99 overhead per request.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_rate_limiter --requests 5000 --concurrency 32 --clients 1000
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+from benchmarks.common import percentile
+from src.rate_limiter import TokenBucketLimiter, note_outcome
+
+
+async def _measure(limiter: TokenBucketLimiter, requests: int, concurrency: int, clients: int) -> list:
+    timings = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with semaphore:
+            key = f"ip:bench-{i % clients}"
+            start = time.perf_counter()
+            await limiter.admit(key)
+            note_outcome("pipeline")
+            await limiter.settle(key)
+            timings.append((time.perf_counter() - start) * 1000)
+
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    return timings
+
+
+def _report(label: str, timings: list):
+    p50, p95, p99 = (percentile(timings, q) for q in (0.50, 0.95, 0.99))
+    print(f"{label:<6} p50={p50:6.3f} ms  p95={p95:6.3f} ms  p99={p99:6.3f} ms")
+
+
+async def main_async(args):
+    # Huge buckets, so every request is admitted and only the bookkeeping is measured
+    options = dict(capacity=1e9, refill_per_minute=1e9, prefix="ratelimit:bench:")
+    redis_limiter = TokenBucketLimiter(host=os.getenv("REDIS_HOST", "localhost"),
+                                       port=int(os.getenv("REDIS_PORT", "6379")), **options)
+    await _measure(redis_limiter, 100, 1, 10)  # connect and load the script
+    if redis_limiter.stats()["backend"] == "redis":
+        _report("redis", await _measure(redis_limiter, args.requests, args.concurrency, args.clients))
+    else:
+        print("redis  unavailable, skipped")
+    _report("local", await _measure(TokenBucketLimiter(use_redis=False, **options),
+                                    args.requests, args.concurrency, args.clients))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the rate limiter's overhead per request")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--clients", type=int, default=1000, help="distinct buckets")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
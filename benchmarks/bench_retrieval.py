@@ -0,0 +1,78 @@
+"""
+bench_retrieval.py
+
+Compares vector-only, BM25-only and hybrid (reciprocal rank fusion) retrieval on the
+indexed library (ChromaDB + the BM25 index written during ingestion).
+
+For each mode it reports:
+- recall@k: share of queries whose expected page is among the top-k chunks
+- latency:  p50/p95 per query, with the retrieval cache disabled
+
+Queries come from a JSONL file of {"query": ..., "book": ..., "page": ...} lines, or,
+without one, are sampled from the library: a short run of words from a random chunk,
+similar in length to a student's question, expecting that chunk's book and page.
+
+Usage (from the repository root, after ingesting some books):
+    python -m benchmarks.bench_retrieval --queries 200 --k 5
+    python -m benchmarks.bench_retrieval --file labelled_queries.jsonl --k 5
+"""
+
+import argparse
+import json
+import random
+import statistics
+import time
+
+from benchmarks.common import percentile, sample_query
+from src.rag_engine import retrieve_relevant_chunks, get_lexical_index, embed_query
+
+MODES = ("vector", "lexical", "hybrid")
+
+
+def _sampled_queries(n: int, seed: int) -> list:
+    rng = random.Random(seed)
+    queries = []
+    for chunk in get_lexical_index().sample(n * 3):
+        query = sample_query(chunk['text'], rng)
+        if query is None:
+            continue
+        queries.append({'query': query, 'book': chunk['book'], 'page': chunk['page']})
+        if len(queries) == n:
+            break
+    return queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare vector, BM25 and hybrid retrieval")
+    parser.add_argument("--file", help="JSONL file of labelled queries")
+    parser.add_argument("--queries", type=int, default=200, help="number of sampled queries (without --file)")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.file:
+        with open(args.file, 'r', encoding='utf-8') as f:
+            queries = [json.loads(line) for line in f if line.strip()]
+    else:
+        queries = _sampled_queries(args.queries, args.seed)
+    print(f"{len(queries)} queries, {len(get_lexical_index())} chunks in the BM25 index")
+    if not queries:
+        return
+
+    # Embed every query once up front, so the vector timings exclude model warm-up
+    for q in queries:
+        embed_query(q['query'])
+
+    for mode in MODES:
+        hits, timings = 0, []
+        for q in queries:
+            start = time.perf_counter()
+            chunks = retrieve_relevant_chunks(q['query'], top_k=args.k, use_cache=False, mode=mode)
+            timings.append((time.perf_counter() - start) * 1000)
+            hits += any(c['book'] == q['book'] and c['page'] == q['page'] for c in chunks)
+        print(f"{mode:<8} recall@{args.k}={hits / len(queries):6.1%}  "
+              f"p50={statistics.median(timings):7.2f} ms  p95={percentile(timings, 0.95):7.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
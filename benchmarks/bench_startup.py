@@ -0,0 +1,57 @@
+"""
+bench_startup.py
+
+Measures the import time and memory of the API's teacher module in a fresh
+interpreter, with and without loading the RAG embedding model and vector store.
+- "lazy":  import src.ai_iit_teacher only (what an API worker now pays at startup)
+- "eager": import, then rag_engine.warm_up() (what every worker paid before, at import)
+
+Usage (from the repository root):
+    python -m benchmarks.bench_startup --runs 3
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+# Runs in a child interpreter and prints {"seconds": ..., "rss_mb": ...}
+_CHILD = """
+import json, resource, sys, time
+start = time.perf_counter()
+import src.ai_iit_teacher
+if {eager}:
+    from src import rag_engine
+    rag_engine.warm_up()
+seconds = time.perf_counter() - start
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+rss_mb = rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+print(json.dumps({{"seconds": seconds, "rss_mb": rss_mb}}))
+"""
+
+
+def _measure(eager: bool, runs: int) -> dict:
+    results = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, "-c", _CHILD.format(eager=eager)],
+                                capture_output=True, text=True, check=True).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    return {
+        "seconds": statistics.median(r["seconds"] for r in results),
+        "rss_mb": statistics.median(r["rss_mb"] for r in results),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure import time and peak RSS of the teacher module")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    for label, eager in (("lazy", False), ("eager", True)):
+        result = _measure(eager, args.runs)
+        print(f"{label:<6} import={result['seconds']:6.2f} s  peak RSS={result['rss_mb']:7.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+bench_teacher_registry.py
+
+Measures the per-request setup cost that the TeacherRegistry removes:
+- "per request": build a new IIT_Teacher (model client + graph compile) for every message
+- "registry":    look up the long-lived teacher for the subject
+
+No LLM calls are made; only the setup work is timed.
+
+Usage (from the repository root, with LLM_MODEL and GOOGLE_API_KEY set):
+    python -m benchmarks.bench_teacher_registry --iterations 200
+"""
+
+import argparse
+import os
+import statistics
+import time
+
+from dotenv import load_dotenv
+
+from benchmarks.common import percentile
+from src.ai_iit_teacher import IIT_Teacher
+from src.teacher_registry import TeacherRegistry, SUBJECTS
+
+
+def _time_calls(fn, iterations: int) -> list:
+    """Calls fn `iterations` times and returns the duration of each call in milliseconds."""
+    timings = []
+    for i in range(iterations):
+        subject = SUBJECTS[i % len(SUBJECTS)]
+        start = time.perf_counter()
+        fn(subject)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def _report(label: str, timings: list):
+    p95 = percentile(timings, 0.95)
+    print(f"{label:<12} mean={statistics.mean(timings):9.3f} ms  p50={statistics.median(timings):9.3f} ms  p95={p95:9.3f} ms")
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Benchmark per-request teacher construction vs the registry")
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    api_key = os.getenv("GOOGLE_API_KEY")
+
+    per_request = _time_calls(lambda subject: IIT_Teacher(subject, api_key), args.iterations)
+
+    registry = TeacherRegistry(api_key)
+    registry.start()
+    shared = _time_calls(registry.get, args.iterations)
+
+    _report("per request", per_request)
+    _report("registry", shared)
+    saved = statistics.mean(per_request) - statistics.mean(shared)
+    print(f"Setup overhead removed per request: {saved:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+"""
+common.py
+
+Helpers shared by the benchmarks:
+- sample_query: a short run of words from a chunk's text, used as a query whose
+                relevant answer is that chunk
+- percentile:   a quantile of a list of timings
+"""
+
+import random
+from typing import Optional
+
+from src.text_extraction import split_sentences
+
+
+def sample_query(text: str, rng: random.Random) -> Optional[str]:
+    """4 to 8 consecutive words of a random sentence (of at least 8 words), or None if there is none."""
+    sentences = [s for paragraph in split_sentences(text) for s in paragraph if len(s.split()) >= 8]
+    if not sentences:
+        return None
+    words = rng.choice(sentences).split()
+    length = rng.randint(4, 8)
+    start = rng.randint(0, len(words) - length)
+    return ' '.join(words[start:start + length])
+
+
+def percentile(values: list, q: float) -> float:
+    """The q-quantile (0 < q <= 1) of the values, by the nearest-rank method."""
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, int(round(len(values) * q)) - 1))]
@@ -0,0 +1,239 @@
+"""
+fakes.py
+
+Local stand-ins for the external services, used by the offline benchmarks:
+- FakeChatModel:     a deterministic chat model with configurable latency and token rate,
+                     answering each prompt of the teaching graph in the expected format
+- InMemoryRedis:     the subset of the redis / redis.asyncio clients used by ResponseCache
+                     (strings with expiry, the hot-key sorted sets and pipelines)
+- fake_embed:        a deterministic hash-based embedding, in place of the embedding model
+
+Nothing here talks to the network, so runs are repeatable and free.
+"""
+
+import asyncio
+import hashlib
+import threading
+import time
+import zlib
+from typing import Any, Iterator, AsyncIterator, List, Optional
+
+import numpy as np
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import RunnableLambda
+
+
+def _words(count: int, seed: int) -> List[str]:
+    vocabulary = ["force", "energy", "equation", "graph", "limit", "electron", "motion", "value",
+                  "simple", "because", "therefore", "example", "step", "rate", "change", "balance"]
+    return [vocabulary[(seed + i * 7) % len(vocabulary)] for i in range(count)]
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    A deterministic chat model for load tests. Every call waits `latency` seconds (time to
+    first token) and then produces tokens at `tokens_per_second`; streaming yields them one
+    at a time. Replies follow the formats the IIT_Teacher prompts ask for.
+    """
+
+    latency: float = 0.3
+    tokens_per_second: float = 80.0  # 0 means instant
+    explanation_tokens: int = 120
+    answer_tokens: int = 250
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-teacher"
+
+    def _reply(self, messages: List[BaseMessage]) -> str:
+        prompt = messages[-1].content
+        seed = zlib.crc32(prompt.encode("utf-8"))
+        if "casual|" in prompt:
+            return "subject|"
+        if "Format: Topic:" in prompt:
+            return f"Topic: Topic {seed % 10000} | Subtopic: Concept {seed % 97}"
+        if "Combine all elements" in prompt:
+            return "<h1>Answer</h1> " + " ".join(_words(self.answer_tokens, seed))
+        return "Explanation: " + " ".join(_words(self.explanation_tokens, seed)) + " Analogy: like a bicycle."
+
+    def _usage(self, messages: List[BaseMessage], content: str) -> dict:
+        input_tokens = sum(len(str(m.content).split()) for m in messages)
+        output_tokens = len(content.split())
+        return {"input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens}
+
+    def _token_delay(self) -> float:
+        return 1.0 / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        content = self._reply(messages)
+        time.sleep(self.latency + len(content.split()) * self._token_delay())
+        message = AIMessage(content=content, usage_metadata=self._usage(messages, content),
+                            response_metadata={"model_name": self._llm_type})
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        content = self._reply(messages)
+        await asyncio.sleep(self.latency + len(content.split()) * self._token_delay())
+        message = AIMessage(content=content, usage_metadata=self._usage(messages, content),
+                            response_metadata={"model_name": self._llm_type})
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        content = self._reply(messages)
+        time.sleep(self.latency)
+        for word in content.split():
+            time.sleep(self._token_delay())
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=word + " "))
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        content = self._reply(messages)
+        await asyncio.sleep(self.latency)
+        for word in content.split():
+            await asyncio.sleep(self._token_delay())
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=word + " "))
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+    def with_structured_output(self, schema, *, include_raw: bool = False, **kwargs):
+        """Fills the fast-mode schema in one call, with the latency of a full answer."""
+        def build(messages):
+            content = self._reply(list(messages)[:-1] + [AIMessage(content="Combine all elements")])
+            raw = AIMessage(content=content, usage_metadata=self._usage(list(messages), content),
+                            response_metadata={"model_name": self._llm_type})
+            parsed = schema(question_type="subject", topic="Topic: Fast | Subtopic: Fast", explanation="",
+                            analogy="", final_response=content)
+            return {"raw": raw, "parsed": parsed, "parsing_error": None} if include_raw else parsed
+
+        def invoke(messages):
+            time.sleep(self.latency + self.answer_tokens * self._token_delay())
+            return build(messages)
+
+        async def ainvoke(messages):
+            await asyncio.sleep(self.latency + self.answer_tokens * self._token_delay())
+            return build(messages)
+
+        return RunnableLambda(invoke, afunc=ainvoke)
+
+
+class InMemoryRedis():
+    """A thread-safe dict with expiries, exposing the redis client calls ResponseCache makes."""
+
+    def __init__(self):
+        self._data = {}  # key -> (bytes value, expires_at or None)
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            if item[1] is not None and item[1] < time.time():
+                del self._data[key]
+                return None
+            return item[0]
+
+    def set(self, key: str, value: Any, ex: Optional[int] = None, **kwargs) -> bool:
+        value = value.encode("utf-8") if isinstance(value, str) else value
+        with self._lock:
+            self._data[key] = (value, time.time() + ex if ex else None)
+        return True
+
+    def delete(self, *keys: str) -> int:
+        with self._lock:
+            return sum(self._data.pop(key, None) is not None for key in keys)
+
+    def ping(self) -> bool:
+        return True
+
+    def ttl(self, key: str) -> int:
+        with self._lock:
+            item = self._data.get(key)
+        if item is None or (item[1] is not None and item[1] < time.time()):
+            return -2
+        return -1 if item[1] is None else int(item[1] - time.time())
+
+    def expire(self, key: str, seconds: int) -> bool:
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                self._data[key] = (item[0], time.time() + seconds)
+            return item is not None
+
+    def zincrby(self, name: str, amount: float, member: str) -> float:
+        with self._lock:
+            scores = self._data.setdefault(name, ({}, None))[0]
+            scores[member] = scores.get(member, 0) + amount
+            return scores[member]
+
+    def zrevrange(self, name: str, start: int, end: int, withscores: bool = False) -> list:
+        with self._lock:
+            scores = dict(self._data.get(name, ({}, None))[0])
+        ranked = sorted(scores.items(), key=lambda item: -item[1])[start:end + 1 if end >= 0 else None]
+        return [(m.encode("utf-8"), s) for m, s in ranked] if withscores else [m.encode("utf-8") for m, _ in ranked]
+
+    def pipeline(self, transaction: bool = True) -> "InMemoryPipeline":
+        return InMemoryPipeline(self)
+
+
+class InMemoryPipeline():
+    """Queues commands and runs them on execute(), like a redis pipeline."""
+
+    def __init__(self, store: InMemoryRedis):
+        self.store = store
+        self.calls = []
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self.calls.append((name, args, kwargs))
+            return self
+        return queue
+
+    def execute(self) -> list:
+        calls, self.calls = self.calls, []
+        return [getattr(self.store, name)(*args, **kwargs) for name, args, kwargs in calls]
+
+
+class AsyncInMemoryPipeline(InMemoryPipeline):
+    async def execute(self) -> list:
+        return InMemoryPipeline.execute(self)
+
+
+class AsyncInMemoryRedis():
+    """The redis.asyncio counterpart of InMemoryRedis, sharing its data."""
+
+    def __init__(self, store: InMemoryRedis):
+        self.store = store
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return self.store.get(key)
+
+    async def set(self, key: str, value: Any, ex: Optional[int] = None, **kwargs) -> bool:
+        return self.store.set(key, value, ex=ex)
+
+    async def delete(self, *keys: str) -> int:
+        return self.store.delete(*keys)
+
+    async def ping(self) -> bool:
+        return True
+
+    async def ttl(self, key: str) -> int:
+        return self.store.ttl(key)
+
+    async def zrevrange(self, name: str, start: int, end: int, withscores: bool = False) -> list:
+        return self.store.zrevrange(name, start, end, withscores=withscores)
+
+    def pipeline(self, transaction: bool = True) -> AsyncInMemoryPipeline:
+        return AsyncInMemoryPipeline(self.store)
+
+
+def fake_embed(text: str, dim: int = 384) -> np.ndarray:
+    """A deterministic, L2-normalized pseudo-embedding; equal texts get equal vectors."""
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+    return vector / np.linalg.norm(vector)
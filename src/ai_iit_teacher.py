@@ -11,12 +11,20 @@
 # ==================================================================================================
 
 # --- Import necessary libraries ---
-from typing import TypedDict, Annotated
+from typing import TypedDict, Annotated, Literal, Optional
+from pydantic import BaseModel, Field
 from langgraph.graph import StateGraph,START, END
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
 from langchain.chat_models import init_chat_model
+from langchain_core.runnables import RunnableLambda
 from dotenv import load_dotenv
 import os
+import time
+import asyncio
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 import uuid
 
@@ -24,11 +32,20 @@ import uuid
 from src.memory import get_memory_saver
 
 # Import the prompts used in the agent's workflow
-from src.prompts import analyze_question_prompt, identify_topic_prompt, create_explanation_prompt, add_analogy_prompt, finalize_response_prompt, system_prompt_template, classify_question_prompt
+from src.prompts import analyze_question_prompt, identify_topic_prompt, create_explanation_prompt, add_analogy_prompt, finalize_response_prompt, system_prompt_template, classify_question_prompt, textbook_context_prompt, fast_answer_prompt
 
 # Import subject-specific data for examples and sample questions
 from src.subject_data import TOPIC_EXAMPLES, SAMPLE_QUESTIONS
 
+# Local classifier that settles obvious casual/subject messages without an LLM call
+from src.fast_classifier import classify_fast, casual_reply
+
+# Prometheus metrics; importing the module also starts timing every node and LLM call
+from src import metrics
+
+# The rate limiter charges each request by how it was answered, as noted here
+from src.rate_limiter import note_outcome
+
 # --- Load environment variables from a .env file ---
 # This is used to securely load the API key.
 load_dotenv()
@@ -36,14 +53,112 @@ load_dotenv()
 # Import LangSmith for monitoring and debugging
 from src.langsmith_debug import LANGSMITH_API_KEY, LANGSMITH_PROJECT, LANGSMITH_ENDPOINT, LANGSMITH_TRACING
 
-# setting up redis for caching
-import redis
-redis_client = redis.Redis(host='localhost', port=6379, db=0)
+# Two-tier response cache: an in-process LRU in front of Redis. Redis is optional;
+# if it is unreachable the cache falls back to the local tier instead of failing.
+# Requests per question are also counted in Redis, so src/prewarm.py can renew the
+# most popular answers before they expire.
+from src.response_cache import ResponseCache
+response_cache = ResponseCache(
+    host=os.getenv("REDIS_HOST", "localhost"),
+    port=int(os.getenv("REDIS_PORT", "6379")),
+    local_ttl=int(os.getenv("LOCAL_CACHE_TTL", "300")),
+    local_max_entries=int(os.getenv("LOCAL_CACHE_MAX_ENTRIES", "1024")),
+    local_max_bytes=int(os.getenv("LOCAL_CACHE_MAX_BYTES", str(32 * 1024 * 1024))),
+    max_connections=int(os.getenv("REDIS_MAX_CONNECTIONS", "50")),
+    use_redis=os.getenv("REDIS_ENABLED", "true").lower() == "true",
+    track_hot_keys=os.getenv("HOT_KEY_TRACKING", "true").lower() == "true",
+    hot_keys_flush_interval=float(os.getenv("HOT_KEYS_FLUSH_INTERVAL", "10")),
+)
+
+# Intermediate node results (classification, topic, explanation + analogy) are memoized
+# in the same cache, so questions that overlap with earlier ones skip those LLM calls.
+STAGE_CACHE_TTL = int(os.getenv("STAGE_CACHE_TTL", "86400"))
+
+# Semantic cache: reuses answers for questions that mean the same thing, not just exact repeats
+from src.semantic_cache import SemanticCache
+semantic_cache = SemanticCache(
+    threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.9")),
+    ttl_seconds=int(os.getenv("SEMANTIC_CACHE_TTL", "86400")),
+    max_entries_per_subject=int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "5000")),
+)
 
 # Import the retrieval function to fetch relevant textbook chunks
 # This is used to enhance the agent's knowledge base with textbook content.
 from src.rag_engine import retrieve_relevant_chunks
 
+logger = logging.getLogger(__name__)
+
+# Textbook retrieval runs concurrently with classification and topic analysis: it is
+# started when a request begins and only awaited by the explanation step.
+RETRIEVAL_ENABLED = os.getenv("RETRIEVAL_ENABLED", "true").lower() == "true"
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "3"))
+_retrieval_pool = ThreadPoolExecutor(max_workers=int(os.getenv("RETRIEVAL_WORKERS", "4")), thread_name_prefix="retrieval")
+
+def retrieve_context(question: str, subject: str = None) -> dict:
+    """Fetches textbook chunks of a subject for a question and formats them for the explanation prompt."""
+    start = time.perf_counter()
+    try:
+        chunks = retrieve_relevant_chunks(question, top_k=RETRIEVAL_TOP_K, subject=subject)
+    except Exception as e:
+        # No textbooks indexed or the vector store is unavailable: explain without them
+        logger.warning("Textbook retrieval failed: %s", e)
+        chunks = []
+    context = "\n\n".join(f"[{chunk['book']}, page {chunk['page']}] {chunk['text']}" for chunk in chunks)
+    elapsed = time.perf_counter() - start
+    metrics.retrieval_latency.observe(elapsed)
+    return {"context": context, "retrieval_ms": elapsed * 1000}
+
+# Speculative topic analysis (opt-in). When a message needs the LLM classifier, topic
+# analysis is started at the same time instead of after it; if the message turns out to
+# be casual, the analysis is cancelled (or its result discarded).
+SPECULATIVE_ANALYSIS = os.getenv("SPECULATIVE_ANALYSIS", "false").lower() == "true"
+_speculation_pool = ThreadPoolExecutor(max_workers=int(os.getenv("SPECULATION_WORKERS", "4")), thread_name_prefix="speculation")
+
+class SpeculationStats():
+    """Counts speculative analyses that were used or wasted, and the latency they saved."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = 0
+        self.used = 0
+        self.wasted = 0
+        self.saved_ms = 0.0
+
+    def record_started(self):
+        with self._lock:
+            self.started += 1
+
+    def record_used(self, saved_ms: float):
+        with self._lock:
+            self.used += 1
+            self.saved_ms += saved_ms
+
+    def record_wasted(self):
+        with self._lock:
+            self.wasted += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            finished = self.used + self.wasted
+            return {
+                "enabled": SPECULATIVE_ANALYSIS,
+                "started": self.started,
+                "used": self.used,
+                "wasted": self.wasted,
+                "wasted_rate": round(self.wasted / finished, 4) if finished else 0.0,
+                "avg_saved_ms": round(self.saved_ms / self.used, 1) if self.used else 0.0,
+            }
+
+speculation_stats = SpeculationStats()
+
+class _Speculation():
+    """One speculative topic analysis running alongside classification."""
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.future = None  # resolves to (analyzed state, finish time)
+        self.used = False
+
 # --- Define the structure of the agent's state ---
 # AgentState is a TypedDict that defines the data structure passed between nodes in the graph.
 # It holds all the information the agent needs to process a request, from the initial
@@ -57,6 +172,41 @@ class AgentState(TypedDict):
     analogy: str # The real-world analogy for the concept.
     final_response: str # The complete, formatted response for the student.
     question_type: str # The type of the question: 'casual' or 'subject'.
+    context: str # Textbook excerpts retrieved for the question.
+    retrieval_ms: float # Time spent retrieving the textbook excerpts.
+    retrieval_wait_ms: float # Time the explanation step waited for retrieval (0 when off the critical path).
+
+# --- Schema of the single-call "fast" mode ---
+# In fast mode one structured-output LLM call replaces the graph's four calls. The model
+# fills in this schema, which is validated instead of being parsed from free text.
+TEACHING_MODES = ("thorough", "fast")
+
+class TeachingAnswer(BaseModel):
+    """Classification, topic, explanation, analogy and final HTML answer from one LLM call."""
+    question_type: Literal["casual", "subject"] = Field(description="'casual' for greetings and small talk, otherwise 'subject'")
+    topic: str = Field(default="", description="Topic: [Main Topic] | Subtopic: [Specific Concept]; empty for casual messages")
+    explanation: str = Field(default="", description="Step-by-step explanation for a beginner; empty for casual messages")
+    analogy: str = Field(default="", description="One real-world analogy; empty for casual messages")
+    final_response: str = Field(description="The complete answer for the student, in HTML")
+
+# LLM calls made outside the graph are labelled in the metrics with this metadata
+FINALIZE_STREAM_CONFIG = {"metadata": {"stage": "finalize_response"}}
+FAST_ANSWER_CONFIG = {"metadata": {"stage": "fast_answer"}}
+
+# --- Server-Sent Events used by the streaming entry points ---
+# Stage events tell the UI which step has finished; the final answer then follows
+# as plain "message" events, one per LLM token chunk, and a "done" event closes the stream.
+STAGE_EVENTS = {
+    "classify_question": "classified",
+    "analyze_and_identify": "topic_identified",
+    "explain_with_analogy": "explanation_ready",
+}
+
+def sse_event(data: str, event: str = None) -> str:
+    """Formats one Server-Sent Event. Multi-line data is split over several data: lines."""
+    lines = [f"event: {event}"] if event else []
+    lines += [f"data: {line}" for line in data.split("\n")]
+    return "\n".join(lines) + "\n\n"
 
 # --- Define the main class for the AI Teacher Agent ---
 class IIT_Teacher():
@@ -65,17 +215,19 @@ class IIT_Teacher():
     processing a student's question through a predefined graph of operations.
     """
 
-    def __init__(self,subject, api_key:str):
+    def __init__(self,subject, api_key:str, llm=None):
         """
         Initializes the IIT_Teacher agent.
         
         Args:
             subject (str): The subject the teacher will specialize in (e.g., 'maths', 'physics').
             api_key (str): The API key for the language model service.
+            llm: Optional chat model to use. Pass a shared client to reuse provider
+                connections across teachers; a new one is created when omitted.
         """
 
-        # Initialize the language model (LLM) from Google GenAI.
-        self.llm = init_chat_model(os.getenv("LLM_MODEL"), temperature=0.1)
+        # Initialize the language model (LLM) from Google GenAI, unless one is shared with us.
+        self.llm = llm if llm is not None else init_chat_model(os.getenv("LLM_MODEL"), temperature=0.1)
 
         # Store the subject and create a dynamic system prompt based on it.
         self.subject = subject.lower()
@@ -83,13 +235,22 @@ class IIT_Teacher():
 
         # Build the computational graph that defines the agent's workflow.
         self.graph = self._build_graph()
+        # Streaming uses the same graph without the finalize node; the final answer is
+        # streamed separately so it is generated exactly once.
+        self.stream_graph = self._build_graph(include_finalize=False)
+        # The LLM bound to the fast-mode schema, created on first use
+        self._structured_llm = None
     
-    def _build_graph(self):
+    def _build_graph(self, include_finalize: bool = True):
         """
         Builds the LangGraph workflow for the agent.
         
         This method defines the nodes (steps) and edges (transitions) of the agent's
         thought process.
+
+        Args:
+            include_finalize (bool): When False, the graph stops after the explanation so
+                the final answer can be streamed token by token by the caller.
         
         Returns:
             A compiled LangGraph object.
@@ -97,11 +258,13 @@ class IIT_Teacher():
         workflow = StateGraph(AgentState)
 
         # --- Define the nodes in the graph ---
-        # Each node is a function that performs a specific task.
-        workflow.add_node("classify_question", self.classify_question)
-        workflow.add_node("analyze_and_identify", self._analyze_and_identify)  # Combined node
-        workflow.add_node("explain_with_analogy", self._explain_with_analogy)
-        workflow.add_node("finalize_response", self._finalize_response)
+        # Each node is a function that performs a specific task. Every node has a sync
+        # and an async implementation, so the same graph serves invoke() and ainvoke().
+        workflow.add_node("classify_question", RunnableLambda(self.classify_question, afunc=self.aclassify_question))
+        workflow.add_node("analyze_and_identify", RunnableLambda(self._analyze_and_identify, afunc=self._aanalyze_and_identify))  # Combined node
+        workflow.add_node("explain_with_analogy", RunnableLambda(self._explain_with_analogy, afunc=self._aexplain_with_analogy))
+        if include_finalize:
+            workflow.add_node("finalize_response", RunnableLambda(self._finalize_response, afunc=self._afinalize_response))
 
         # --- Define the edges connecting the nodes ---
         # This creates a linear sequence of operations.
@@ -119,24 +282,56 @@ class IIT_Teacher():
 
         # Edges for the regular subject analysis workflow.
         workflow.add_edge("analyze_and_identify", "explain_with_analogy")
-        workflow.add_edge("explain_with_analogy", "finalize_response")
-        workflow.add_edge("finalize_response", END) # The graph ends after the 'finalize_response' node.
+        if include_finalize:
+            workflow.add_edge("explain_with_analogy", "finalize_response")
+            workflow.add_edge("finalize_response", END) # The graph ends after the 'finalize_response' node.
+        else:
+            workflow.add_edge("explain_with_analogy", END) # The caller streams the final answer itself.
 
         # Compile the graph into a runnable object.
         return workflow.compile()
     
+    # --- Stage-level memoization shared by the nodes ---
+    def _stage_key(self, stage: str, part: str):
+        """Cache key for one node's output, or None if there is nothing to key on."""
+        part = part.strip().lower()
+        return f"stage:{stage}:{self.subject}:{part}" if part else None
+
+    def _memoized(self, stage: str, part: str, fields, state: AgentState, compute) -> AgentState:
+        """Restores `fields` from the stage cache, or runs `compute` and caches them."""
+        key = self._stage_key(stage, part)
+        cached = response_cache.get(key, metric_label="stage") if key else None
+        if cached is not None:
+            state.update(json.loads(cached))
+            return state
+        state = compute(state)
+        if key:
+            response_cache.set(key, json.dumps({f: state.get(f, "") for f in fields}), ex=STAGE_CACHE_TTL)
+        return state
+
+    async def _amemoized(self, stage: str, part: str, fields, state: AgentState, compute) -> AgentState:
+        """Async version of _memoized; `compute` is an async callable."""
+        key = self._stage_key(stage, part)
+        cached = await response_cache.aget(key, metric_label="stage") if key else None
+        if cached is not None:
+            state.update(json.loads(cached))
+            return state
+        state = await compute(state)
+        if key:
+            await response_cache.aset(key, json.dumps({f: state.get(f, "") for f in fields}), ex=STAGE_CACHE_TTL)
+        return state
+
     # --- Node 1: Classify the student's question ---
-    def classify_question(self, state: AgentState) -> AgentState:
-        """
-        Uses the LLM to classify if the question is a casual/greeting or subject-related.
-        If casual, the LLM also generates a friendly reply.
-        """
-        question = state['question']
-        prompt = classify_question_prompt.format(question=question)
-        response = self.llm.invoke([
+    def _classify_messages(self, state: AgentState):
+        """Builds the LLM messages used to classify the question."""
+        prompt = classify_question_prompt.format(question=state['question'])
+        return [
             SystemMessage(content=self.system_prompt),
             HumanMessage(content=prompt)
-        ])
+        ]
+
+    def _apply_classification(self, state: AgentState, response) -> AgentState:
+        """Parses the classifier output into the state."""
         content = response.content.strip()
         if content.startswith("casual|"):
             state["question_type"] = "casual"
@@ -149,20 +344,54 @@ class IIT_Teacher():
             state["question_type"] = "subject"
         return state
 
-    # --- Node 2: Analyze question and identify topic together ---
-    def _analyze_and_identify(self, state:AgentState)->AgentState:
+    def _fast_classification(self, state: AgentState):
+        """Classifies the question locally; returns None when the LLM has to decide."""
+        label = classify_fast(state['question'])
+        if label is None:
+            return None
+        state["question_type"] = label
+        if label == "casual":
+            state["final_response"] = casual_reply(state['question'], self.subject)
+        return state
+
+    def classify_question(self, state: AgentState) -> AgentState:
         """
-        Analyzes the student's question to understand their confusion and identifies the main topic and subtopic in a single LLM call.
+        Uses the LLM to classify if the question is a casual/greeting or subject-related.
+        If casual, the LLM also generates a friendly reply. Obvious cases are decided
+        locally by the fast classifier and skip the LLM call.
         """
+        fast = self._fast_classification(state)
+        if fast is not None:
+            return fast
+        def compute(state):
+            response = self.llm.invoke(self._classify_messages(state))
+            return self._apply_classification(state, response)
+        return self._memoized("classify", state['question'], ("question_type", "final_response"), state, compute)
+
+    async def aclassify_question(self, state: AgentState) -> AgentState:
+        """Async version of classify_question."""
+        fast = self._fast_classification(state)
+        if fast is not None:
+            return fast
+        async def compute(state):
+            response = await self.llm.ainvoke(self._classify_messages(state))
+            return self._apply_classification(state, response)
+        return await self._amemoized("classify", state['question'], ("question_type", "final_response"), state, compute)
+
+    # --- Node 2: Analyze question and identify topic together ---
+    def _analyze_messages(self, state: AgentState):
+        """Builds the LLM messages used to analyze the question and identify its topic."""
         question = state['question']
         subject = self.subject
         examples = TOPIC_EXAMPLES.get(subject, "")
         prompt = analyze_question_prompt.format(subject=subject, question=question) + "\n" + identify_topic_prompt.format(subject=subject, question=question, examples=examples)
-        response = self.llm.invoke([
+        return [
             SystemMessage(content=self.system_prompt),
             HumanMessage(content=prompt)
-        ])
-        # Parse the response
+        ]
+
+    def _apply_analysis(self, state: AgentState, messages, response) -> AgentState:
+        """Parses the analysis output into the state."""
         content = response.content
         lines = content.split("\n")
         analysis = ""
@@ -172,24 +401,55 @@ class IIT_Teacher():
                 topic = line.strip()
             elif line.strip():
                 analysis = line.strip()
-        state["messages"] = [SystemMessage(content=self.system_prompt), HumanMessage(content=prompt), response]
+        state["messages"] = messages + [response]
         state["topic_identified"] = topic
         
         return state
 
-    # --- Node 3 Combined: Create explanation and analogy together ---
-    def _explain_with_analogy(self, state:AgentState)->AgentState:
+    def _analyze_and_identify(self, state:AgentState, config=None)->AgentState:
         """
-        Generates a step-by-step explanation and a real-world analogy in a single LLM call.
+        Analyzes the student's question to understand their confusion and identifies the main topic and subtopic in a single LLM call.
+        If the analysis was started speculatively alongside classification, its result is used instead.
         """
+        speculation = self._speculation(config)
+        if speculation is not None:
+            wait_started = time.perf_counter()
+            analyzed, finished_at = speculation.future.result()
+            return self._use_speculation(state, speculation, analyzed, finished_at, wait_started)
+        def compute(state):
+            messages = self._analyze_messages(state)
+            response = self.llm.invoke(messages)
+            return self._apply_analysis(state, messages, response)
+        return self._memoized("topic", state['question'], ("topic_identified",), state, compute)
+
+    async def _aanalyze_and_identify(self, state:AgentState, config=None)->AgentState:
+        """Async version of _analyze_and_identify."""
+        speculation = self._speculation(config)
+        if speculation is not None:
+            wait_started = time.perf_counter()
+            analyzed, finished_at = await speculation.future
+            return self._use_speculation(state, speculation, analyzed, finished_at, wait_started)
+        async def compute(state):
+            messages = self._analyze_messages(state)
+            response = await self.llm.ainvoke(messages)
+            return self._apply_analysis(state, messages, response)
+        return await self._amemoized("topic", state['question'], ("topic_identified",), state, compute)
+
+    # --- Node 3 Combined: Create explanation and analogy together ---
+    def _explain_messages(self, state: AgentState):
+        """Builds the LLM messages used to create the explanation and analogy."""
         question = state['question']
         topic = state['topic_identified']
         prompt = create_explanation_prompt.format(question=question, topic=topic) + "\n" + add_analogy_prompt.format(question=question, explanation=state.get("explanation", ""), subject=self.subject)
-        response = self.llm.invoke([
+        if state.get("context"):
+            prompt += "\n" + textbook_context_prompt.format(context=state["context"])
+        return [
             SystemMessage(content=self.system_prompt),
             HumanMessage(content=prompt)
-        ])
-        # Parse the response
+        ]
+
+    def _apply_explanation(self, state: AgentState, response) -> AgentState:
+        """Parses the explanation and analogy output into the state."""
         content = response.content
         explanation = ""
         analogy = ""
@@ -203,96 +463,420 @@ class IIT_Teacher():
         state["analogy"] = analogy
         return state
 
+    def _explain_with_analogy(self, state:AgentState, config=None)->AgentState:
+        """
+        Generates a step-by-step explanation and a real-world analogy in a single LLM call,
+        grounded in the textbook excerpts retrieved for the question.
+        """
+        def compute(state):
+            state = self._collect_context(state, config)
+            response = self.llm.invoke(self._explain_messages(state))
+            return self._apply_explanation(state, response)
+        # Keyed on the topic, so different questions about the same topic share one explanation
+        return self._memoized("explanation", state['topic_identified'], ("explanation", "analogy"), state, compute)
+
+    async def _aexplain_with_analogy(self, state:AgentState, config=None)->AgentState:
+        """Async version of _explain_with_analogy."""
+        async def compute(state):
+            state = await self._acollect_context(state, config)
+            response = await self.llm.ainvoke(self._explain_messages(state))
+            return self._apply_explanation(state, response)
+        return await self._amemoized("explanation", state['topic_identified'], ("explanation", "analogy"), state, compute)
+
+    # --- Work that runs alongside the graph ---
+    # Textbook retrieval (and, when enabled, speculative topic analysis) is started as soon
+    # as a request begins and handed to the graph through the run config, so it overlaps
+    # with the earlier steps instead of adding steps of its own. The nodes that need the
+    # results pick them up from the config.
+    def _run_config(self, question: str) -> dict:
+        """Starts the concurrent work in worker threads; returns the graph run config carrying it."""
+        configurable = {}
+        if RETRIEVAL_ENABLED:
+            configurable["retrieval"] = _retrieval_pool.submit(retrieve_context, question, self.subject)
+        if SPECULATIVE_ANALYSIS and classify_fast(question) is None:
+            speculation = _Speculation()
+            speculation.future = _speculation_pool.submit(self._speculate_analysis, question)
+            configurable["speculation"] = speculation
+            speculation_stats.record_started()
+        return {"configurable": configurable}
+
+    def _arun_config(self, question: str) -> dict:
+        """Async version of _run_config (must be called inside the event loop)."""
+        configurable = {}
+        if RETRIEVAL_ENABLED:
+            configurable["retrieval"] = asyncio.ensure_future(asyncio.to_thread(retrieve_context, question, self.subject))
+        if SPECULATIVE_ANALYSIS and classify_fast(question) is None:
+            speculation = _Speculation()
+            speculation.future = asyncio.ensure_future(self._aspeculate_analysis(question))
+            configurable["speculation"] = speculation
+            speculation_stats.record_started()
+        return {"configurable": configurable}
+
+    def _speculate_analysis(self, question: str):
+        """Runs topic analysis for a question before it is known to be a subject question."""
+        return self._analyze_and_identify(self._initial_state(question)), time.perf_counter()
+
+    async def _aspeculate_analysis(self, question: str):
+        """Async version of _speculate_analysis."""
+        return await self._aanalyze_and_identify(self._initial_state(question)), time.perf_counter()
+
+    def _speculation(self, config):
+        speculation = (config or {}).get("configurable", {}).get("speculation")
+        return speculation if speculation is not None and not speculation.used else None
+
+    def _use_speculation(self, state: AgentState, speculation: _Speculation, analyzed: AgentState,
+                         finished_at: float, wait_started: float) -> AgentState:
+        speculation.used = True
+        state["topic_identified"] = analyzed["topic_identified"]
+        state["messages"] = analyzed["messages"]
+        # Without speculation the analysis would have started now and taken its full duration
+        waited = time.perf_counter() - wait_started
+        saved_ms = max(0.0, (finished_at - speculation.started_at - waited) * 1000)
+        speculation_stats.record_used(saved_ms)
+        logger.info("speculative analysis used, saved %.1f ms", saved_ms)
+        return state
+
+    def _discard_speculation(self, config):
+        """Cancels a speculative analysis the graph did not use (e.g. the message was casual)."""
+        speculation = self._speculation(config)
+        if speculation is None:
+            return
+        speculation.used = True  # settled; never count it twice
+        speculation.future.cancel()
+        if isinstance(speculation.future, asyncio.Future):
+            # Retrieve a late error so it is not logged as "never retrieved"
+            speculation.future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        speculation_stats.record_wasted()
+
+    def _apply_context(self, state: AgentState, result: dict, wait_started: float) -> AgentState:
+        state.update(result)
+        state["retrieval_wait_ms"] = (time.perf_counter() - wait_started) * 1000
+        metrics.retrieval_wait.observe(state["retrieval_wait_ms"] / 1000)
+        logger.info("retrieval took %.1f ms, explanation waited %.1f ms", state["retrieval_ms"], state["retrieval_wait_ms"])
+        return state
+
+    def _collect_context(self, state: AgentState, config) -> AgentState:
+        """Waits for the retrieval started with the request (or runs it now if none was started)."""
+        retrieval = (config or {}).get("configurable", {}).get("retrieval")
+        if retrieval is None and not RETRIEVAL_ENABLED:
+            return state
+        wait_started = time.perf_counter()
+        result = retrieval.result() if retrieval is not None else retrieve_context(state['question'], self.subject)
+        return self._apply_context(state, result, wait_started)
+
+    async def _acollect_context(self, state: AgentState, config) -> AgentState:
+        """Async version of _collect_context."""
+        retrieval = (config or {}).get("configurable", {}).get("retrieval")
+        if retrieval is None and not RETRIEVAL_ENABLED:
+            return state
+        wait_started = time.perf_counter()
+        result = await retrieval if retrieval is not None else await asyncio.to_thread(retrieve_context, state['question'], self.subject)
+        return self._apply_context(state, result, wait_started)
+
     # --- Node 4: Finalize the response --- (Streaming and non-streaming)
-    def _finalize_response(self, state:AgentState, stream:bool=False):
+    def _finalize_messages(self, state: AgentState):
+        """Builds the LLM messages used to compose the final HTML answer."""
         question = state['question']
         topic = state['topic_identified']
         explanation = state['explanation']
         analogy = state["analogy"]
         prompt = finalize_response_prompt.format(question=question, topic=topic, explanation=explanation, analogy=analogy)
-        if stream:
-            # Stream the final response from the LLM
-            for chunk in self.llm.stream([
-                SystemMessage(content=self.system_prompt),
-                HumanMessage(content=prompt)
-            ]):
-                if chunk.content:
-                    yield chunk.content
-        else:
-            response = self.llm.invoke([
-                SystemMessage(content=self.system_prompt),
-                HumanMessage(content=prompt)
-            ])
-            state["final_response"] = response.content
-            return state
+        return [
+            SystemMessage(content=self.system_prompt),
+            HumanMessage(content=prompt)
+        ]
 
-    # This method serves as the entry point for the agent to process a student's question.
-    # It initializes the state and invokes the graph to get the final response.
-    # For non-streaming use
-    def teach(self, question:str)->str:
-        """
-        The main entry point for the agent to answer a question.
-        Now includes caching and optional memory usage.
-        """
-        # Use a string as the cache key
-        cache_key = f"{self.subject}:{question.strip().lower()}"
-        cached = redis_client.get(cache_key)
-        if cached:
-            return cached.decode('utf-8')
+    def _finalize_response(self, state:AgentState)->AgentState:
+        """Composes the final HTML answer in a single (non-streamed) LLM call."""
+        response = self.llm.invoke(self._finalize_messages(state))
+        state["final_response"] = response.content
+        return state
+
+    async def _afinalize_response(self, state:AgentState)->AgentState:
+        """Async version of _finalize_response."""
+        response = await self.llm.ainvoke(self._finalize_messages(state))
+        state["final_response"] = response.content
+        return state
+
+    def _stream_final_response(self, state:AgentState):
+        """Streams the final HTML answer from the LLM chunk by chunk."""
+        for chunk in self.llm.stream(self._finalize_messages(state), config=FINALIZE_STREAM_CONFIG):
+            if chunk.content:
+                yield chunk.content
+
+    async def _astream_final_response(self, state:AgentState):
+        """Async version of _stream_final_response."""
+        async for chunk in self.llm.astream(self._finalize_messages(state), config=FINALIZE_STREAM_CONFIG):
+            if chunk.content:
+                yield chunk.content
+
+    # --- Fast mode: one structured-output call instead of the graph ---
+    @property
+    def structured_llm(self):
+        """The chat model bound to the TeachingAnswer schema (raw message kept for token usage)."""
+        if self._structured_llm is None:
+            self._structured_llm = self.llm.with_structured_output(TeachingAnswer, include_raw=True)
+        return self._structured_llm
+
+    def _fast_messages(self, question: str):
+        """Builds the LLM messages for the single-call answer."""
+        prompt = fast_answer_prompt.format(question=question, subject=self.subject, examples=TOPIC_EXAMPLES.get(self.subject, ""))
+        return [
+            SystemMessage(content=self.system_prompt),
+            HumanMessage(content=prompt)
+        ]
+
+    def _apply_fast_answer(self, result: dict) -> Optional[str]:
+        """Returns the validated final answer, or None if the output did not match the schema."""
+        if result.get("parsing_error") is not None or result.get("parsed") is None:
+            logger.warning("Fast mode output did not match the schema (%s); using thorough mode", result.get("parsing_error"))
+            return None
+        return result["parsed"].final_response
+
+    def _fast_answer(self, question: str) -> Optional[str]:
+        """Answers in one LLM call; None means the caller should fall back to the graph."""
+        return self._apply_fast_answer(self.structured_llm.invoke(self._fast_messages(question), config=FAST_ANSWER_CONFIG))
+
+    async def _afast_answer(self, question: str) -> Optional[str]:
+        """Async version of _fast_answer."""
+        return self._apply_fast_answer(await self.structured_llm.ainvoke(self._fast_messages(question), config=FAST_ANSWER_CONFIG))
+
+    # --- Helpers shared by the entry points ---
+    def _cache_key(self, question: str, mode: str = "thorough") -> str:
+        # Use a string as the cache key; fast answers are cached apart from thorough ones
+        key = f"{self.subject}:{question.strip().lower()}"
+        return f"fast:{key}" if mode == "fast" else key
+
+    def _initial_state(self, question: str) -> AgentState:
         # Define the initial state for the graph.
-        inital_state = {
+        return {
             "messages" : [],
             "question" : question,
             "topic_identified" : "",
             "explanation" : "",
             "analogy" : "",
-            "final_response" : ""
+            "final_response" : "",
+            "context" : "",
+            "retrieval_ms" : 0.0,
+            "retrieval_wait_ms" : 0.0
         }
 
+    # This method serves as the entry point for the agent to process a student's question.
+    # It initializes the state and invokes the graph to get the final response.
+    # For non-streaming use
+    def teach(self, question:str, mode:str = "thorough")->str:
+        """
+        The main entry point for the agent to answer a question.
+        Now includes caching and optional memory usage.
+
+        Args:
+            question (str): The student's message.
+            mode (str): "thorough" runs the multi-step graph; "fast" answers with a single
+                structured-output LLM call (falling back to the graph if its output is invalid).
+        """
+        # Greetings and small talk get an instant canned reply, without the graph
+        if classify_fast(question) == "casual":
+            note_outcome("casual")
+            return casual_reply(question, self.subject)
+
+        # Cached answers are returned directly; concurrent misses on the same question
+        # share one pipeline run. New answers are cached with a 24-hour expiry.
+        cache_key = self._cache_key(question, mode)
+        response_cache.count_request(cache_key)
+        return response_cache.get_or_compute(cache_key, lambda: self.compute_answer(question, mode), ex=86400)
+
+    def compute_answer(self, question: str, mode: str = "thorough", semantic: bool = True) -> str:
+        """
+        Answers a question with the pipeline, bypassing the response cache (used by teach
+        and by the cache pre-warmer).
+
+        Args:
+            semantic (bool): Look the question up in the semantic cache first and store the
+                new answer there.
+        """
+        similar = semantic_cache.lookup(self.subject, question) if semantic else None
+        if similar is not None:
+            return similar
+        if mode == "fast":
+            note_outcome("fast")
+            fast = self._fast_answer(question)
+            if fast is not None:
+                return fast
+        note_outcome("pipeline")
+        inital_state = self._initial_state(question)
+
         # If you don't need persistent memory, you can comment out the next two lines:
         # memory = get_memory_saver()
         # session_id = str(uuid.uuid4())
         # config = {"configurable": {"thread_id": session_id},"checkpoint_manager": memory}
         # result = self.graph.invoke(inital_state, config=config)
 
-        # Instead, just call the graph directly:
-        result = self.graph.invoke(inital_state)
-        final_response = result['final_response']
-        # Store in cache with 24-hour expiry
-        redis_client.set(cache_key, final_response, ex=86400)
-        return final_response
-
-    def teach_stream(self, question: str):
-        # Use a string as the cache key
-        cache_key = f"{self.subject}:{question.strip().lower()}"
-        cached = redis_client.get(cache_key)
-        if cached:
-            yield cached.decode('utf-8')
+        # Instead, just call the graph directly (textbook retrieval runs alongside it):
+        config = self._run_config(question)
+        try:
+            result = self.graph.invoke(inital_state, config=config)
+        finally:
+            self._discard_speculation(config)
+        if semantic:
+            semantic_cache.store(self.subject, question, result['final_response'])
+        return result['final_response']
+
+    def teach_stream(self, question: str, mode: str = "thorough"):
+        """
+        Streams the answer as Server-Sent Events: one 'stage' event per finished graph
+        node, then the final answer token by token, then a 'done' event. In fast mode the
+        answer comes from one structured call and is sent as a single event.
+        """
+        if classify_fast(question) == "casual":
+            note_outcome("casual")
+            yield sse_event(casual_reply(question, self.subject))
+            yield sse_event("", event="done")
             return
-        
-        # Define the initial state for the graph.
-        inital_state = {
-            "messages": [],
-            "question": question,
-            "topic_identified": "",
-            "explanation": "",
-            "analogy": "",
-            "final_response": ""
-        }
-
-        # Initialize the state and invoke the graph.
-        state = self.graph.invoke(inital_state)
-        full_response = ""
 
-        for chunk in self._finalize_response(state, stream=True):
-            full_response += chunk
-            yield chunk
+        cache_key = self._cache_key(question, mode)
+        response_cache.count_request(cache_key)
+        # If another request is already answering this question, wait for its answer
+        cached = response_cache.join_flight(cache_key)
+        if cached is not None:
+            yield sse_event(cached)
+            yield sse_event("", event="done")
+            return
 
-        # Store in cache with 24-hour expiry
-        redis_client.set(cache_key, full_response, ex=86400)
-      
+        answer, error = None, None  # answer: the complete response, once there is one
+        try:
+            full_response = semantic_cache.lookup(self.subject, question)
+            if full_response is None and mode == "fast":
+                note_outcome("fast")
+                full_response = self._fast_answer(question)
+            if full_response is not None:
+                yield sse_event(full_response)
+            else:
+                note_outcome("pipeline")
+                # Run everything except the final answer, reporting each stage as it completes.
+                state = self._initial_state(question)
+                config = self._run_config(question)
+                try:
+                    for update in self.stream_graph.stream(state, config=config, stream_mode="updates"):
+                        for node, node_state in update.items():
+                            state.update(node_state)
+                            yield sse_event(STAGE_EVENTS[node], event="stage")
+                finally:
+                    self._discard_speculation(config)
+
+                if state.get("question_type") == "casual":
+                    # Casual replies are already complete after classification.
+                    full_response = state["final_response"]
+                    yield sse_event(full_response)
+                else:
+                    full_response = ""
+                    for chunk in self._stream_final_response(state):
+                        full_response += chunk
+                        yield sse_event(chunk)
+                semantic_cache.store(self.subject, question, full_response)
+            answer = full_response
+
+            # Store in cache with 24-hour expiry
+            response_cache.set(cache_key, answer, ex=86400)
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            # Hand the answer (or the error) to any waiting requests. This also runs if the
+            # client disconnects while the answer is being stored, so the flight is never left open.
+            response_cache.finish_flight(cache_key, answer, None if answer is not None else error)
+        yield sse_event("", event="done")
+
+    # Async entry points used by the FastAPI endpoints. They await the LLM and Redis
+    # instead of blocking, so one worker can serve many students while waiting on I/O.
+    async def ateach(self, question:str, mode:str = "thorough")->str:
+        """Async version of teach."""
+        if classify_fast(question) == "casual":
+            note_outcome("casual")
+            return casual_reply(question, self.subject)
+
+        cache_key = self._cache_key(question, mode)
+        await response_cache.acount_request(cache_key)
+        return await response_cache.aget_or_compute(cache_key, lambda: self.acompute_answer(question, mode), ex=86400)
+
+    async def acompute_answer(self, question: str, mode: str = "thorough", semantic: bool = True) -> str:
+        """Async version of compute_answer."""
+        # Embedding is CPU work, so keep it off the event loop
+        similar = await asyncio.to_thread(semantic_cache.lookup, self.subject, question) if semantic else None
+        if similar is not None:
+            return similar
+        if mode == "fast":
+            note_outcome("fast")
+            fast = await self._afast_answer(question)
+            if fast is not None:
+                return fast
+        note_outcome("pipeline")
+        config = self._arun_config(question)
+        try:
+            result = await self.graph.ainvoke(self._initial_state(question), config=config)
+        finally:
+            self._discard_speculation(config)
+        if semantic:
+            await asyncio.to_thread(semantic_cache.store, self.subject, question, result['final_response'])
+        return result['final_response']
+
+    async def ateach_stream(self, question: str, mode: str = "thorough"):
+        """Async version of teach_stream."""
+        if classify_fast(question) == "casual":
+            note_outcome("casual")
+            yield sse_event(casual_reply(question, self.subject))
+            yield sse_event("", event="done")
+            return
 
+        cache_key = self._cache_key(question, mode)
+        await response_cache.acount_request(cache_key)
+        cached = await response_cache.ajoin_flight(cache_key)
+        if cached is not None:
+            yield sse_event(cached)
+            yield sse_event("", event="done")
+            return
 
+        answer, error = None, None  # answer: the complete response, once there is one
+        try:
+            full_response = await asyncio.to_thread(semantic_cache.lookup, self.subject, question)
+            if full_response is None and mode == "fast":
+                note_outcome("fast")
+                full_response = await self._afast_answer(question)
+            if full_response is not None:
+                yield sse_event(full_response)
+            else:
+                note_outcome("pipeline")
+                state = self._initial_state(question)
+                config = self._arun_config(question)
+                try:
+                    async for update in self.stream_graph.astream(state, config=config, stream_mode="updates"):
+                        for node, node_state in update.items():
+                            state.update(node_state)
+                            yield sse_event(STAGE_EVENTS[node], event="stage")
+                finally:
+                    self._discard_speculation(config)
+
+                if state.get("question_type") == "casual":
+                    full_response = state["final_response"]
+                    yield sse_event(full_response)
+                else:
+                    full_response = ""
+                    async for chunk in self._astream_final_response(state):
+                        full_response += chunk
+                        yield sse_event(chunk)
+                await asyncio.to_thread(semantic_cache.store, self.subject, question, full_response)
+            answer = full_response
+
+            # Store in cache with 24-hour expiry
+            await response_cache.aset(cache_key, answer, ex=86400)
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            # Hand the answer (or the error) to any waiting requests. This also runs if the
+            # client disconnects while the answer is being stored, so the flight is never left open.
+            response_cache.afinish_flight(cache_key, answer, None if answer is not None else error)
+        yield sse_event("", event="done")
+      
 # --- Main execution block ---
 def main():
     """
@@ -0,0 +1,136 @@
+"""
+embedding_batcher.py
+
+Micro-batching for query-time embeddings. Under concurrent load, encoding each query on
+its own means many single-item forward passes competing for the CPU; one batched pass
+over the same texts is much cheaper.
+
+EmbeddingBatcher queues texts from any number of caller threads. A single worker thread
+takes the first waiting text, collects more for up to `max_wait_ms` (or until
+`max_batch_size`), encodes them with one call and hands each caller its vector through a
+future. Texts already queued when the worker wakes up are always taken. At low load
+(the previous batch was a single text) the worker does not wait for more, so a lone
+request pays no window.
+"""
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List
+
+import numpy as np
+
+from src import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingBatcher():
+    """Collects embedding requests from concurrent callers and encodes them in batches."""
+
+    def __init__(self, encode_fn: Callable[[List[str]], np.ndarray], max_batch_size: int = 32,
+                 max_wait_ms: float = 2.0, enabled: bool = True):
+        """
+        Args:
+            encode_fn: Embeds a list of texts in one call, returning one row per text.
+            max_batch_size (int): Most texts encoded together.
+            max_wait_ms (float): How long a batch waits for more texts once it has one.
+            enabled (bool): Set to False to encode every text on the caller's thread.
+        """
+        self.encode_fn = encode_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.enabled = enabled
+        self._queue: "queue.Queue[tuple]" = queue.Queue()  # (text, future, enqueued_at)
+        self._worker = None
+        self._start_lock = threading.Lock()
+        self._last_batch_size = 0
+        self.batches = 0
+        self.items = 0
+        self.queue_wait_seconds = 0.0
+
+    def _ensure_worker(self):
+        # (Re)starts the worker; it only stops if the interpreter is shutting down
+        if self._worker is None or not self._worker.is_alive():
+            with self._start_lock:
+                if self._worker is None or not self._worker.is_alive():
+                    self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                    self._worker.start()
+
+    def submit(self, text: str) -> Future:
+        """Queues a text; the future resolves to its embedding."""
+        future = Future()
+        if not self.enabled:
+            try:
+                future.set_result(np.asarray(self.encode_fn([text]))[0])
+            except Exception as e:
+                future.set_exception(e)
+            return future
+        self._ensure_worker()
+        self._queue.put((text, future, time.perf_counter()))
+        return future
+
+    def embed(self, text: str) -> np.ndarray:
+        """Embeds one text, batched with whatever other callers are embedding right now."""
+        return self.submit(text).result()
+
+    # --- Worker ---
+    def _collect(self) -> list:
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except queue.Empty:
+                pass
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0 or self._last_batch_size <= 1:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            try:
+                self._process(batch)
+            except BaseException as e:
+                # Never leave a caller blocked in .result(): fail whatever is still pending.
+                # Errors that are not Exceptions (e.g. SystemExit from the encoder) are
+                # wrapped so they do not propagate as such in the callers' threads.
+                logger.warning("Embedding a batch of %d texts failed: %r", len(batch), e)
+                error = e if isinstance(e, Exception) else RuntimeError(f"Embedding failed: {e!r}")
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(error)
+
+    def _process(self, batch: list):
+        self._last_batch_size = len(batch)
+        started = time.perf_counter()
+        # Identical texts in a batch are encoded once
+        texts = list(dict.fromkeys(text for text, _, _ in batch))
+        embeddings = np.asarray(self.encode_fn(texts))
+        rows = dict(zip(texts, embeddings))
+        for text, future, enqueued_at in batch:
+            self.queue_wait_seconds += started - enqueued_at
+            metrics.embedding_queue_wait.observe(started - enqueued_at)
+            future.set_result(rows[text])
+        self.batches += 1
+        self.items += len(batch)
+        metrics.embedding_batch_size.observe(len(batch))
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "avg_queue_wait_ms": round(self.queue_wait_seconds * 1000 / self.items, 3) if self.items else 0.0,
+            "queued": self._queue.qsize(),
+        }
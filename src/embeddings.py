@@ -0,0 +1,95 @@
+"""
+embeddings.py
+
+Embedding backends for the RAG engine, selected with EMBED_BACKEND:
+- "torch": the PyTorch SentenceTransformer (default)
+- "onnx":  ONNX Runtime with int8-quantized weights and batched CPU inference. PyTorch
+           is never loaded, which cuts per-worker memory and speeds up CPU-only servers.
+
+Both backends provide the encode() method of SentenceTransformer that the app uses
+(a str gives one vector, a list gives a 2-D array), so callers do not change.
+"""
+
+import os
+from typing import List, Union
+
+import numpy as np
+
+EMBED_BACKEND = os.getenv("EMBED_BACKEND", "torch")
+
+# The quantized ONNX weights published with the model on the Hugging Face Hub. Pick the
+# file matching the server CPU (e.g. onnx/model_qint8_avx512_vnni.onnx on recent Xeons,
+# onnx/model_qint8_arm64.onnx on ARM); a local .onnx path also works.
+ONNX_REPO = os.getenv("EMBED_ONNX_REPO", "sentence-transformers/all-MiniLM-L6-v2")
+ONNX_FILE = os.getenv("EMBED_ONNX_FILE", "onnx/model_quint8_avx2.onnx")
+ONNX_THREADS = int(os.getenv("EMBED_ONNX_THREADS", "0"))  # 0 lets ONNX Runtime decide
+MAX_SEQ_LENGTH = 256  # all-MiniLM-L6-v2's window; longer inputs are truncated as in PyTorch
+
+
+class OnnxEmbedder():
+    """Mean-pooled sentence embeddings from a (quantized) ONNX export of a transformer."""
+
+    def __init__(self, repo: str = ONNX_REPO, file_name: str = ONNX_FILE, threads: int = ONNX_THREADS,
+                 max_seq_length: int = MAX_SEQ_LENGTH, normalize: bool = True):
+        """
+        Args:
+            repo (str): Hugging Face repo holding the ONNX file and the tokenizer.
+            file_name (str): ONNX file inside the repo, or a local path.
+            threads (int): ONNX Runtime intra-op threads (0 = default).
+            normalize (bool): L2-normalize the outputs, like the Normalize layer at the end
+                of the all-MiniLM-L6-v2 SentenceTransformer.
+        """
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        if os.path.exists(file_name):
+            path = file_name
+        else:
+            from huggingface_hub import hf_hub_download
+            path = hf_hub_download(repo, file_name)
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = threads
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.tokenizer = AutoTokenizer.from_pretrained(repo)
+        self.max_seq_length = max_seq_length
+        self.normalize = normalize
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        encoded = self.tokenizer(texts, padding=True, truncation=True, max_length=self.max_seq_length, return_tensors="np")
+        feeds = {name: value.astype(np.int64) for name, value in encoded.items() if name in self.input_names}
+        token_embeddings = self.session.run(None, feeds)[0]
+        # Mean pooling over the real (non-padding) tokens
+        mask = encoded["attention_mask"][..., None].astype(np.float32)
+        return (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+
+    def encode(self, sentences: Union[str, List[str]], batch_size: int = 32,
+               normalize_embeddings: bool = False, **kwargs) -> np.ndarray:
+        """Embeds a text or a list of texts; other SentenceTransformer options are ignored."""
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        # Batch texts of similar length together, so little compute goes to padding
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        embeddings = [None] * len(texts)
+        for start in range(0, len(order), batch_size):
+            batch = order[start:start + batch_size]
+            for i, embedding in zip(batch, self._encode_batch([texts[i] for i in batch])):
+                embeddings[i] = embedding
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        if self.normalize or normalize_embeddings:
+            embeddings /= np.clip(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12, None)
+        return embeddings[0] if single else embeddings
+
+
+def load_embedding_model(model_name: str, backend: str = None):
+    """Loads the embedding model with the configured backend ('torch' or 'onnx')."""
+    backend = backend or EMBED_BACKEND
+    if backend == "onnx":
+        return OnnxEmbedder()
+    if backend == "torch":
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(model_name)
+    raise ValueError(f"Unknown embedding backend: {backend}. Use 'torch' or 'onnx'.")
@@ -0,0 +1,138 @@
+"""
+fast_classifier.py
+
+A local, lexical classifier that decides obvious cases before the LLM is asked.
+- Greetings and small talk ("hi", "thanks!", "how are you?") are 'casual' and get a canned reply
+- Messages with subject vocabulary or maths notation are 'subject'
+- Anything else is ambiguous and is left to the LLM (classify_question_prompt)
+
+The subject vocabulary is seeded from SAMPLE_QUESTIONS and TOPIC_EXAMPLES in
+subject_data.py plus a list of common JEE terms. Classification is a few set
+lookups, so it runs in microseconds.
+"""
+
+import re
+from typing import Optional
+
+from src.subject_data import SAMPLE_QUESTIONS, TOPIC_EXAMPLES
+
+# Words that may appear in small talk. A casual message must use only these.
+SMALL_TALK_WORDS = {
+    "hi", "hii", "hiii", "hello", "helo", "hey", "heya", "yo", "namaste", "there", "sir", "maam", "madam",
+    "teacher", "good", "morning", "afternoon", "evening", "night", "day", "how", "are", "r", "you", "u",
+    "doing", "is", "it", "going", "what", "whats", "up", "sup", "thanks", "thank", "thx", "ty", "so",
+    "much", "a", "lot", "ok", "okay", "k", "cool", "great", "nice", "awesome", "bye", "goodbye", "see",
+    "ya", "later", "lol", "yes", "no", "yeah", "nope", "fine", "i", "am", "im", "and", "all", "well",
+}
+
+# Small-talk words that make a message casual, grouped by the kind of reply they need.
+GREETING_WORDS = {"hi", "hii", "hiii", "hello", "helo", "hey", "heya", "yo", "namaste", "morning", "afternoon", "evening", "sup"}
+THANKS_WORDS = {"thanks", "thank", "thx", "ty"}
+FAREWELL_WORDS = {"bye", "goodbye", "later", "night"}
+ACK_WORDS = {"ok", "okay", "k", "cool", "great", "nice", "awesome", "fine", "yes", "yeah", "no", "nope", "lol"}
+
+CASUAL_REPLIES = {
+    "greeting": "Hi there! I'm your IIT {subject} teacher. What would you like to learn today?",
+    "thanks": "You're welcome! Feel free to ask me another {subject} question anytime.",
+    "farewell": "Goodbye! Keep practising {subject}, and come back whenever you have a doubt.",
+    "ack": "Great! Ask me any {subject} question whenever you're ready.",
+}
+
+# Common JEE terms, in addition to the words taken from subject_data.py
+SUBJECT_TERMS = {
+    # Maths
+    "derivative", "differentiation", "differentiate", "integral", "integration", "integrate", "limit",
+    "calculus", "algebra", "equation", "quadratic", "polynomial", "matrix", "matrice", "determinant",
+    "vector", "probability", "permutation", "combination", "binomial", "logarithm", "log", "sin", "cos",
+    "tan", "trigonometry", "geometry", "triangle", "circle", "parabola", "ellipse", "hyperbola",
+    "sequence", "series", "function", "theorem", "complex", "imaginary", "slope", "graph", "area",
+    # Physics
+    "force", "newton", "velocity", "acceleration", "momentum", "energy", "power", "gravity",
+    "gravitation", "friction", "torque", "motion", "projectile", "wave", "sound", "light", "optics",
+    "lens", "mirror", "refraction", "reflection", "current", "voltage", "resistance", "circuit",
+    "magnet", "magnetic", "electric", "charge", "capacitor", "kirchhoff", "ohm", "thermodynamics",
+    "heat", "temperature", "entropy", "pressure", "density", "oscillation", "pendulum", "photon",
+    # Chemistry
+    "mole", "molarity", "molality", "atom", "atomic", "molecule", "electron", "proton", "neutron",
+    "orbital", "bond", "ionic", "covalent", "reaction", "catalyst", "acid", "base", "ph", "salt",
+    "oxidation", "reduction", "redox", "equilibrium", "chatelier", "stoichiometry", "organic",
+    "alkane", "alkene", "alkyne", "benzene", "isomer", "sn1", "sn2", "vsepr", "hybridization",
+    "enthalpy", "periodic", "element", "compound", "solution", "titration", "electrochemistry",
+}
+
+# Words in the sample questions that are too generic to signal a subject question
+_GENERIC_WORDS = {
+    "what", "whats", "why", "how", "does", "do", "is", "are", "the", "a", "an", "and", "of", "in", "to",
+    "it", "its", "can", "you", "with", "where", "when", "they", "we", "i", "dont", "get",
+    "useful", "example", "used", "work", "difference", "between", "come", "back", "down", "feel",
+    "hot", "hands", "together", "makes", "enters", "important", "explain", "calculated", "thrown",
+    "upward", "rub", "topic", "subtopic", "examples", "s", "theory", "transfer", "laws",
+}
+
+# Maths notation: arithmetic between numbers, equations, powers, calculus shorthand
+_MATH_PATTERN = re.compile(r"\d\s*[-+*/^=]\s*\d|[=^∫√π∑]|\bd[a-z]\s*/\s*d[a-z]\b|\b\d+[a-z]\b")
+_WORD_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def _words(text: str) -> list:
+    """Lower-cased word tokens with apostrophes removed (what's -> whats)."""
+    return _WORD_PATTERN.findall(text.lower().replace("'", "").replace("’", ""))
+
+
+def _stem(word: str) -> str:
+    """A tiny plural stemmer, enough to match 'derivatives' with 'derivative'."""
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def _build_subject_vocabulary() -> set:
+    vocabulary = {_stem(w) for w in SUBJECT_TERMS}
+    for questions in SAMPLE_QUESTIONS.values():
+        for question in questions:
+            vocabulary.update(_stem(w) for w in _words(question) if w not in _GENERIC_WORDS)
+    for examples in TOPIC_EXAMPLES.values():
+        vocabulary.update(_stem(w) for w in _words(examples) if w not in _GENERIC_WORDS)
+    return vocabulary
+
+
+SUBJECT_VOCABULARY = _build_subject_vocabulary()
+
+
+def classify_fast(question: str) -> Optional[str]:
+    """
+    Classifies a message locally.
+
+    Returns:
+        'casual' or 'subject' when the decision is confident, otherwise None
+        (the LLM classifier should decide).
+    """
+    words = _words(question)
+    if not words:
+        return None
+    is_subject = _MATH_PATTERN.search(question.lower()) is not None or any(_stem(w) in SUBJECT_VOCABULARY for w in words)
+    is_casual = len(words) <= 8 and all(w in SMALL_TALK_WORDS for w in words) and _casual_kind(words) is not None
+    if is_subject and not is_casual:
+        return "subject"
+    if is_casual and not is_subject:
+        return "casual"
+    return None
+
+
+def _casual_kind(words: list) -> Optional[str]:
+    """Which kind of casual reply fits the message."""
+    if any(w in THANKS_WORDS for w in words):
+        return "thanks"
+    if any(w in FAREWELL_WORDS for w in words):
+        return "farewell"
+    if any(w in GREETING_WORDS for w in words) or words[:2] in (["how", "are"], ["how", "r"], ["whats", "up"]):
+        return "greeting"
+    if any(w in ACK_WORDS for w in words):
+        return "ack"
+    return None
+
+
+def casual_reply(question: str, subject: str) -> str:
+    """Returns a canned friendly reply for a message classified as 'casual'."""
+    kind = _casual_kind(_words(question)) or "greeting"
+    return CASUAL_REPLIES[kind].format(subject=subject.capitalize())
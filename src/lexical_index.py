@@ -0,0 +1,155 @@
+"""
+lexical_index.py
+
+A persisted BM25 (inverted) index over the textbook chunks, used next to the vector store.
+
+Exact terms matter in JEE questions ("Le Chatelier", "SN2", "dy/dx", "Kirchhoff") and
+MiniLM embeddings tend to blur them. This index ranks chunks by BM25 over their words.
+- Storage: a SQLite file with an FTS5 full-text table (the inverted index) over a plain
+  table of chunks keyed by the same IDs as ChromaDB, so upserts are idempotent
+- Ranking: FTS5's built-in bm25(), computed inside SQLite, so queries take milliseconds
+  even on a large library
+- Tokenizer: unicode61 with Porter stemming ("derivatives" matches "derivative")
+
+SQLite and FTS5 ship with Python, so there is no extra dependency.
+"""
+
+import re
+import sqlite3
+import threading
+from typing import Dict, List, Optional
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS chunks (
+    rowid INTEGER PRIMARY KEY,
+    chunk_id TEXT UNIQUE NOT NULL,
+    text TEXT NOT NULL,
+    book TEXT,
+    page INTEGER,
+    source TEXT,
+    library TEXT,
+    subject TEXT,
+    grade TEXT,
+    chapter TEXT
+);
+CREATE INDEX IF NOT EXISTS chunks_book ON chunks(book);
+CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5(
+    text, content='chunks', content_rowid='rowid', tokenize='porter unicode61'
+);
+CREATE TRIGGER IF NOT EXISTS chunks_ai AFTER INSERT ON chunks BEGIN
+    INSERT INTO chunks_fts(rowid, text) VALUES (new.rowid, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS chunks_ad AFTER DELETE ON chunks BEGIN
+    INSERT INTO chunks_fts(chunks_fts, rowid, text) VALUES ('delete', old.rowid, old.text);
+END;
+"""
+
+# Words that match nearly every chunk; dropping them keeps the posting lists short
+STOP_WORDS = {
+    "a", "an", "the", "is", "are", "was", "were", "be", "been", "of", "in", "on", "at", "to", "for",
+    "and", "or", "by", "with", "as", "it", "its", "this", "that", "these", "those", "what", "whats",
+    "why", "how", "when", "where", "which", "who", "do", "does", "did", "can", "could", "i", "me",
+    "my", "you", "your", "we", "they", "from", "into", "about", "explain", "please", "tell",
+}
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def query_terms(query: str) -> List[str]:
+    """The distinct search terms of a query, in order (lower-cased, stop words removed)."""
+    terms = []
+    for term in _TOKEN_PATTERN.findall(query.lower().replace("'", "").replace("’", "")):
+        if term not in STOP_WORDS and term not in terms:
+            terms.append(term)
+    return terms
+
+
+class LexicalIndex():
+    """BM25 search over textbook chunks, stored in a SQLite FTS5 index."""
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path (str): Location of the SQLite file (created on first use).
+        """
+        self.path = path
+        self._local = threading.local()  # one connection per thread
+        connection = self._connect()
+        # Indexes created before the subject/grade/chapter metadata gain those columns
+        columns = {row[1] for row in connection.execute("PRAGMA table_info(chunks)")}
+        if columns and "chapter" not in columns:
+            for column in ("subject", "grade", "chapter"):
+                connection.execute(f"ALTER TABLE chunks ADD COLUMN {column} TEXT")
+        connection.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path)
+            # WAL lets searches run while a book is being ingested
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def __len__(self):
+        return self._connect().execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def add(self, ids: List[str], chunks: List[Dict]):
+        """Adds chunks under their vector-store IDs; chunks already indexed are skipped."""
+        connection = self._connect()
+        with connection:
+            connection.executemany(
+                "INSERT OR IGNORE INTO chunks (chunk_id, text, book, page, source, library, subject, grade, chapter) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(chunk_id, chunk['text'], chunk['book'], chunk['page'], chunk['source'], chunk.get('library', chunk['book']),
+                  chunk.get('subject', ''), chunk.get('grade', ''), chunk.get('chapter', ''))
+                 for chunk_id, chunk in zip(ids, chunks)]
+            )
+
+    def search(self, query: str, top_k: int = 5, books: Optional[List[str]] = None) -> List[Dict]:
+        """
+        Returns the top-k chunks by BM25 score, best first (each with its 'id' and 'score'),
+        optionally only from the given books.
+        """
+        terms = query_terms(query)
+        if not terms:
+            return []
+        # Quoted terms joined with OR: any chunk containing a term is a candidate
+        match = " OR ".join(f'"{term}"' for term in terms)
+        book_filter = f" AND c.book IN ({', '.join('?' * len(books))})" if books else ""
+        rows = self._connect().execute(
+            "SELECT c.chunk_id, c.text, c.book, c.page, c.source, bm25(chunks_fts) AS score "
+            "FROM chunks_fts JOIN chunks c ON c.rowid = chunks_fts.rowid "
+            f"WHERE chunks_fts MATCH ?{book_filter} ORDER BY score LIMIT ?",
+            (match, *(books or []), top_k)
+        ).fetchall()
+        # bm25() is negative, lower is better; report it as a positive score
+        return [{'id': row[0], 'text': row[1], 'book': row[2], 'page': row[3], 'source': row[4], 'score': -row[5]}
+                for row in rows]
+
+    def sample(self, n: int) -> List[Dict]:
+        """Returns up to n random chunks (used by the retrieval benchmark)."""
+        rows = self._connect().execute(
+            "SELECT chunk_id, text, book, page, source FROM chunks ORDER BY random() LIMIT ?", (n,)
+        ).fetchall()
+        return [{'id': row[0], 'text': row[1], 'book': row[2], 'page': row[3], 'source': row[4]} for row in rows]
+
+    def delete_book(self, book: str) -> int:
+        """Removes every chunk of a book (before it is re-ingested); returns how many."""
+        connection = self._connect()
+        with connection:
+            return connection.execute("DELETE FROM chunks WHERE book = ?", (book,)).rowcount
+
+    def clear(self):
+        """Removes every chunk (used before a full rebuild)."""
+        connection = self._connect()
+        with connection:
+            connection.execute("DELETE FROM chunks")
+            connection.execute("INSERT INTO chunks_fts(chunks_fts) VALUES ('rebuild')")
+
+    def optimize(self):
+        """Merges the index segments; worth running after a large ingestion."""
+        connection = self._connect()
+        with connection:
+            connection.execute("INSERT INTO chunks_fts(chunks_fts) VALUES ('optimize')")
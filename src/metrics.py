@@ -0,0 +1,141 @@
+"""
+metrics.py
+
+Prometheus metrics for the tutor, served by the app at /metrics:
+- tutor_node_latency_seconds{node}:           time spent in each graph node
+- tutor_llm_latency_seconds{stage}:           duration of each LLM call, by the node (or stage) that made it
+- tutor_llm_first_token_seconds{stage}:       time to the first streamed token
+- tutor_llm_tokens_total{stage, kind}:        input and output tokens
+- tutor_cache_lookups_total{cache, result}:   hits and misses of the answer cache ("local", "redis"),
+                                              the stage memo ("stage_local", "stage_redis") and
+                                              the semantic cache ("semantic")
+- tutor_retrieval_latency_seconds:            textbook retrieval, and how long the explanation waited for it
+- tutor_embedding_batch_size, tutor_embedding_queue_wait_seconds: query embedding micro-batches
+- tutor_rate_limit_rejections_total{endpoint}
+- tutor_request_outcomes_total{outcome}:     how requests were answered (pipeline, fast, cache_hit, casual)
+- tutor_requests_in_flight{endpoint}, tutor_request_latency_seconds{endpoint}, tutor_request_errors_total{endpoint}
+
+Node and LLM timings come from a LangChain callback handler attached to every run in the
+process, so they work without LangSmith. Set METRICS_ENABLED=false to detach it.
+
+With several worker processes, set PROMETHEUS_MULTIPROC_DIR to an empty directory so
+/metrics aggregates all workers (see the prometheus_client multiprocess docs).
+"""
+
+import os
+import threading
+import time
+from contextvars import ContextVar
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.tracers.context import register_configure_hook
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, generate_latest
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+
+# LLM calls take from tens of milliseconds (cached by the provider) to a minute
+LLM_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 7.5, 10.0, 15.0, 20.0, 30.0, 60.0)
+
+node_latency = Histogram("tutor_node_latency_seconds", "Time spent in each graph node", ["node"], buckets=LLM_BUCKETS)
+llm_latency = Histogram("tutor_llm_latency_seconds", "Duration of LLM calls", ["stage"], buckets=LLM_BUCKETS)
+llm_first_token = Histogram("tutor_llm_first_token_seconds", "Time to the first streamed token of an LLM call", ["stage"], buckets=LLM_BUCKETS)
+llm_tokens = Counter("tutor_llm_tokens_total", "Tokens sent to and generated by the LLM", ["stage", "kind"])
+cache_lookups = Counter("tutor_cache_lookups_total", "Cache lookups by cache tier and result", ["cache", "result"])
+retrieval_latency = Histogram("tutor_retrieval_latency_seconds", "Textbook retrieval latency")
+retrieval_wait = Histogram("tutor_retrieval_wait_seconds", "How long the explanation step waited for retrieval")
+embedding_batch_size = Histogram("tutor_embedding_batch_size", "Texts encoded per query embedding batch", buckets=(1, 2, 4, 8, 16, 32, 64, 128))
+embedding_queue_wait = Histogram("tutor_embedding_queue_wait_seconds", "Time a query embedding waited to be batched",
+                                 buckets=(0.0005, 0.001, 0.002, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25))
+rate_limit_rejections = Counter("tutor_rate_limit_rejections_total", "Requests rejected by the rate limiter", ["endpoint"])
+request_outcomes = Counter("tutor_request_outcomes_total", "Answered requests by how they were answered", ["outcome"])
+requests_in_flight = Gauge("tutor_requests_in_flight", "Requests being answered", ["endpoint"], multiprocess_mode="livesum")
+request_latency = Histogram("tutor_request_latency_seconds", "End-to-end request latency", ["endpoint"], buckets=LLM_BUCKETS)
+request_errors = Counter("tutor_request_errors_total", "Requests that failed with a server error", ["endpoint"])
+
+
+def record_cache(cache: str, hit: bool):
+    cache_lookups.labels(cache=cache, result="hit" if hit else "miss").inc()
+
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """
+    Times graph nodes and LLM calls and counts tokens. One instance serves every run;
+    runs in flight are keyed by run id.
+
+    LLM calls are labelled with the graph node that made them, or with the "stage" entry
+    of the run metadata for calls made outside the graph (e.g. fast mode), else "other".
+    """
+
+    def __init__(self):
+        self._runs = {}  # run_id -> (name, started_at, first_token_seen)
+        self._lock = threading.Lock()
+
+    def _start(self, run_id, name: str):
+        with self._lock:
+            self._runs[run_id] = (name, time.perf_counter(), False)
+
+    def _pop(self, run_id):
+        with self._lock:
+            return self._runs.pop(run_id, None)
+
+    # --- Graph nodes ---
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, metadata=None, name=None, **kwargs):
+        node = (metadata or {}).get("langgraph_node")
+        if node is None or name != node:
+            return
+        # A node's own runnable may share its name; time only the outermost run
+        parent = self._runs.get(parent_run_id)
+        if parent is None or parent[0] != node:
+            self._start(run_id, node)
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        run = self._pop(run_id)
+        if run is not None:
+            node_latency.labels(node=run[0]).observe(time.perf_counter() - run[1])
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._pop(run_id)
+
+    # --- LLM calls ---
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+        metadata = metadata or {}
+        self._start(run_id, metadata.get("langgraph_node") or metadata.get("stage") or "other")
+
+    def on_llm_new_token(self, token, *, run_id, **kwargs):
+        with self._lock:
+            run = self._runs.get(run_id)
+            if run is None or run[2]:
+                return
+            self._runs[run_id] = (run[0], run[1], True)
+        llm_first_token.labels(stage=run[0]).observe(time.perf_counter() - run[1])
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        run = self._pop(run_id)
+        if run is None:
+            return
+        stage = run[0]
+        llm_latency.labels(stage=stage).observe(time.perf_counter() - run[1])
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if usage:
+                    llm_tokens.labels(stage=stage, kind="input").inc(usage.get("input_tokens", 0))
+                    llm_tokens.labels(stage=stage, kind="output").inc(usage.get("output_tokens", 0))
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._pop(run_id)
+
+
+# Attach the handler to every LangChain run in the process (graph, nodes and LLM calls)
+metrics_handler = MetricsCallbackHandler()
+register_configure_hook(ContextVar("tutor_metrics_handler", default=metrics_handler if METRICS_ENABLED else None), True)
+
+
+def render() -> tuple:
+    """Returns the metrics page and its content type, merging all workers in multiprocess mode."""
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -0,0 +1,205 @@
+"""
+prewarm.py
+
+Fills the response cache ahead of traffic, e.g. before exams, so the first student to ask
+a popular question gets a cached answer instead of waiting for the full pipeline.
+
+Two modes:
+- Pre-warm: answers every question of the given question files (one per subject, one
+  question per line, '#' starts a comment) and/or the SAMPLE_QUESTIONS of subject_data.py
+- Refresh-ahead (--refresh-ahead): renews the most requested answers (counted per key in
+  Redis by the teacher, see response_cache.py) before they expire
+
+Either way, answers with at least --fresh-for seconds left are skipped. The others are
+computed with at most --concurrency pipelines at a time, started no faster than --rate
+per minute (retrying failures with back-off), and written with --ttl. At the end a report
+shows coverage, duration, token usage and the estimated cost.
+
+Usage (from the repository root):
+    python -m src.prewarm --questions maths=top_maths.txt physics=top_physics.txt --samples
+    python -m src.prewarm --refresh-ahead --top 200 --fresh-for 21600
+"""
+
+import argparse
+import asyncio
+import os
+import time
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+from dotenv import load_dotenv
+from langchain_core.callbacks import get_usage_metadata_callback
+
+from src.ai_iit_teacher import response_cache
+from src.fast_classifier import classify_fast
+from src.subject_data import SAMPLE_QUESTIONS
+from src.teacher_registry import SUBJECTS, TeacherRegistry
+
+load_dotenv()
+
+
+def read_questions(path: str) -> List[str]:
+    """Reads one question per line, skipping blank lines and '#' comments."""
+    with open(path, encoding="utf-8") as f:
+        lines = [line.strip() for line in f]
+    return [line for line in lines if line and not line.startswith("#")]
+
+
+def parse_hot_key(key: str) -> Tuple[str, str, str]:
+    """Splits a response cache key ('[fast:]subject:question') into (subject, question, mode)."""
+    mode = "thorough"
+    if key.startswith("fast:"):
+        mode, key = "fast", key[len("fast:"):]
+    subject, _, question = key.partition(":")
+    return subject, question, mode
+
+
+class Pacer():
+    """Spaces out pipeline starts so the LLM provider sees at most `rate` per minute."""
+
+    def __init__(self, rate: float):
+        self.interval = 60.0 / rate if rate > 0 else 0.0
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        async with self._lock:
+            delay = self._next - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._next = max(self._next, time.monotonic()) + self.interval
+
+
+class Report():
+    """Per-subject outcome counts and token usage of a run."""
+
+    def __init__(self):
+        self.counts: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self.input_tokens = 0
+        self.output_tokens = 0
+
+    def add(self, subject: str, outcome: str):
+        self.counts[subject][outcome] += 1
+
+    def add_usage(self, usage: dict):
+        for model_usage in usage.values():
+            self.input_tokens += model_usage.get("input_tokens", 0)
+            self.output_tokens += model_usage.get("output_tokens", 0)
+
+    def print(self, seconds: float, input_price: float, output_price: float):
+        print(f"{'subject':<10} {'questions':>9} {'fresh':>6} {'warmed':>7} {'failed':>7} {'casual':>7} {'coverage':>9}")
+        for subject, counts in sorted(self.counts.items()):
+            total = sum(counts.values())
+            answerable = total - counts["casual"]
+            covered = counts["fresh"] + counts["warmed"]
+            coverage = covered / answerable if answerable else 1.0
+            print(f"{subject:<10} {total:>9} {counts['fresh']:>6} {counts['warmed']:>7} {counts['failed']:>7} "
+                  f"{counts['casual']:>7} {coverage:>9.1%}")
+        cost = (self.input_tokens * input_price + self.output_tokens * output_price) / 1_000_000
+        print(f"duration: {seconds:.1f} s  tokens: {self.input_tokens} in / {self.output_tokens} out  "
+              f"estimated cost: ${cost:.4f}")
+
+
+async def warm(teacher, subject: str, question: str, mode: str, args, pacer: Pacer,
+               semaphore: asyncio.Semaphore, report: Report):
+    """Answers one question and caches it, unless its cached answer is still fresh."""
+    if classify_fast(question) == "casual":
+        report.add(subject, "casual")  # answered locally, never cached
+        return
+    key = teacher._cache_key(question, mode)
+    remaining = await response_cache.attl(key)
+    if remaining is not None and remaining >= args.fresh_for:
+        report.add(subject, "fresh")
+        return
+    async with semaphore:
+        for attempt in range(args.retries + 1):
+            await pacer.wait()
+            try:
+                # Semantic cache entries live in the app's processes, not in this one
+                with get_usage_metadata_callback() as usage:
+                    answer = await teacher.acompute_answer(question, mode, semantic=False)
+                report.add_usage(usage.usage_metadata)
+                await response_cache.aset(key, answer, ex=args.ttl)
+                if response_cache.stats()["redis"] != "up":
+                    # Redis went away during the run: the answer only reached this process
+                    print(f"failed [{subject}] {question[:60]}: Redis is unreachable, the answer was not stored")
+                    report.add(subject, "failed")
+                    return
+                report.add(subject, "warmed")
+                return
+            except Exception as e:
+                if attempt == args.retries:
+                    print(f"failed [{subject}] {question[:60]}: {e}")
+                    report.add(subject, "failed")
+                    return
+                await asyncio.sleep(2 ** attempt)  # back off, e.g. on provider rate limits
+
+
+async def run(args) -> Report:
+    if response_cache.stats()["redis"] == "disabled":
+        raise SystemExit("Redis is disabled (REDIS_ENABLED=false or the redis package is missing); "
+                         "answers cached by this process would not reach the app")
+    if not await response_cache.aping():
+        raise SystemExit(f"Redis at {os.getenv('REDIS_HOST', 'localhost')}:{os.getenv('REDIS_PORT', '6379')} "
+                         "is unreachable; answers cached by this process would not reach the app")
+    registry = TeacherRegistry(os.getenv("GOOGLE_API_KEY"))
+    registry.start()
+
+    jobs = []  # (subject, question, mode)
+    if args.refresh_ahead:
+        hot = await response_cache.ahot_keys(args.top, days=args.days)
+        if not hot:
+            print("No hot keys found; refresh-ahead needs Redis with HOT_KEY_TRACKING on in the app")
+        jobs = [parse_hot_key(key) for key, _ in hot]
+        jobs = [(subject, question, mode) for subject, question, mode in jobs if subject in SUBJECTS and question]
+    else:
+        for spec in args.questions:
+            subject, _, path = spec.partition("=")
+            if subject not in SUBJECTS or not path:
+                raise SystemExit(f"--questions expects SUBJECT=FILE with SUBJECT in {SUBJECTS}, got {spec!r}")
+            jobs += [(subject, question, args.mode) for question in read_questions(path)[:args.top or None]]
+        if args.samples:
+            jobs += [(subject, question, args.mode) for subject in SUBJECTS for question in SAMPLE_QUESTIONS.get(subject, [])]
+        jobs = list(dict.fromkeys(jobs))
+
+    report = Report()
+    pacer = Pacer(args.rate)
+    semaphore = asyncio.Semaphore(args.concurrency)
+    pacing = f"{args.rate:g} per minute" if args.rate > 0 else "no rate limit"
+    print(f"{len(jobs)} questions, concurrency {args.concurrency}, {pacing}")
+    await asyncio.gather(*(warm(registry.get(subject), subject, question, mode, args, pacer, semaphore, report)
+                           for subject, question, mode in jobs))
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-warm the response cache with popular questions")
+    parser.add_argument("--questions", nargs="*", default=[], metavar="SUBJECT=FILE",
+                        help="question files, one question per line")
+    parser.add_argument("--samples", action="store_true", help="also warm SAMPLE_QUESTIONS from subject_data.py")
+    parser.add_argument("--refresh-ahead", action="store_true", help="renew the most requested cached answers")
+    parser.add_argument("--top", type=int, default=0,
+                        help="questions per file, or hot keys with --refresh-ahead (default: all / 100)")
+    parser.add_argument("--days", type=int, default=2, help="days of request counts to rank hot keys by")
+    parser.add_argument("--mode", choices=["thorough", "fast"], default="thorough")
+    parser.add_argument("--ttl", type=int, default=86400, help="expiry of the written answers, in seconds")
+    parser.add_argument("--fresh-for", type=int, default=6 * 3600,
+                        help="skip answers with at least this many seconds left")
+    parser.add_argument("--concurrency", type=int, default=4, help="pipelines running at once")
+    parser.add_argument("--rate", type=float, default=30, help="pipelines started per minute (0 = no limit)")
+    parser.add_argument("--retries", type=int, default=2)
+    parser.add_argument("--input-price", type=float, default=0.0, help="USD per million input tokens")
+    parser.add_argument("--output-price", type=float, default=0.0, help="USD per million output tokens")
+    args = parser.parse_args()
+    if args.refresh_ahead and not args.top:
+        args.top = 100
+    if not (args.questions or args.samples or args.refresh_ahead):
+        parser.error("give --questions, --samples or --refresh-ahead")
+
+    start = time.perf_counter()
+    report = asyncio.run(run(args))
+    report.print(time.perf_counter() - start, args.input_price, args.output_price)
+
+
+if __name__ == "__main__":
+    main()
@@ -64,6 +64,11 @@ Explanation: "{explanation}"
 Give a brief, one-sentence real-world analogy for this {subject} concept using everyday life. Make it simple and memorable.
 """
 
+textbook_context_prompt = """
+Relevant excerpts from the student's textbooks (use them where they help, and keep the explanation consistent with them):
+{context}
+"""
+
 finalize_response_prompt = """
 Combine all elements into a final HTML response for the student:
 
@@ -80,3 +85,20 @@ Analogy: {analogy}
 Format using HTML: <h1> for topic, <h2> for sections, <b> for key terms, <ul>/<ol> for lists, <blockquote> for takeaways.
 """
 
+
+fast_answer_prompt = """
+Answer the student's message in one step.
+
+Message: "{question}"
+
+- question_type: "casual" for greetings or small talk, otherwise "subject"
+- For casual messages, put a short friendly reply in final_response and leave the other fields empty
+- For subject questions:
+  - topic: the main {subject} topic and subtopic, as "Topic: [Main Topic] | Subtopic: [Specific Concept]"
+  - explanation: a step-by-step explanation for a beginner, in simple, conversational, encouraging language, with any formulas broken down in plain English
+  - analogy: one memorable real-world analogy from everyday life
+  - final_response: the complete answer for the student. Acknowledge the question warmly, integrate the explanation and analogy, and end with encouragement and a quick recap.
+    Format it using HTML: <h1> for topic, <h2> for sections, <b> for key terms, <ul>/<ol> for lists, <blockquote> for takeaways.
+Topic examples:
+{examples}
+"""
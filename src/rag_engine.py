@@ -6,104 +6,340 @@ Implements Retrieval-Augmented Generation (RAG) logic for IIT JEE textbook inges
 - Stores content in a vector database (ChromaDB)
 - Retrieves relevant textbook chunks for a given query
 
-Dependencies: chromadb, sentence-transformers, PyMuPDF (for PDF), tqdm
+Dependencies: chromadb, sentence-transformers (or onnxruntime, see embeddings.py), PyMuPDF (for PDF), tqdm
 """
 
 import os
+import json
+import time
+import threading
+import hashlib
 from pathlib import Path
-from typing import List, Dict, Optional
-
-# Import ChromaDB and SentenceTransformer for vector storage and embeddings
-import chromadb
-from chromadb import PersistentClient
-from sentence_transformers import SentenceTransformer
+from collections import deque
+from typing import List, Dict, Iterable, Iterator, Optional
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
 
 # Ensure tsqdm is installed for progress bars
 from tqdm import tqdm
 
-# Try to import PyMuPDF (fitz) for PDF text extraction
-# If not available, raise an ImportError
-try:
-    import fitz  # PyMuPDF
-except ImportError:
-    fitz = None
+# PDF extraction and chunking live in a module without model imports, so that
+# ingestion worker processes stay lightweight
+from src.text_extraction import extract_text_from_pdf, chunk_text, chunk_file, iter_file_chunks, page_count, file_sha256
 
-# Initialize embedding model (can use 'all-MiniLM-L6-v2' or similar)
-# SentenceTransformer is used for generating text embeddings 
-EMBED_MODEL = SentenceTransformer('all-MiniLM-L6-v2')
+# In-process LRU used to cache retrieval results per normalized query
+from src.response_cache import LocalLRUCache
 
-# Initialize ChromaDB client and collection
-CHROMA_DIR = os.path.join(os.path.dirname(__file__), 'chroma_db')
-chroma_client = PersistentClient(path=CHROMA_DIR)
+# BM25 index kept alongside the vector store, for hybrid retrieval
+from src.lexical_index import LexicalIndex
+
+# Embedding backends: PyTorch SentenceTransformer or int8-quantized ONNX Runtime
+from src.embeddings import load_embedding_model
+
+# Query embeddings from concurrent requests are encoded together in micro-batches
+from src.embedding_batcher import EmbeddingBatcher
 
+# Client for the optional retrieval sidecar that owns the model and the vector store
+from src.retrieval_service import RetrievalClient
 
+# The embedding model (can use 'all-MiniLM-L6-v2' or similar) and the ChromaDB client are
+# loaded lazily on first use, not at import time. Importing this module is therefore cheap
+# for API workers; call warm_up() (or start_background_warm_up()) to load them ahead of time.
+EMBED_MODEL_NAME = 'all-MiniLM-L6-v2'
+CHROMA_DIR = os.path.join(os.path.dirname(__file__), 'chroma_db')
 COLLECTION_NAME = 'NCERT_textbooks'
-# Create or get the collection for storing textbook data
-collection = chroma_client.get_or_create_collection(COLLECTION_NAME)
-
-# Function to extract text from a PDF file using PyMuPDF
-def extract_text_from_pdf(pdf_path: str) -> List[str]:
-    """Extracts text from a PDF file, returns a list of page texts."""
-    if fitz is None:
-        raise ImportError("PyMuPDF (fitz) is required for PDF extraction.")
-    doc = fitz.open(pdf_path)
-    return [page.get_text() for page in doc]
-
-
-# Function to chunk text into smaller pieces for better indexing
-def chunk_text(text: str, chunk_size: int = 500) -> List[str]:
-    """Splits text into chunks of ~chunk_size words."""
-    words = text.split()
-    chunks = []
-    for i in range(0, len(words), chunk_size):
-        chunk = ' '.join(words[i:i+chunk_size])
-        chunks.append(chunk)
-    return chunks
+
+# Books are partitioned by subject: each subject has its own collection (and BM25 index),
+# named COLLECTION_NAME_<subject>, so a physics question never scans maths chunks. Books
+# ingested without a subject go to the shared COLLECTION_NAME collection.
+_embed_model = None
+_chroma_client = None
+_collections = {}  # subject ('' for the shared collection) -> collection
+_load_lock = threading.Lock()
+
+def get_embed_model():
+    """Returns the embedding model (PyTorch or ONNX backend, see EMBED_BACKEND), loading it on first use."""
+    global _embed_model
+    if _embed_model is None:
+        with _load_lock:
+            if _embed_model is None:
+                _embed_model = load_embedding_model(EMBED_MODEL_NAME)
+    return _embed_model
+
+def _partition(subject: Optional[str]) -> str:
+    return (subject or '').strip().lower()
+
+def _collection_name(key: str) -> str:
+    return f"{COLLECTION_NAME}_{key}" if key else COLLECTION_NAME
+
+def get_chroma_client():
+    """Returns the ChromaDB client, opening it on first use."""
+    global _chroma_client
+    if _chroma_client is None:
+        with _load_lock:
+            if _chroma_client is None:
+                from chromadb import PersistentClient
+                _chroma_client = PersistentClient(path=CHROMA_DIR)
+    return _chroma_client
+
+def get_collection(subject: Optional[str] = None):
+    """Returns the ChromaDB collection of a subject (or the shared one), creating it if needed."""
+    key = _partition(subject)
+    collection = _collections.get(key)
+    if collection is None:
+        client = get_chroma_client()
+        with _load_lock:
+            collection = _collections.get(key)
+            if collection is None:
+                # Create or get the collection for storing textbook data
+                collection = client.get_or_create_collection(_collection_name(key))
+                _collections[key] = collection
+    return collection
+
+def _existing_collection(key: str):
+    """Returns a partition's collection, or None if nothing was ever ingested into it (never creates one)."""
+    collection = _collections.get(key)
+    if collection is None:
+        try:
+            collection = get_chroma_client().get_collection(_collection_name(key))
+        except Exception:  # the error type for a missing collection differs between chromadb versions
+            return None
+        _collections.setdefault(key, collection)
+    return collection
+
+# The BM25 indexes live in SQLite files next to chroma_db (one per subject partition) and
+# are written during ingestion
+LEXICAL_INDEX_PATH = os.path.join(os.path.dirname(__file__), 'lexical_index.sqlite3')
+_lexical_indexes = {}  # subject ('' for the shared index) -> LexicalIndex
+
+def get_lexical_index(subject: Optional[str] = None) -> LexicalIndex:
+    """Returns the BM25 index of a subject's chunks (or the shared one), opening it on first use."""
+    key = _partition(subject)
+    index = _lexical_indexes.get(key)
+    if index is None:
+        with _load_lock:
+            index = _lexical_indexes.get(key)
+            if index is None:
+                root, ext = os.path.splitext(LEXICAL_INDEX_PATH)
+                index = LexicalIndex(f"{root}_{key}{ext}" if key else LEXICAL_INDEX_PATH)
+                _lexical_indexes[key] = index
+    return index
+
+# Resolved search partitions are remembered for PARTITION_CACHE_TTL seconds, so a query
+# does not pay for a ChromaDB count() call; ingestion in this process forgets them at once
+PARTITION_CACHE_TTL = float(os.getenv("PARTITION_CACHE_TTL", "60"))
+_search_partitions = {}  # subject -> (partition, resolved_at)
+
+def search_partition(subject: Optional[str]) -> str:
+    """
+    The partition to search for a subject: its own, or the shared one if nothing has
+    been ingested for the subject (e.g. a library ingested before partitioning).
+    """
+    key = _partition(subject)
+    if not key:
+        return ''
+    resolved = _search_partitions.get(key)
+    if resolved is not None and time.monotonic() - resolved[1] < PARTITION_CACHE_TTL:
+        return resolved[0]
+    collection = _existing_collection(key)
+    partition = key if collection is not None and collection.count() > 0 else ''
+    _search_partitions[key] = (partition, time.monotonic())
+    return partition
+
+def warm_up():
+    """Loads the embedding model and opens the vector store and the BM25 index."""
+    if retrieval_client is not None:
+        return  # the retrieval service holds them
+    get_embed_model()
+    get_collection()
+    get_lexical_index()
+
+def start_background_warm_up() -> threading.Thread:
+    """Runs warm_up() in a daemon thread so app startup does not wait for it."""
+    thread = threading.Thread(target=warm_up, name="rag-warm-up", daemon=True)
+    thread.start()
+    return thread
+
+def is_ready() -> bool:
+    """True once the embedding model and vector store are loaded (by the retrieval service, if used)."""
+    if retrieval_client is not None:
+        return retrieval_client.is_ready()
+    return _embed_model is not None and '' in _collections
+
+# Optional retrieval service (see retrieval_service.py). When RETRIEVAL_SERVICE_URL is set,
+# retrieval and query embedding go to that process, and this one never loads the model
+# or opens ChromaDB for them. Ingestion (add_textbook) still runs locally.
+RETRIEVAL_SERVICE_URL = os.getenv("RETRIEVAL_SERVICE_URL", "")
+retrieval_client = RetrievalClient(
+    RETRIEVAL_SERVICE_URL,
+    timeout=float(os.getenv("RETRIEVAL_SERVICE_TIMEOUT", "10")),
+    max_connections=int(os.getenv("RETRIEVAL_SERVICE_MAX_CONNECTIONS", "16")),
+) if RETRIEVAL_SERVICE_URL else None
+
+# Backwards compatibility: EMBED_MODEL, chroma_client and collection used to be module
+# globals created at import time. They are now resolved lazily on attribute access.
+def __getattr__(name):
+    if name == 'EMBED_MODEL':
+        return get_embed_model()
+    if name == 'collection':
+        return get_collection()  # the shared collection
+    if name == 'chroma_client':
+        get_collection()
+        return _chroma_client
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# Number of chunks embedded and written to ChromaDB together during ingestion
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+
+# Caches for query-time work: embeddings per normalized query (these never change for a
+# given model) and retrieval results (these expire, since ingestion can add new chunks)
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "4096"))
+RETRIEVAL_CACHE_TTL = int(os.getenv("RETRIEVAL_CACHE_TTL", "600"))
+_retrieval_cache = LocalLRUCache(max_entries=int(os.getenv("RETRIEVAL_CACHE_SIZE", "2048")))
+
+# Retrieval mode: "vector" (embeddings only), "lexical" (BM25 only) or "hybrid" (both,
+# fused with reciprocal rank fusion). Hybrid fuses the top HYBRID_CANDIDATES of each side.
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid")
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "20"))
+RRF_K = 60  # the usual reciprocal rank fusion constant
+
+# Manifest of ingested files (content hash per file), used to skip unchanged books
+MANIFEST_PATH = os.path.join(CHROMA_DIR, 'ingest_manifest.json')
+
+# Pages handed to an ingestion worker at a time; bounds memory per task
+PAGES_PER_TASK = int(os.getenv("INGEST_PAGES_PER_TASK", "16"))
 
 # Function to add a PDF file or text file to the vector database
-def add_pdf_file(file_path: str, book_name: str, source: str = "PDF"):
-    """Ingests a textbook (PDF or .txt) and adds its content to the vector DB."""
-    if file_path.lower().endswith('.pdf'):
-        pages = extract_text_from_pdf(file_path)
-    elif file_path.lower().endswith('.txt'):
-        with open(file_path, 'r', encoding='utf-8') as f:
-            pages = [f.read()]
-    else:
-        raise ValueError("Unsupported file type. Use PDF or TXT.")
-
-    all_chunks = []
-    for page_num, page_text in enumerate(pages):
-        for chunk in chunk_text(page_text):
-            all_chunks.append({
-                'text': chunk,
-                'book': book_name,
-                'page': page_num + 1,
-                'source': source
-            })
-
-    # Embed and add to ChromaDB
-    for chunk in tqdm(all_chunks, desc=f"Indexing {book_name}"):
-        embedding = EMBED_MODEL.encode(chunk['text']).tolist()
-        collection.add(
-            documents=[chunk['text']],
-            embeddings=[embedding],
+def add_pdf_file(file_path: str, book_name: str, source: str = "PDF", batch_size: int = EMBED_BATCH_SIZE,
+                 subject: str = "", grade: str = "", chapter: str = "") -> Dict:
+    """
+    Ingests a textbook (PDF or .txt) and adds its content to the vector DB.
+    With a subject, the book goes into that subject's partition; grade and chapter are
+    stored as chunk metadata.
+
+    The book flows through a generator pipeline (pages -> chunks -> batches -> upserts),
+    so at most one page and one batch are in memory, and the first chunks are searchable
+    while the rest of the book is still being ingested. Re-running is idempotent.
+    Returns the number of chunks, the elapsed seconds and the chunks/second throughput.
+    """
+    chunks = iter_file_chunks(file_path, book_name, source, subject=_partition(subject), grade=str(grade), chapter=chapter)
+    return index_chunks(chunks, book_name, batch_size)
+
+# Function to group an iterable into lists of at most `size` items
+def batched(items: Iterable, size: int) -> Iterator[List]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+# Function to embed and store a book's chunks, reporting throughput
+def index_chunks(chunks: Iterable[Dict], book_name: str, batch_size: int = EMBED_BATCH_SIZE) -> Dict:
+    """Embeds and upserts chunks (any iterable) in batches; returns chunk count, seconds and chunks/second."""
+    start = time.perf_counter()
+    count = 0
+    with tqdm(desc=f"Indexing {book_name}", unit="chunk") as progress:
+        for batch in batched(chunks, batch_size):
+            upsert_chunks(batch)
+            count += len(batch)
+            progress.update(len(batch))
+    elapsed = time.perf_counter() - start
+    rate = count / elapsed if elapsed > 0 else 0.0
+    print(f"Indexed {count} chunks of {book_name} in {elapsed:.1f}s ({rate:.1f} chunks/s)")
+    return {'chunks': count, 'seconds': elapsed, 'chunks_per_second': rate}
+
+# Function to build a stable ID for a chunk
+def chunk_id(chunk: Dict) -> str:
+    """
+    Deterministic ID from the chunk's book, page and content, so re-ingesting
+    a book updates its chunks in place instead of adding duplicates.
+    """
+    digest = hashlib.sha256(chunk['text'].encode('utf-8')).hexdigest()[:32]
+    return f"{chunk['book']}_{chunk['page']}_{digest}"
+
+# Function to embed and write a batch of chunks in one call each
+def upsert_chunks(chunks: List[Dict]):
+    """
+    Embeds a batch of chunks with one encode() call and upserts them into their subject's
+    partition (ChromaDB collection and BM25 index), with one write per partition.
+    """
+    # Identical chunks on the same page share an ID; keep one of each
+    unique = {chunk_id(chunk): chunk for chunk in chunks}
+    texts = [chunk['text'] for chunk in unique.values()]
+    embeddings = get_embed_model().encode(texts, batch_size=len(texts)).tolist()
+    partitions = {}
+    for (cid, chunk), embedding in zip(unique.items(), embeddings):
+        partitions.setdefault(_partition(chunk.get('subject')), []).append((cid, chunk, embedding))
+    for subject, rows in partitions.items():
+        _search_partitions.pop(subject, None)
+        ids = [cid for cid, _, _ in rows]
+        get_lexical_index(subject).add(ids, [chunk for _, chunk, _ in rows])
+        get_collection(subject).upsert(
+            ids=ids,
+            documents=[chunk['text'] for _, chunk, _ in rows],
+            embeddings=[embedding for _, _, embedding in rows],
             metadatas=[{
                 'book': chunk['book'],
                 'page': chunk['page'],
-                'source': chunk['source']
-            }],
-            ids=[f"{book_name}_{chunk['page']}_{hash(chunk['text'])}"]
+                'source': chunk['source'],
+                'library': chunk.get('library', chunk['book']),
+                'subject': subject,
+                'grade': chunk.get('grade', ''),
+                'chapter': chunk.get('chapter', '')
+            } for _, chunk, _ in rows]
         )
 
-# Function to retrieve relevant textbook chunks for a given query
-def retrieve_relevant_chunks(query: str, top_k: int = 5) -> List[Dict]:
-    """Retrieves top-k relevant textbook chunks for a query."""
-    query_emb = EMBED_MODEL.encode(query).tolist()
-    results = collection.query(query_embeddings=[query_emb], n_results=top_k)
-    # Format: [{'text': ..., 'book': ..., 'page': ..., ...}, ...]
+# Function to remove a book's chunks from a partition
+def delete_book_chunks(book_name: str, subject: Optional[str] = None):
+    """
+    Deletes every chunk of a book from a subject's partition (ChromaDB collection and
+    BM25 index). Chunk IDs depend on the content, so a changed or moved book must be
+    removed before it is re-ingested, or its old chunks would stay searchable.
+    """
+    get_collection(subject).delete(where={'book': book_name})
+    get_lexical_index(subject).delete_book(book_name)
+    _search_partitions.pop(_partition(subject), None)
+
+# Function to normalize a query so trivially different spellings share cache entries
+def normalize_query(query: str) -> str:
+    return ' '.join(query.lower().split())
+
+# Query-time embeddings (retrieval queries and semantic cache questions) go through one
+# batcher: concurrent callers within EMBED_BATCH_WAIT_MS share a single encode() call.
+def _encode_queries(texts: List[str]):
+    if retrieval_client is not None:
+        return retrieval_client.embed(texts)  # one request per batch
+    return get_embed_model().encode(texts, batch_size=len(texts), normalize_embeddings=True)
+
+query_embedder = EmbeddingBatcher(
+    _encode_queries,
+    max_batch_size=int(os.getenv("EMBED_QUERY_BATCH_SIZE", "32")),
+    max_wait_ms=float(os.getenv("EMBED_BATCH_WAIT_MS", "2")),
+    enabled=os.getenv("EMBED_BATCHING", "true").lower() == "true",
+)
+
+@lru_cache(maxsize=QUERY_EMBEDDING_CACHE_SIZE)
+def _embed_normalized_query(query: str) -> tuple:
+    return tuple(query_embedder.embed(query).tolist())
+
+# Function to embed a search query, cached per normalized query
+def embed_query(query: str) -> List[float]:
+    """Returns the embedding of a query; repeated (normalized) queries are not re-encoded."""
+    return list(_embed_normalized_query(normalize_query(query)))
+
+# Function to rank chunks by embedding similarity
+def vector_search(query: str, top_k: int = 5, subject: Optional[str] = None, books: Optional[List[str]] = None) -> List[Dict]:
+    """Returns the top-k chunks of a partition nearest to the query embedding, best first."""
+    where = {'book': {'$in': list(books)}} if books else None
+    results = get_collection(subject).query(query_embeddings=[embed_query(query)], n_results=top_k, where=where)
+    # Format: [{'id': ..., 'text': ..., 'book': ..., 'page': ..., ...}, ...]
     chunks = []
-    for doc, meta in zip(results['documents'][0], results['metadatas'][0]):
+    for chunk_id, doc, meta in zip(results['ids'][0], results['documents'][0], results['metadatas'][0]):
         chunks.append({
+            'id': chunk_id,
             'text': doc,
             'book': meta['book'],
             'page': meta['page'],
@@ -111,18 +347,213 @@ def retrieve_relevant_chunks(query: str, top_k: int = 5) -> List[Dict]:
         })
     return chunks
 
+# Function to merge several rankings with reciprocal rank fusion
+def reciprocal_rank_fusion(rankings: List[List[Dict]], top_k: int, k: int = RRF_K) -> List[Dict]:
+    """
+    Scores each chunk by the sum of 1 / (k + rank) over the rankings it appears in.
+    Only ranks are used, so BM25 scores and cosine distances need no calibration.
+    """
+    scores, chunks = {}, {}
+    for ranking in rankings:
+        for rank, chunk in enumerate(ranking, start=1):
+            scores[chunk['id']] = scores.get(chunk['id'], 0.0) + 1.0 / (k + rank)
+            chunks.setdefault(chunk['id'], chunk)
+    best = sorted(scores, key=scores.get, reverse=True)[:top_k]
+    return [chunks[chunk_id] for chunk_id in best]
+
+def _search(query: str, top_k: int, mode: str, partition: str, books: Optional[List[str]]) -> List[Dict]:
+    if mode == "vector":
+        return vector_search(query, top_k, partition, books)
+    if mode == "lexical":
+        return get_lexical_index(partition).search(query, top_k, books)
+    if mode == "hybrid":
+        candidates = max(top_k, HYBRID_CANDIDATES)
+        return reciprocal_rank_fusion([get_lexical_index(partition).search(query, candidates, books),
+                                       vector_search(query, candidates, partition, books)], top_k)
+    raise ValueError(f"Unknown retrieval mode: {mode}. Use 'vector', 'lexical' or 'hybrid'.")
+
+# Function to retrieve relevant textbook chunks for a given query
+def retrieve_relevant_chunks(query: str, top_k: int = 5, use_cache: bool = True, mode: Optional[str] = None,
+                             subject: Optional[str] = None, books: Optional[List[str]] = None) -> List[Dict]:
+    """
+    Retrieves top-k relevant textbook chunks for a query (cached per normalized query).
+
+    Args:
+        mode (str): "vector", "lexical" or "hybrid" (defaults to RETRIEVAL_MODE). Hybrid
+            fuses the BM25 and vector rankings, so exact terms such as "SN2" or
+            "Kirchhoff" are found even when the embedding ranks them poorly.
+        subject (str): Search only this subject's partition (see search_partition).
+        books (list): Only return chunks from these books.
+    """
+    mode = mode or RETRIEVAL_MODE
+    cache_key = f"{mode}:{_partition(subject)}:{','.join(sorted(books or []))}:{top_k}:{normalize_query(query)}"
+    if use_cache:
+        cached = _retrieval_cache.get(cache_key)
+        if cached is not None:
+            return json.loads(cached)
+    if retrieval_client is not None:
+        # The service resolves the partition itself; this process never opens chroma_db
+        chunks = retrieval_client.retrieve(query, top_k, mode, subject, books)
+    else:
+        chunks = _search(query, top_k, mode, search_partition(subject), books)
+    chunks = [{'text': c['text'], 'book': c['book'], 'page': c['page'], 'source': c['source']} for c in chunks]
+    if use_cache:
+        _retrieval_cache.set(cache_key, json.dumps(chunks), RETRIEVAL_CACHE_TTL)
+    return chunks
+
+# Function to (re)build the BM25 index from the chunks already in the vector store
+def rebuild_lexical_index(subject: Optional[str] = None, batch_size: int = 1000) -> int:
+    """
+    Rebuilds a partition's BM25 index from ChromaDB, for libraries ingested before it
+    existed. Returns the number of chunks indexed.
+    """
+    index = get_lexical_index(subject)
+    index.clear()
+    collection = get_collection(subject)
+    total = collection.count()
+    with tqdm(total=total, desc="Building BM25 index", unit="chunk") as progress:
+        for offset in range(0, total, batch_size):
+            batch = collection.get(include=['documents', 'metadatas'], limit=batch_size, offset=offset)
+            index.add(batch['ids'], [dict(meta, text=doc) for doc, meta in zip(batch['documents'], batch['metadatas'])])
+            progress.update(len(batch['ids']))
+    index.optimize()
+    return len(index)
+
+# Functions to read and write the ingestion manifest
+def load_manifest() -> Dict:
+    """Returns {file path: {'sha256', 'book', 'chunks', ...}} for every fully ingested file."""
+    if not os.path.exists(MANIFEST_PATH):
+        return {}
+    with open(MANIFEST_PATH, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def save_manifest(manifest: Dict):
+    """Writes the manifest atomically, so a crash never leaves a half-written file."""
+    os.makedirs(os.path.dirname(MANIFEST_PATH), exist_ok=True)
+    tmp_path = MANIFEST_PATH + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, MANIFEST_PATH)
+
 # function to add pdf textbooks from a directory
-def add_textbook(dir_path:str,book_name:str):
+def add_textbook(dir_path:str, book_name:str, workers: Optional[int] = None,
+                 batch_size: int = EMBED_BATCH_SIZE, force: bool = False,
+                 subject: str = "", grade: str = "") -> Dict:
+    """
+    Ingests every PDF in a directory (or a single PDF/TXT file) into the vector DB.
+
+    Books are split into ranges of PAGES_PER_TASK pages that worker processes extract
+    and chunk in parallel, while the main process embeds and upserts each finished range
+    in batches. Only a bounded number of ranges is in flight, so memory stays flat
+    however large the library is. The manifest records each book's content hash and the
+    next page to ingest after every range: unchanged books are skipped and an
+    interrupted run resumes from the page where it stopped.
+
+    Args:
+        dir_path (str): Directory of PDFs, or the path of one PDF/TXT file.
+        book_name (str): Name of the library (stored as 'library' metadata); for a single
+            file it is also the book name.
+        workers (int): Number of extraction processes (defaults to the CPU count).
+        batch_size (int): Chunks per embedding/upsert batch.
+        force (bool): Re-ingest books even if their content hash is unchanged.
+        subject (str): Subject partition to ingest into (e.g. 'physics'); empty for the
+            shared collection.
+        grade (str): Class/grade stored as metadata (e.g. '11'). Each PDF of a directory
+            is stored as one chapter, named after the file.
+
+    Returns:
+        A summary with the number of books indexed and skipped, chunks and throughput.
+    """
+    path = Path(dir_path)
+    if not path.exists():
+        raise FileNotFoundError(f"Directory {path} does not exist.")
+
+    if path.is_file():
+        files = [(path, book_name)]
+    else:
+        files = [(pdf_path, pdf_path.stem) for pdf_path in sorted(path.glob("*.pdf"))]
+
+    # Skip books whose content is unchanged since they were fully ingested, and
+    # resume partially ingested ones from their next page
+    subject, grade = _partition(subject), str(grade)
+    manifest = load_manifest()
+    pending = []
+    for file_path, name in files:
+        key = str(file_path.resolve())
+        digest = file_sha256(str(file_path))
+        entry = manifest.get(key, {})
+        # A book moved to another subject is re-ingested into the new partition
+        same_content = not force and entry.get('sha256') == digest and entry.get('subject', '') == subject
+        if same_content and entry.get('status', 'done') == 'done':
+            print(f"Skipping {file_path.name} (unchanged)")
+            continue
+        first_page = entry.get('next_page', 1) if same_content else 1
+        if entry and not same_content:
+            # Drop the previous version (from the partition it was ingested into) first
+            print(f"Removing the previous version of {file_path.name}")
+            delete_book_chunks(entry.get('book', name), entry.get('subject', ''))
+        if first_page > 1:
+            print(f"Resuming {file_path.name} from page {first_page}")
+        manifest[key] = {'sha256': digest, 'book': name, 'library': book_name, 'subject': subject, 'grade': grade, 'status': 'partial',
+                         'next_page': first_page, 'chunks': entry.get('chunks', 0) if same_content else 0}
+        pending.append((file_path, name, key, first_page, page_count(str(file_path))))
+
+    # One task per page range, in book order
+    def tasks():
+        for file_path, name, key, first_page, pages in pending:
+            for start_page in range(first_page, pages + 1, PAGES_PER_TASK):
+                end_page = min(start_page + PAGES_PER_TASK - 1, pages)
+                yield file_path, name, key, start_page, end_page, pages
+
+    summary = {'books_indexed': 0, 'books_skipped': len(files) - len(pending), 'chunks': 0}
+    book_started = {}
+    start = time.perf_counter()
+
+    def handle(task, future):
+        """Embeds one finished page range and records progress in the manifest."""
+        file_path, name, key, start_page, end_page, pages = task
+        book_started.setdefault(key, time.perf_counter())
+        chunks = future.result()
+        for batch in batched(chunks, batch_size):
+            upsert_chunks(batch)
+        entry = manifest[key]
+        entry['chunks'] += len(chunks)
+        entry['next_page'] = end_page + 1
+        summary['chunks'] += len(chunks)
+        print(f"{name}: pages {start_page}-{end_page} of {pages} ({len(chunks)} chunks)")
+        if end_page >= pages:
+            entry['status'] = 'done'
+            entry['ingested_at'] = time.strftime('%Y-%m-%dT%H:%M:%S')
+            elapsed = time.perf_counter() - book_started[key]
+            rate = entry['chunks'] / elapsed if elapsed > 0 else 0.0
+            print(f"Indexed {name}: {entry['chunks']} chunks in {elapsed:.1f}s ({rate:.1f} chunks/s)")
+            summary['books_indexed'] += 1
+        save_manifest(manifest)
 
-    pdf_dir = Path(dir_path)
-    if not pdf_dir.exists():
-        raise FileNotFoundError(f"Directory {pdf_dir} does not exist.")
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # Ranges are handled in submission order so the manifest's next_page is always
+        # contiguous; at most 2 ranges per worker are in flight at any time.
+        max_in_flight = 2 * (workers or os.cpu_count() or 1)
+        in_flight = deque()
+        for task in tasks():
+            file_path, name, key, start_page, end_page, pages = task
+            chapter = file_path.stem if path.is_dir() else ""
+            future = pool.submit(chunk_file, str(file_path), name, "PDF", book_name, start_page, end_page,
+                                 subject=subject, grade=grade, chapter=chapter)
+            in_flight.append((task, future))
+            if len(in_flight) >= max_in_flight:
+                handle(*in_flight.popleft())
+        while in_flight:
+            handle(*in_flight.popleft())
 
-    # Add all PDF textbooks in the specified directory
-    for pdf_path in pdf_dir.glob("*.pdf"):
-        book_name = pdf_path.stem
-        print(f"Adding {pdf_path} as {book_name}")
-        add_pdf_file(str(pdf_path), book_name)
+    if summary['chunks']:
+        get_lexical_index(subject).optimize()
+    elapsed = time.perf_counter() - start
+    summary['seconds'] = elapsed
+    summary['chunks_per_second'] = summary['chunks'] / elapsed if elapsed > 0 else 0.0
+    print(f"Indexed {summary['books_indexed']} books ({summary['chunks']} chunks) in {elapsed:.1f}s, "
+          f"skipped {summary['books_skipped']} unchanged")
+    return summary
     
 if __name__=="__main__":
 
@@ -0,0 +1,236 @@
+"""
+rate_limiter.py
+
+Cost-aware token-bucket rate limiting, shared by all workers through Redis.
+- Each client (API key, or IP address) has a bucket of RATE_LIMIT_CAPACITY tokens that
+  refills at RATE_LIMIT_REFILL_PER_MINUTE tokens per minute
+- Requests are charged by the work they caused, not a flat amount: a full pipeline run
+  costs 1 token, a fast-mode answer less, a cached answer or a casual reply a fraction
+- A request is admitted if the bucket holds at least the cheapest cost, which is charged
+  up front; the rest is charged when the answer is done, once its outcome is known
+  (the teacher records it with note_outcome). Expensive requests can push the bucket
+  into debt, which delays the client's next request instead of failing this one.
+- The bucket update is one Lua script, so it is atomic across workers and costs one
+  Redis round trip
+
+Redis is optional. If it is disabled or unreachable, each worker keeps local buckets
+(so the limit applies per worker) and Redis is retried after a short back-off.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+try:
+    import redis
+    import redis.asyncio as aioredis
+except ImportError:
+    redis = None
+    aioredis = None
+
+from src import metrics
+
+logger = logging.getLogger(__name__)
+
+# Cost of a request by outcome, in "full pipeline runs"
+OUTCOME_COSTS = {
+    "pipeline": float(os.getenv("RATE_LIMIT_COST_PIPELINE", "1.0")),  # the multi-call graph
+    "fast": float(os.getenv("RATE_LIMIT_COST_FAST", "0.4")),          # one structured LLM call
+    "cache_hit": float(os.getenv("RATE_LIMIT_COST_CACHE_HIT", "0.1")),  # response or semantic cache
+    "casual": float(os.getenv("RATE_LIMIT_COST_CASUAL", "0.05")),       # canned local reply
+}
+DEFAULT_OUTCOME = "cache_hit"  # nothing noted: the answer came from the response cache
+
+# The outcome of the request being handled, noted by the teacher as it decides what to do
+_outcome: ContextVar[Optional[str]] = ContextVar("request_outcome", default=None)
+
+
+def note_outcome(outcome: str):
+    """Records how the current request is answered ('pipeline', 'fast', 'cache_hit' or 'casual')."""
+    _outcome.set(outcome)
+
+
+def reset_outcome():
+    _outcome.set(None)
+
+
+def current_outcome() -> str:
+    return _outcome.get() or DEFAULT_OUTCOME
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a client's bucket cannot cover a request; `retry_after` is in seconds."""
+
+    def __init__(self, key: str, retry_after: float):
+        super().__init__(f"Rate limit exceeded for {key}")
+        self.key = key
+        self.retry_after = retry_after
+
+
+# KEYS[1]: bucket. ARGV: capacity, refill per second, cost, minimum balance to admit.
+# Refills by the time elapsed (Redis server clock, shared by all workers), then charges
+# `cost` if the balance is at least the minimum. The balance never drops below -capacity.
+# Returns {admitted, balance}.
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local required = tonumber(ARGV[4])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local admitted = 0
+if tokens >= required then
+  tokens = math.max(-capacity, tokens - cost)
+  admitted = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(2 * capacity / rate) + 60)
+return {admitted, tostring(tokens)}
+"""
+
+
+class _LocalBuckets():
+    """The same token buckets in process memory, used when Redis is not available."""
+
+    def __init__(self):
+        self._buckets: Dict[str, tuple] = {}  # key -> (tokens, updated_at)
+        self._lock = threading.Lock()
+
+    def take(self, key: str, capacity: float, rate: float, cost: float, required: float):
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + max(0.0, now - updated_at) * rate)
+            admitted = tokens >= required
+            if admitted:
+                tokens = max(-capacity, tokens - cost)
+            self._buckets[key] = (tokens, now)
+            # Full buckets carry no information; drop them so the dict stays small
+            if len(self._buckets) > 10000:
+                self._buckets = {k: v for k, v in self._buckets.items()
+                                 if v[0] + (now - v[1]) * rate < capacity}
+        return admitted, tokens
+
+
+class TokenBucketLimiter():
+    """
+    A token-bucket limiter shared through Redis, charging requests by outcome.
+
+    Use admit() before answering and settle() afterwards, in the same context as the
+    teacher call so the outcome it noted is visible.
+    """
+
+    def __init__(self, capacity: float = 5.0, refill_per_minute: float = 5.0, host: str = 'localhost',
+                 port: int = 6379, db: int = 0, prefix: str = "ratelimit:", retry_interval: float = 30.0,
+                 use_redis: bool = True, enabled: bool = True):
+        """
+        Args:
+            capacity (float): Bucket size, i.e. how many full pipeline runs a client can burst.
+            refill_per_minute (float): Tokens added back per minute.
+            prefix (str): Prefix of the Redis bucket keys.
+            retry_interval (float): Seconds to wait before retrying an unreachable Redis.
+            use_redis (bool): Set to False to keep buckets per worker only.
+            enabled (bool): Set to False to admit every request.
+        """
+        self.capacity = capacity
+        self.rate = refill_per_minute / 60.0
+        self.prefix = prefix
+        self.retry_interval = retry_interval
+        self.enabled = enabled
+        self.min_cost = min(OUTCOME_COSTS.values())
+        self.local = _LocalBuckets()
+        self._aredis = None
+        self._script = None
+        if use_redis and aioredis is not None:
+            self._aredis = aioredis.Redis(host=host, port=port, db=db, socket_connect_timeout=0.5, socket_timeout=0.5)
+            self._script = self._aredis.register_script(TOKEN_BUCKET_SCRIPT)
+        self._redis_down_until = 0.0
+        self.admitted = 0
+        self.rejected = 0
+        self._settling = set()  # settle() tasks, referenced until done
+
+    # --- Redis availability ---
+    def _redis_available(self) -> bool:
+        return self._aredis is not None and time.time() >= self._redis_down_until
+
+    def _mark_redis_down(self, error: Exception):
+        if time.time() >= self._redis_down_until:
+            logger.warning("Redis unavailable for rate limiting (%s); using per-worker buckets for %.0fs",
+                           error, self.retry_interval)
+        self._redis_down_until = time.time() + self.retry_interval
+
+    async def _take(self, key: str, cost: float, required: float):
+        if self._redis_available():
+            try:
+                admitted, tokens = await self._script(keys=[self.prefix + key],
+                                                      args=[self.capacity, self.rate, cost, required])
+                return bool(admitted), float(tokens)
+            except redis.RedisError as e:
+                self._mark_redis_down(e)
+        return self.local.take(key, self.capacity, self.rate, cost, required)
+
+    # --- API ---
+    async def admit(self, key: str, endpoint: str = ""):
+        """
+        Charges the cheapest cost up front, or raises RateLimitExceeded if the bucket
+        cannot cover it. Also clears the outcome noted by a previous request.
+        """
+        reset_outcome()
+        if not self.enabled:
+            return
+        admitted, tokens = await self._take(key, self.min_cost, self.min_cost)
+        if not admitted:
+            self.rejected += 1
+            metrics.rate_limit_rejections.labels(endpoint=endpoint).inc()
+            raise RateLimitExceeded(key, retry_after=(self.min_cost - tokens) / self.rate)
+        self.admitted += 1
+
+    async def settle(self, key: str) -> str:
+        """
+        Charges the rest of the request's cost, by the outcome the teacher noted; returns
+        the outcome. The charge runs to completion even if the caller is cancelled (e.g.
+        the client of a stream disconnected), so abandoned requests are still paid for.
+        """
+        # The task runs in a copy of this context, so it sees the noted outcome
+        task = asyncio.ensure_future(self._settle(key))
+        self._settling.add(task)
+        task.add_done_callback(self._settling.discard)
+        return await asyncio.shield(task)
+
+    async def _settle(self, key: str) -> str:
+        outcome = current_outcome()
+        metrics.request_outcomes.labels(outcome=outcome).inc()
+        extra = OUTCOME_COSTS.get(outcome, 1.0) - self.min_cost
+        if self.enabled and extra > 0:
+            await self._take(key, extra, -self.capacity)  # always charged; the balance floor is -capacity
+        return outcome
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "backend": "local" if not self._redis_available() else "redis",
+            "capacity": self.capacity,
+            "refill_per_minute": self.rate * 60,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+        }
+
+
+# API keys that get their own bucket; requests without one of these are keyed by IP
+API_KEYS = {key.strip() for key in os.getenv("RATE_LIMIT_API_KEYS", "").split(",") if key.strip()}
+
+
+def client_key(api_key: Optional[str], client_ip: Optional[str]) -> str:
+    """The bucket of a request: its API key if it is a known one, else its IP address."""
+    if api_key and api_key in API_KEYS:
+        return "key:" + hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+    return f"ip:{client_ip or 'unknown'}"
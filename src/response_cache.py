@@ -0,0 +1,467 @@
+"""
+response_cache.py
+
+Two-tier cache for final answers, shared by the sync and async teacher entry points.
+- Tier 1: an in-process LRU with TTL, bounded by entry count and total size
+- Tier 2: Redis, shared by all workers (optional)
+- Single-flight: concurrent misses on the same key are coalesced, so only one
+  pipeline run happens and the other requests wait for its result
+- Hot keys: requests per key are counted in process and added to daily Redis sorted
+  sets every few seconds, so popular entries can be renewed before they expire (see
+  prewarm.py) without a Redis round trip per request
+
+Redis is optional. If the package is missing or the server is unreachable, the cache
+keeps working with the local tier and retries Redis after a short back-off.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+try:
+    import redis
+    import redis.asyncio as aioredis
+except ImportError:
+    redis = None
+    aioredis = None
+
+from src.metrics import record_cache
+
+logger = logging.getLogger(__name__)
+
+# Request counts per key live in one sorted set per UTC day, kept for HOT_KEYS_DAYS days
+HOT_KEYS_PREFIX = "hot_keys:"
+HOT_KEYS_DAYS = 3
+
+
+def _record(metric_label: Optional[str], tier: str, hit: bool):
+    record_cache(f"{metric_label}_{tier}" if metric_label else tier, hit)
+
+
+def _hot_keys_set(days_ago: int = 0) -> str:
+    return HOT_KEYS_PREFIX + time.strftime("%Y%m%d", time.gmtime(time.time() - days_ago * 86400))
+
+
+class LocalLRUCache():
+    """A thread-safe in-process LRU cache with per-entry TTL and a memory bound."""
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 32 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (value, expires_at, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires_at, size = item
+            if expires_at < time.time():
+                del self._data[key]
+                self._bytes -= size
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, ttl: int):
+        size = len(value.encode('utf-8'))
+        if size > self.max_bytes:
+            return  # too big to keep locally
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._bytes -= old[2]
+            self._data[key] = (value, time.time() + ttl, size)
+            self._bytes += size
+            # Evict least recently used entries until both bounds hold
+            while len(self._data) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, _, evicted_size) = self._data.popitem(last=False)
+                self._bytes -= evicted_size
+
+    def ttl(self, key: str) -> Optional[float]:
+        """Returns the remaining lifetime of a key in seconds, or None if it is absent."""
+        with self._lock:
+            item = self._data.get(key)
+        if item is None or item[1] < time.time():
+            return None
+        return item[1] - time.time()
+
+
+class _LeaderCancelled(Exception):
+    """Tells the callers waiting on a flight that its leader gave up, so they retry."""
+
+
+def _waiter_error(error: Optional[BaseException]) -> Optional[BaseException]:
+    """
+    The error handed to callers waiting on a flight. Errors of the computation are
+    passed on. If the leader was cancelled (e.g. its client disconnected), the waiters
+    are told to retry instead, so one of them takes over.
+    """
+    if error is not None and not isinstance(error, Exception):
+        return _LeaderCancelled()
+    return error
+
+
+class _Flight():
+    """One in-progress computation that concurrent sync callers can wait on."""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result: Optional[str] = None
+        self.error: Optional[BaseException] = None
+
+
+class ResponseCache():
+    """
+    Local LRU in front of an optional Redis, with single-flight protection.
+
+    The sync methods (get/set/get_or_compute) are used by teach/teach_stream and the
+    async ones (aget/aset/aget_or_compute) by ateach/ateach_stream.
+    """
+
+    def __init__(self, host: str = 'localhost', port: int = 6379, db: int = 0,
+                 ttl: int = 86400, local_ttl: int = 300, local_max_entries: int = 1024,
+                 local_max_bytes: int = 32 * 1024 * 1024, max_connections: int = 50,
+                 retry_interval: float = 30.0, use_redis: bool = True, track_hot_keys: bool = True,
+                 hot_keys_flush_interval: float = 10.0, hot_keys_max_pending: int = 10000):
+        """
+        Args:
+            ttl (int): Default expiry for Redis entries, in seconds.
+            local_ttl (int): Upper bound on how long an answer stays in the local tier.
+            retry_interval (float): Seconds to wait before retrying an unreachable Redis.
+            use_redis (bool): Set to False to run with the local tier only.
+            track_hot_keys (bool): Count requests per key in Redis (see count_request).
+            hot_keys_flush_interval (float): Seconds between writes of the request counts to Redis.
+            hot_keys_max_pending (int): Distinct keys counted locally before an early write.
+        """
+        self.default_ttl = ttl
+        self.local_ttl = local_ttl
+        self.track_hot_keys = track_hot_keys
+        self.hot_keys_flush_interval = hot_keys_flush_interval
+        self.hot_keys_max_pending = hot_keys_max_pending
+        self._hot_counts = Counter()  # requests per key not yet written to Redis
+        self._hot_flushed_at = time.monotonic()
+        self._hot_lock = threading.Lock()
+        self.retry_interval = retry_interval
+        self.local = LocalLRUCache(local_max_entries, local_max_bytes)
+        self._redis = None
+        self._aredis = None
+        if use_redis and redis is not None:
+            # Creating the clients does not connect; connections are opened on first use.
+            options = dict(host=host, port=port, db=db, socket_connect_timeout=0.5, socket_timeout=1.0)
+            self._redis = redis.Redis(connection_pool=redis.ConnectionPool(max_connections=max_connections, **options))
+            self._aredis = aioredis.Redis(connection_pool=aioredis.ConnectionPool(max_connections=max_connections, **options))
+        self._redis_down_until = 0.0
+        self._flights: Dict[str, _Flight] = {}
+        self._async_flights: Dict[str, asyncio.Future] = {}
+        self._flights_lock = threading.Lock()
+
+    # --- Redis availability ---
+    def _redis_available(self) -> bool:
+        return self._redis is not None and time.time() >= self._redis_down_until
+
+    def _mark_redis_down(self, error: Exception):
+        if time.time() >= self._redis_down_until:
+            logger.warning("Redis unavailable (%s); using the local cache for %.0fs", error, self.retry_interval)
+        self._redis_down_until = time.time() + self.retry_interval
+
+    def _local_ttl(self, ex: int) -> int:
+        return min(ex, self.local_ttl)
+
+    # --- Sync API ---
+    def get(self, key: str, metric_label: Optional[str] = None) -> Optional[str]:
+        """
+        Returns the cached value or None. Lookups are counted per tier under the cache
+        label "local"/"redis", or "<metric_label>_local"/"<metric_label>_redis" if given,
+        so other kinds of entries do not skew the answer hit rate.
+        """
+        value = self.local.get(key)
+        _record(metric_label, "local", value is not None)
+        if value is not None or not self._redis_available():
+            return value
+        try:
+            raw = self._redis.get(key)
+        except redis.RedisError as e:
+            self._mark_redis_down(e)
+            return None
+        _record(metric_label, "redis", raw is not None)
+        if raw is None:
+            return None
+        value = raw.decode('utf-8')
+        self.local.set(key, value, self.local_ttl)
+        return value
+
+    def set(self, key: str, value: str, ex: Optional[int] = None):
+        ex = ex or self.default_ttl
+        self.local.set(key, value, self._local_ttl(ex))
+        if self._redis_available():
+            try:
+                self._redis.set(key, value, ex=ex)
+            except redis.RedisError as e:
+                self._mark_redis_down(e)
+
+    def start_flight(self, key: str) -> Optional[_Flight]:
+        """
+        Registers the caller as the one computing `key`. Returns None if it is the
+        leader, or the existing flight to wait on if another caller got there first.
+        """
+        with self._flights_lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                return flight
+            self._flights[key] = _Flight()
+            return None
+
+    def finish_flight(self, key: str, value: Optional[str] = None, error: Optional[BaseException] = None):
+        """Publishes the leader's result (or error) to every waiting caller."""
+        with self._flights_lock:
+            flight = self._flights.pop(key, None)
+        if flight is not None:
+            flight.result, flight.error = value, _waiter_error(error)
+            flight.event.set()
+
+    def wait_flight(self, flight: _Flight) -> str:
+        flight.event.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    def join_flight(self, key: str) -> Optional[str]:
+        """
+        Returns the cached value, or the value computed by a concurrent caller. Returns
+        None if the caller became the leader: it must compute the value and then call
+        finish_flight. If a leader is cancelled, its waiters re-check the cache and one
+        of them takes over.
+        """
+        while True:
+            value = self.get(key)
+            if value is not None:
+                return value
+            flight = self.start_flight(key)
+            if flight is None:
+                return None
+            try:
+                return self.wait_flight(flight)
+            except _LeaderCancelled:
+                continue
+
+    def get_or_compute(self, key: str, compute: Callable[[], str], ex: Optional[int] = None) -> str:
+        """Returns the cached value, or computes it once even if called concurrently."""
+        value = self.join_flight(key)
+        if value is not None:
+            return value
+        error = None
+        try:
+            value = compute()
+            self.set(key, value, ex)
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            # Always release the flight, or later misses on the key would wait forever;
+            # waiters get the value if it was computed, even if storing it failed
+            self.finish_flight(key, value, None if value is not None else error)
+        return value
+
+    # --- Async API ---
+    async def aget(self, key: str, metric_label: Optional[str] = None) -> Optional[str]:
+        value = self.local.get(key)
+        _record(metric_label, "local", value is not None)
+        if value is not None or not self._redis_available():
+            return value
+        try:
+            raw = await self._aredis.get(key)
+        except redis.RedisError as e:
+            self._mark_redis_down(e)
+            return None
+        _record(metric_label, "redis", raw is not None)
+        if raw is None:
+            return None
+        value = raw.decode('utf-8')
+        self.local.set(key, value, self.local_ttl)
+        return value
+
+    async def aset(self, key: str, value: str, ex: Optional[int] = None):
+        ex = ex or self.default_ttl
+        self.local.set(key, value, self._local_ttl(ex))
+        if self._redis_available():
+            try:
+                await self._aredis.set(key, value, ex=ex)
+            except redis.RedisError as e:
+                self._mark_redis_down(e)
+
+    def astart_flight(self, key: str) -> Optional[asyncio.Future]:
+        """Async version of start_flight; returns a future to await for followers."""
+        future = self._async_flights.get(key)
+        if future is not None:
+            return future
+        self._async_flights[key] = asyncio.get_running_loop().create_future()
+        return None
+
+    def afinish_flight(self, key: str, value: Optional[str] = None, error: Optional[BaseException] = None):
+        """Async version of finish_flight."""
+        future = self._async_flights.pop(key, None)
+        if future is None or future.done():
+            return
+        error = _waiter_error(error)
+        if error is not None:
+            future.set_exception(error)
+            future.exception()  # mark retrieved so an unawaited error is not logged
+        else:
+            future.set_result(value)
+
+    async def ajoin_flight(self, key: str) -> Optional[str]:
+        """Async version of join_flight; the leader must call afinish_flight."""
+        while True:
+            value = await self.aget(key)
+            if value is not None:
+                return value
+            future = self.astart_flight(key)
+            if future is None:
+                return None
+            try:
+                # Shielded: a waiter that is cancelled must not cancel the shared future
+                return await asyncio.shield(future)
+            except _LeaderCancelled:
+                continue
+
+    async def aget_or_compute(self, key: str, compute, ex: Optional[int] = None) -> str:
+        """Async version of get_or_compute; `compute` is an async callable."""
+        value = await self.ajoin_flight(key)
+        if value is not None:
+            return value
+        error = None
+        try:
+            value = await compute()
+            await self.aset(key, value, ex)
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            # Also runs when the request is cancelled while the value is written to Redis
+            self.afinish_flight(key, value, None if value is not None else error)
+        return value
+
+    # --- Freshness and hot keys (used by the pre-warmer) ---
+    def _count_locally(self, key: str) -> Optional[Counter]:
+        """
+        Counts one request for `key` in process. Returns the pending counts to write to
+        Redis when they are due (every hot_keys_flush_interval seconds, or earlier if
+        many keys are pending), else None.
+        """
+        with self._hot_lock:
+            self._hot_counts[key] += 1
+            due = (time.monotonic() - self._hot_flushed_at >= self.hot_keys_flush_interval
+                   or len(self._hot_counts) >= self.hot_keys_max_pending)
+            if not due:
+                return None
+            return self._take_hot_counts()
+
+    def _take_hot_counts(self) -> Counter:
+        counts, self._hot_counts = self._hot_counts, Counter()
+        self._hot_flushed_at = time.monotonic()
+        return counts
+
+    def _hot_counts_pipeline(self, client, counts: Counter):
+        name = _hot_keys_set()
+        pipe = client.pipeline(transaction=False)
+        for key, count in counts.items():
+            pipe.zincrby(name, count, key)
+        pipe.expire(name, HOT_KEYS_DAYS * 86400)
+        return pipe
+
+    def count_request(self, key: str):
+        """
+        Counts one request for `key` towards today's hot-key set. Counts are kept in
+        process and written in one pipeline every few seconds, so most requests (local
+        cache hits included) do no Redis I/O here.
+        """
+        if not self.track_hot_keys or self._redis is None:
+            return
+        counts = self._count_locally(key)
+        if counts and self._redis_available():
+            try:
+                self._hot_counts_pipeline(self._redis, counts).execute()
+            except redis.RedisError as e:
+                self._mark_redis_down(e)  # these counts are dropped; they are only a ranking hint
+
+    async def acount_request(self, key: str):
+        """Async version of count_request."""
+        if not self.track_hot_keys or self._aredis is None:
+            return
+        counts = self._count_locally(key)
+        if counts:
+            await self._aflush_counts(counts)
+
+    async def aflush_hot_keys(self):
+        """Writes the pending request counts to Redis now (e.g. on shutdown)."""
+        if not self.track_hot_keys or self._aredis is None:
+            return
+        with self._hot_lock:
+            counts = self._take_hot_counts()
+        await self._aflush_counts(counts)
+
+    async def _aflush_counts(self, counts: Counter):
+        if not counts or not self._redis_available():
+            return
+        try:
+            await self._hot_counts_pipeline(self._aredis, counts).execute()
+        except redis.RedisError as e:
+            self._mark_redis_down(e)
+
+    async def aping(self) -> bool:
+        """True if Redis answers right now (after a failure it is marked down, as on any error)."""
+        if self._aredis is None:
+            return False
+        try:
+            await self._aredis.ping()
+        except redis.RedisError as e:
+            self._mark_redis_down(e)
+            return False
+        self._redis_down_until = 0.0
+        return True
+
+    async def attl(self, key: str) -> Optional[float]:
+        """Seconds until `key` expires (from Redis when available), or None if it is absent."""
+        if self._redis_available():
+            try:
+                remaining = await self._aredis.ttl(key)
+            except redis.RedisError as e:
+                self._mark_redis_down(e)
+            else:
+                if remaining == -1:
+                    return float("inf")  # stored without an expiry
+                return float(remaining) if remaining >= 0 else None
+        return self.local.ttl(key)
+
+    async def ahot_keys(self, limit: int = 100, days: int = 2) -> List[Tuple[str, int]]:
+        """
+        The most requested keys over the last `days` days (today included), with their
+        request counts. Empty when Redis is not available.
+        """
+        if not self._redis_available():
+            return []
+        counts = Counter()
+        try:
+            for days_ago in range(days):
+                for key, score in await self._aredis.zrevrange(_hot_keys_set(days_ago), 0, limit * 2 - 1, withscores=True):
+                    counts[key.decode('utf-8') if isinstance(key, bytes) else key] += int(score)
+        except redis.RedisError as e:
+            self._mark_redis_down(e)
+            return []
+        return counts.most_common(limit)
+
+    def stats(self) -> dict:
+        return {
+            "local_entries": len(self.local),
+            "redis": "disabled" if self._redis is None else ("up" if self._redis_available() else "down"),
+            "in_flight": len(self._flights) + len(self._async_flights),
+        }
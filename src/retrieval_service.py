@@ -0,0 +1,134 @@
+"""
+retrieval_service.py
+
+An optional retrieval sidecar: one local process owns the embedding model, the ChromaDB
+collections and the BM25 indexes, and every API worker talks to it, so memory grows by
+one model however many workers run, and only one process opens the vector store.
+
+Server (exposes rag_engine over a Unix socket or local HTTP):
+    python -m src.retrieval_service --uds /tmp/tutor-retrieval.sock
+    python -m src.retrieval_service --port 8765
+- POST /retrieve: retrieve_relevant_chunks(query, top_k, mode, subject, books)
+- POST /embed:    embeddings of a list of texts (micro-batched across all workers)
+- GET  /health:   whether the model and vector store are loaded
+
+Workers set RETRIEVAL_SERVICE_URL (unix:/tmp/tutor-retrieval.sock or
+http://127.0.0.1:8765); rag_engine then sends retrieval and query embedding to the
+service through RetrievalClient, a pooled keep-alive HTTP client, and never loads the
+model itself.
+"""
+
+import argparse
+from typing import Dict, List, Optional
+
+import httpx
+
+
+class RetrievalClient():
+    """A thin, pooled client for the retrieval service, safe to share between threads."""
+
+    def __init__(self, url: str, timeout: float = 10.0, max_connections: int = 16):
+        """
+        Args:
+            url (str): "unix:/path/to/socket" or "http://host:port".
+            timeout (float): Seconds to wait for a response.
+            max_connections (int): Size of the keep-alive connection pool.
+        """
+        limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        if url.startswith("unix:"):
+            transport = httpx.HTTPTransport(uds=url[len("unix:"):].replace("//", "/", 1), limits=limits)
+            base_url = "http://retrieval-service"
+        else:
+            transport = httpx.HTTPTransport(limits=limits)
+            base_url = url.rstrip("/")
+        self.url = url
+        self._client = httpx.Client(base_url=base_url, transport=transport, timeout=timeout)
+
+    def _post(self, path: str, payload: dict) -> dict:
+        response = self._client.post(path, json=payload)
+        response.raise_for_status()
+        return response.json()
+
+    def retrieve(self, query: str, top_k: int = 5, mode: Optional[str] = None,
+                 subject: Optional[str] = None, books: Optional[List[str]] = None) -> List[Dict]:
+        return self._post("/retrieve", {"query": query, "top_k": top_k, "mode": mode,
+                                        "subject": subject, "books": books})["chunks"]
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        return self._post("/embed", {"texts": texts})["embeddings"]
+
+    def is_ready(self) -> bool:
+        try:
+            response = self._client.get("/health", timeout=0.5)
+            return response.status_code == 200 and response.json().get("rag_ready", False)
+        except httpx.HTTPError:
+            return False
+
+    def close(self):
+        self._client.close()
+
+
+# --- Server ---
+def create_app():
+    """The service's FastAPI app; this process uses the local model and vector store."""
+    from fastapi import FastAPI
+    from pydantic import BaseModel
+
+    from src import rag_engine
+
+    # Never forward to another service, even if RETRIEVAL_SERVICE_URL is set here too
+    rag_engine.retrieval_client = None
+
+    class RetrieveRequest(BaseModel):
+        query: str
+        top_k: int = 5
+        mode: Optional[str] = None
+        subject: Optional[str] = None
+        books: Optional[List[str]] = None
+
+    class EmbedRequest(BaseModel):
+        texts: List[str]
+
+    app = FastAPI(title="IIT JEE AI Tutor retrieval service")
+
+    # Plain (non-async) handlers run in FastAPI's thread pool, so requests from many
+    # workers are served concurrently
+    @app.post("/retrieve")
+    def retrieve(request: RetrieveRequest):
+        chunks = rag_engine.retrieve_relevant_chunks(request.query, top_k=request.top_k, mode=request.mode,
+                                                     subject=request.subject, books=request.books)
+        return {"chunks": chunks}
+
+    @app.post("/embed")
+    def embed(request: EmbedRequest):
+        # Texts from concurrent requests share encode() calls through the batcher
+        futures = [rag_engine.query_embedder.submit(text) for text in request.texts]
+        return {"embeddings": [future.result().tolist() for future in futures]}
+
+    @app.get("/health")
+    def health():
+        return {"rag_ready": rag_engine.is_ready(), "embedding_batcher": rag_engine.query_embedder.stats()}
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve textbook retrieval and embeddings to the API workers")
+    parser.add_argument("--uds", help="Unix socket path (preferred on a single host)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    import uvicorn
+    from src import rag_engine
+
+    app = create_app()
+    rag_engine.warm_up()  # load the model and open the stores before accepting requests
+    if args.uds:
+        uvicorn.run(app, uds=args.uds, log_level="warning")
+    else:
+        uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+semantic_cache.py
+
+A semantic answer cache keyed on question embeddings.
+- Questions are embedded with the same EMBED_MODEL used by rag_engine.py
+- Each subject has its own in-memory vector index (cosine similarity, nearest neighbour)
+- A stored answer is returned when the closest question is above a similarity threshold
+- Entries expire after a TTL and each subject index is bounded in size
+- Hit/miss counters are kept for monitoring (and exported to Prometheus)
+
+The index lives in process memory, so each worker keeps its own copy. The exact-match
+Redis cache in ai_iit_teacher.py is still checked first.
+"""
+
+import logging
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+from src.metrics import record_cache
+
+logger = logging.getLogger(__name__)
+
+
+def _default_embed(text: str) -> np.ndarray:
+    """Embeds text with the shared RAG embedding model, batched with concurrent queries."""
+    from src.rag_engine import query_embedder
+    return query_embedder.embed(text)
+
+
+def normalize_question(question: str) -> str:
+    """Normalizes a question the same way the exact-match cache key does."""
+    return question.strip().lower()
+
+
+class _SubjectIndex():
+    """Vectors and answers for one subject, stored as parallel arrays."""
+
+    def __init__(self):
+        self.vectors: Optional[np.ndarray] = None  # shape (n, dim), L2-normalized
+        self.expires_at = np.empty(0)
+        self.questions: list = []
+        self.answers: list = []
+
+    def __len__(self):
+        return len(self.answers)
+
+    def keep(self, mask: np.ndarray):
+        """Keeps only the entries where mask is True."""
+        self.vectors = self.vectors[mask]
+        self.expires_at = self.expires_at[mask]
+        self.questions = [q for q, k in zip(self.questions, mask) if k]
+        self.answers = [a for a, k in zip(self.answers, mask) if k]
+
+
+class SemanticCache():
+    """
+    Returns a cached answer for questions that mean the same thing as one answered before,
+    e.g. "what is a derivative?" and "What's a derivative".
+    """
+
+    def __init__(self, embed_fn: Callable[[str], np.ndarray] = None, threshold: float = 0.9,
+                 ttl_seconds: int = 86400, max_entries_per_subject: int = 5000):
+        """
+        Args:
+            embed_fn: Function returning an L2-normalized embedding for a text.
+            threshold (float): Minimum cosine similarity for a hit.
+            ttl_seconds (int): How long a stored answer stays valid.
+            max_entries_per_subject (int): Size bound per subject; oldest entries are evicted first.
+        """
+        self.embed_fn = embed_fn or _default_embed
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries_per_subject = max_entries_per_subject
+        self._indexes: Dict[str, _SubjectIndex] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _embed(self, question: str) -> Optional[np.ndarray]:
+        # The cache is an optimization: if embedding fails (e.g. the retrieval service is
+        # down), treat it as a miss instead of failing the request
+        try:
+            return self.embed_fn(normalize_question(question))
+        except Exception as e:
+            logger.warning("Semantic cache embedding failed: %s", e)
+            return None
+
+    def lookup(self, subject: str, question: str) -> Optional[str]:
+        """Returns the answer of the most similar cached question, or None on a miss."""
+        index = self._indexes.get(subject)
+        query = self._embed(question) if index is not None and len(index) else None
+        with self._lock:
+            if query is not None and len(index):
+                scores = index.vectors @ query
+                scores[index.expires_at < time.time()] = -1.0  # never match expired entries
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    self.hits += 1
+                    record_cache("semantic", True)
+                    return index.answers[best]
+            self.misses += 1
+        record_cache("semantic", False)
+        return None
+
+    def store(self, subject: str, question: str, answer: str):
+        """Adds a question/answer pair to the subject's index."""
+        vector = self._embed(question)
+        if vector is None:
+            return
+        vector = np.asarray(vector, dtype=np.float32)
+        with self._lock:
+            index = self._indexes.setdefault(subject, _SubjectIndex())
+            now = time.time()
+            if len(index):
+                # Drop expired entries, then the oldest ones if the index is full
+                index.keep(index.expires_at >= now)
+                overflow = len(index) - self.max_entries_per_subject + 1
+                if overflow > 0:
+                    mask = np.ones(len(index), dtype=bool)
+                    mask[:overflow] = False
+                    index.keep(mask)
+            if index.vectors is None or len(index) == 0:
+                index.vectors = vector[np.newaxis, :]
+            else:
+                index.vectors = np.vstack([index.vectors, vector])
+            index.expires_at = np.append(index.expires_at, now + self.ttl_seconds)
+            index.questions.append(normalize_question(question))
+            index.answers.append(answer)
+
+    def stats(self) -> dict:
+        """Returns hit/miss counters and the number of entries per subject."""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "entries": {subject: len(index) for subject, index in self._indexes.items()},
+        }
@@ -0,0 +1,115 @@
+"""
+static_assets.py
+
+Serves the index page and the static assets from memory.
+- Files are read once at startup, fingerprinted (SHA-256) and precompressed with gzip
+  and, if the brotli package is installed, brotli; each request gets the smallest
+  encoding the client accepts
+- The index page refers to assets as /static/<name>?v=<fingerprint>. The content behind
+  such a URL never changes, so browsers may cache it for a year as immutable; a new
+  deploy changes the fingerprint and therefore the URL.
+- Every response carries an ETag, and a matching If-None-Match gets 304 Not Modified
+"""
+
+import gzip
+import hashlib
+import mimetypes
+import re
+from pathlib import Path
+from typing import Dict, Optional
+
+from fastapi import Request
+from fastapi.responses import Response
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"  # may be cached, but must be revalidated (cheap, thanks to the ETag)
+
+# src="static/x", href="../static/x?v=3", ... in the index template
+_ASSET_REFERENCE = re.compile(r'(src|href)="(?:\.\./|/)?static/([^"?#]+)(?:\?[^"#]*)?"')
+
+
+class Asset():
+    """One file held in memory with its fingerprint and precompressed variants."""
+
+    def __init__(self, content: bytes, media_type: str):
+        self.media_type = media_type
+        self.version = hashlib.sha256(content).hexdigest()[:16]
+        self.variants = {"identity": content}
+        compressed = gzip.compress(content, compresslevel=9, mtime=0)
+        if len(compressed) < len(content):
+            self.variants["gzip"] = compressed
+        if brotli is not None:
+            compressed = brotli.compress(content, quality=11)
+            if len(compressed) < len(content):
+                self.variants["br"] = compressed
+
+    def _encoding(self, accept_encoding: str) -> str:
+        """Picks the smallest variant among the encodings the client accepts."""
+        accepted = set()
+        for item in accept_encoding.lower().split(","):
+            name, _, params = item.partition(";")
+            params = params.replace(" ", "")
+            try:
+                quality = float(params[2:]) if params.startswith("q=") else 1.0
+            except ValueError:
+                quality = 1.0
+            if quality > 0:
+                accepted.add(name.strip())
+        candidates = [e for e in self.variants if e == "identity" or e in accepted or "*" in accepted]
+        return min(candidates, key=lambda e: len(self.variants[e]))
+
+    def not_modified(self, if_none_match: Optional[str]) -> bool:
+        if not if_none_match:
+            return False
+        tags = {tag.strip().removeprefix("W/").strip('"').split("-")[0] for tag in if_none_match.split(",")}
+        return "*" in tags or self.version in tags
+
+    def response(self, request: Request, cache_control: str) -> Response:
+        encoding = self._encoding(request.headers.get("accept-encoding", ""))
+        # Each encoding is a different representation, so it gets its own strong ETag
+        headers = {
+            "ETag": f'"{self.version}"' if encoding == "identity" else f'"{self.version}-{encoding}"',
+            "Cache-Control": cache_control,
+            "Vary": "Accept-Encoding",
+        }
+        if self.not_modified(request.headers.get("if-none-match")):
+            return Response(status_code=304, headers=headers)
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        return Response(content=self.variants[encoding], media_type=self.media_type, headers=headers)
+
+
+class AssetStore():
+    """The index page and every file under the static directory, loaded once."""
+
+    def __init__(self, static_dir: str = "static", template_path: str = "templates/index.html"):
+        root = Path(static_dir)
+        self.assets: Dict[str, Asset] = {}
+        for path in sorted(p for p in root.rglob("*") if p.is_file()):
+            media_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+            if media_type.startswith("text/") or media_type in ("application/javascript", "application/json"):
+                media_type += "; charset=utf-8"
+            self.assets[path.relative_to(root).as_posix()] = Asset(path.read_bytes(), media_type)
+        html = Path(template_path).read_text(encoding="utf-8")
+        self.index = Asset(_ASSET_REFERENCE.sub(self._versioned, html).encode("utf-8"), "text/html; charset=utf-8")
+
+    def _versioned(self, match: re.Match) -> str:
+        attribute, name = match.group(1), match.group(2)
+        asset = self.assets.get(name)
+        return f'{attribute}="/static/{name}?v={asset.version}"' if asset else match.group(0)
+
+    def index_response(self, request: Request) -> Response:
+        return self.index.response(request, REVALIDATE)
+
+    def static_response(self, request: Request, name: str) -> Response:
+        asset = self.assets.get(name)
+        if asset is None:
+            return Response(status_code=404)
+        # Only the fingerprinted URL is immutable; a bare or stale one must be revalidated
+        versioned = request.query_params.get("v") == asset.version
+        return asset.response(request, IMMUTABLE if versioned else REVALIDATE)
@@ -0,0 +1,70 @@
+"""
+teacher_registry.py
+
+Keeps one long-lived IIT_Teacher per subject for the whole process.
+- Teachers (and their compiled graphs) are built once at startup instead of per request
+- All subjects share a single chat model client, so HTTP connections to the provider are reused
+- reload() rebuilds the model client from the current configuration and swaps it in
+  (the app calls it on SIGHUP, see app.py)
+"""
+
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+from langchain.chat_models import init_chat_model
+
+from src.ai_iit_teacher import IIT_Teacher
+
+# Subjects served by the API
+SUBJECTS = ["maths", "physics", "chemistry"]
+DEFAULT_SUBJECT = "maths"
+
+
+class TeacherRegistry():
+    """
+    A per-process registry of IIT_Teacher instances, one per subject.
+
+    IIT_Teacher keeps no per-request data on the instance (everything lives in the
+    graph state), so a single teacher can safely serve concurrent requests.
+    """
+
+    def __init__(self, api_key: str, subjects: Optional[list] = None):
+        self.api_key = api_key
+        self.subjects = list(subjects or SUBJECTS)
+        self._lock = threading.RLock()
+        self._teachers: Dict[str, IIT_Teacher] = {}
+
+    def _read_config(self) -> Tuple:
+        """Returns the settings that require a new model client when they change."""
+        return (os.getenv("LLM_MODEL"), self.api_key)
+
+    def _build(self, config: Tuple) -> Dict[str, IIT_Teacher]:
+        """Creates one shared model client and a teacher for every subject."""
+        model_name, _ = config
+        llm = init_chat_model(model_name, temperature=0.1)
+        return {subject: IIT_Teacher(subject, self.api_key, llm=llm) for subject in self.subjects}
+
+    def start(self):
+        """Builds all teachers. Called once when the app starts."""
+        self.reload()
+
+    def reload(self):
+        """
+        Rebuilds the model client and teachers from the current configuration.
+        Requests already running keep using the old teachers until they finish.
+        """
+        with self._lock:
+            self._teachers = self._build(self._read_config())
+
+    def get(self, subject: str) -> IIT_Teacher:
+        """Returns the shared teacher for a subject, falling back to the default subject."""
+        subject = subject.lower()
+        if subject not in self.subjects:
+            subject = DEFAULT_SUBJECT
+        if not self._teachers:
+            # First use without start(): build the teachers now
+            with self._lock:
+                if not self._teachers:
+                    self.reload()
+        return self._teachers[subject]
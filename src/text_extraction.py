@@ -0,0 +1,200 @@
+"""
+text_extraction.py
+
+Text extraction and chunking for textbook ingestion.
+
+This module deliberately has no embedding or vector-store imports, so the
+ingestion worker processes started by rag_engine.add_textbook stay small and
+do not each load the embedding model.
+"""
+
+import os
+import re
+import hashlib
+from functools import lru_cache
+from typing import List, Dict, Iterator, Optional, Tuple
+
+# Try to import PyMuPDF (fitz) for PDF text extraction
+# If not available, raise an ImportError
+try:
+    import fitz  # PyMuPDF
+except ImportError:
+    fitz = None
+
+
+# The embedding model's tokenizer decides chunk sizes. all-MiniLM-L6-v2 embeds at most
+# 256 word-pieces (including [CLS] and [SEP]); anything longer is silently truncated.
+TOKENIZER_NAME = os.getenv("EMBED_TOKENIZER", "sentence-transformers/all-MiniLM-L6-v2")
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", "256"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "32"))
+SPECIAL_TOKENS = 2  # [CLS] and [SEP] are added by the model to every input
+
+# Sentence ends: ., ! or ? followed by whitespace and an upper-case letter, digit or bracket
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9(\[])")
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+
+
+@lru_cache(maxsize=1)
+def get_tokenizer():
+    """Loads only the embedding model's tokenizer (no model weights), once per process."""
+    from transformers import AutoTokenizer
+    return AutoTokenizer.from_pretrained(TOKENIZER_NAME)
+
+
+# Function to stream the pages of a PDF file using PyMuPDF
+def iter_pdf_pages(pdf_path: str, start_page: int = 1, end_page: Optional[int] = None) -> Iterator[Tuple[int, str]]:
+    """Yields (page_number, text) one page at a time (1-based, end_page inclusive)."""
+    if fitz is None:
+        raise ImportError("PyMuPDF (fitz) is required for PDF extraction.")
+    doc = fitz.open(pdf_path)
+    try:
+        last = doc.page_count if end_page is None else min(end_page, doc.page_count)
+        for page_num in range(start_page, last + 1):
+            yield page_num, doc.load_page(page_num - 1).get_text()
+    finally:
+        doc.close()
+
+# Function to extract text from a PDF file using PyMuPDF
+def extract_text_from_pdf(pdf_path: str) -> List[str]:
+    """Extracts text from a PDF file, returns a list of page texts."""
+    return [text for _, text in iter_pdf_pages(pdf_path)]
+
+# Function to count the pages of a textbook file (a .txt file is a single page)
+def page_count(file_path: str) -> int:
+    if file_path.lower().endswith('.pdf'):
+        if fitz is None:
+            raise ImportError("PyMuPDF (fitz) is required for PDF extraction.")
+        with fitz.open(file_path) as doc:
+            return doc.page_count
+    return 1
+
+# Function to chunk text into smaller pieces for better indexing (word based)
+def chunk_text_words(text: str, chunk_size: int = 500) -> List[str]:
+    """Splits text into chunks of ~chunk_size words. Kept for comparison benchmarks."""
+    words = text.split()
+    chunks = []
+    for i in range(0, len(words), chunk_size):
+        chunk = ' '.join(words[i:i+chunk_size])
+        chunks.append(chunk)
+    return chunks
+
+# Function to split a page into paragraphs of sentences
+def split_sentences(text: str) -> List[List[str]]:
+    """Returns the paragraphs of a text, each as a list of sentences (line wraps removed)."""
+    paragraphs = []
+    for paragraph in _PARAGRAPH_BREAK.split(text):
+        paragraph = ' '.join(paragraph.split())
+        if paragraph:
+            paragraphs.append(_SENTENCE_END.split(paragraph))
+    return paragraphs
+
+# Function to cut a sentence that alone exceeds the token budget into token-sized pieces
+def _split_long_sentence(sentence: str, max_tokens: int, tokenizer) -> List[str]:
+    offsets = tokenizer(sentence, add_special_tokens=False, return_offsets_mapping=True)["offset_mapping"]
+    pieces = []
+    for i in range(0, len(offsets), max_tokens):
+        window = offsets[i:i + max_tokens]
+        pieces.append(sentence[window[0][0]:window[-1][1]])
+    return pieces
+
+# Function to chunk text into smaller pieces for better indexing (token based)
+def chunk_text(text: str, max_tokens: int = CHUNK_TOKENS, overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+               tokenizer=None) -> List[str]:
+    """
+    Splits text into chunks that fit the embedding model's context window.
+
+    Sizes are counted with the model's own tokenizer. Chunks are built from whole
+    sentences and end at a paragraph break when the chunk is at least half full.
+    Consecutive chunks share up to `overlap_tokens` tokens of trailing sentences, so
+    definitions and formulas that cross a boundary appear whole in one chunk.
+    """
+    tokenizer = tokenizer or get_tokenizer()
+    budget = max_tokens - SPECIAL_TOKENS
+    paragraphs = split_sentences(text)
+    sentences = [sentence for paragraph in paragraphs for sentence in paragraph]
+    if not sentences:
+        return []
+    counts = [len(ids) for ids in tokenizer(sentences, add_special_tokens=False)["input_ids"]]
+    paragraph_ends = set()
+    position = 0
+    for paragraph in paragraphs:
+        position += len(paragraph)
+        paragraph_ends.add(position - 1)
+
+    # Expand sentences that are longer than a whole chunk into token-sized pieces
+    units = []  # (text, tokens, ends_paragraph)
+    for i, (sentence, count) in enumerate(zip(sentences, counts)):
+        if count <= budget:
+            units.append((sentence, count, i in paragraph_ends))
+        else:
+            pieces = _split_long_sentence(sentence, budget, tokenizer)
+            for j, piece in enumerate(pieces):
+                piece_count = budget if j < len(pieces) - 1 else count - budget * (len(pieces) - 1)
+                units.append((piece, piece_count, i in paragraph_ends and j == len(pieces) - 1))
+
+    chunks = []
+    current, current_tokens = [], 0
+    for unit_text, unit_tokens, ends_paragraph in units:
+        if current and current_tokens + unit_tokens > budget:
+            chunks.append(' '.join(text for text, _ in current))
+            # Carry trailing sentences over as overlap
+            overlap, overlap_count = [], 0
+            for text, tokens in reversed(current):
+                if overlap_count + tokens > overlap_tokens or overlap_count + tokens + unit_tokens > budget:
+                    break
+                overlap.insert(0, (text, tokens))
+                overlap_count += tokens
+            current, current_tokens = overlap, overlap_count
+        current.append((unit_text, unit_tokens))
+        current_tokens += unit_tokens
+        if ends_paragraph and current_tokens >= budget // 2:
+            chunks.append(' '.join(text for text, _ in current))
+            current, current_tokens = [], 0
+    if current:
+        chunks.append(' '.join(text for text, _ in current))
+    return chunks
+
+# Function to stream the chunk records of a PDF or text file
+def iter_file_chunks(file_path: str, book_name: str, source: str = "PDF", library: str = "",
+                     start_page: int = 1, end_page: Optional[int] = None,
+                     subject: str = "", grade: str = "", chapter: str = "") -> Iterator[Dict]:
+    """
+    Yields a textbook's chunks with book/page (and subject/grade/chapter) metadata,
+    reading one page at a time, so memory stays flat however long the book is.
+    """
+    if file_path.lower().endswith('.pdf'):
+        pages = iter_pdf_pages(file_path, start_page, end_page)
+    elif file_path.lower().endswith('.txt'):
+        with open(file_path, 'r', encoding='utf-8') as f:
+            pages = [(1, f.read())] if start_page <= 1 else []
+    else:
+        raise ValueError("Unsupported file type. Use PDF or TXT.")
+
+    for page_num, page_text in pages:
+        for chunk in chunk_text(page_text):
+            yield {
+                'text': chunk,
+                'book': book_name,
+                'page': page_num,
+                'source': source,
+                'library': library or book_name,
+                'subject': subject,
+                'grade': grade,
+                'chapter': chapter
+            }
+
+# Function to read a PDF or text file (or a range of its pages) into chunk records
+def chunk_file(file_path: str, book_name: str, source: str = "PDF", library: str = "",
+               start_page: int = 1, end_page: Optional[int] = None,
+               subject: str = "", grade: str = "", chapter: str = "") -> List[Dict]:
+    """Returns the chunks of a textbook, or of pages start_page..end_page of it."""
+    return list(iter_file_chunks(file_path, book_name, source, library, start_page, end_page, subject, grade, chapter))
+
+# Function to fingerprint a file so unchanged books can be skipped
+def file_sha256(file_path: str) -> str:
+    """Returns the SHA-256 of a file's contents, read in 1 MB blocks."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
@@ -100,15 +100,28 @@ async function sendMessageStream() {
                 messageDiv.querySelector('.response-text').innerHTML = botMessage.replace(/\n/g, '<br>');
                 document.querySelector('.chat-section').scrollTop = document.querySelector('.chat-section').scrollHeight;
             }
+            // The server sends Server-Sent Events: "stage" events while the teacher is
+            // working, then the answer as plain data events, then a "done" event.
+            const decoder = new TextDecoder();
+            let buffer = '';
             while (true) {
                 const { done, value } = await reader.read();
                 if (done) break;
-                const chunk = new TextDecoder().decode(value);
-                if (firstChunk) {
-                    removeTypingIndicator(); // Remove only after first chunk
-                    firstChunk = false;
+                buffer += decoder.decode(value, { stream: true });
+                let boundary;
+                while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                    const { event, data } = parseSSEEvent(buffer.slice(0, boundary));
+                    buffer = buffer.slice(boundary + 2);
+                    if (event === 'stage') {
+                        updateTypingIndicator(STAGE_LABELS[data] || 'Thinking...');
+                    } else if (event === 'message') {
+                        if (firstChunk) {
+                            removeTypingIndicator(); // Remove only after first answer chunk
+                            firstChunk = false;
+                        }
+                        addOrUpdateBotMessage(data);
+                    }
                 }
-                addOrUpdateBotMessage(chunk);
             }
         } catch (error) {
             removeTypingIndicator();
@@ -126,6 +139,33 @@ async function sendMessageStream() {
     }
 }
 
+// Text shown in the typing indicator for each stage event sent by the server
+const STAGE_LABELS = {
+    classified: 'Understanding your question...',
+    topic_identified: 'Found the topic, preparing an explanation...',
+    explanation_ready: 'Writing your answer...'
+};
+
+function parseSSEEvent(rawEvent) {
+    let event = 'message';
+    const dataLines = [];
+    rawEvent.split('\n').forEach(line => {
+        if (line.startsWith('event: ')) {
+            event = line.slice(7);
+        } else if (line.startsWith('data: ')) {
+            dataLines.push(line.slice(6));
+        }
+    });
+    return { event, data: dataLines.join('\n') };
+}
+
+function updateTypingIndicator(text) {
+    const label = document.querySelector('.typing-indicator .message-time');
+    if (label) {
+        label.textContent = text;
+    }
+}
+
 function getCurrentSubject() {
     const activeTab = document.querySelector('.tab.active');
     const tabText = activeTab.textContent.toLowerCase();
@@ -0,0 +1,40 @@
+import os
+
+os.environ.setdefault("GOOGLE_API_KEY", "test")
+os.environ.setdefault("REDIS_ENABLED", "false")
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app as app_module
+
+ANSWER = "<p>Kirchhoff's voltage law: the voltages around any closed loop add up to zero.</p>" * 40
+
+
+class FakeTeacher():
+    async def ateach(self, question, mode="thorough"):
+        return ANSWER
+
+    async def ateach_stream(self, question, mode="thorough"):
+        for part in (ANSWER[:2000], ANSWER[2000:]):
+            yield f"data: {part}\n\n"
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(app_module.teacher_registry, "get", lambda subject: FakeTeacher())
+    monkeypatch.setattr(app_module.rate_limiter, "enabled", False)
+    return TestClient(app_module.app)  # without the lifespan: no model client is built
+
+
+def test_json_answers_are_gzipped(client):
+    response = client.post("/api/chat", json={"message": "Explain KVL"}, headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.json()["response"] == ANSWER
+
+
+def test_event_stream_is_never_compressed(client):
+    response = client.post("/api/chat/stream", json={"message": "Explain KVL"}, headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert response.text.count("data: ") == 2
@@ -0,0 +1,27 @@
+import numpy as np
+import pytest
+
+from src.embedding_batcher import EmbeddingBatcher
+
+
+def test_batches_resolve_each_caller():
+    batcher = EmbeddingBatcher(lambda texts: np.array([[len(t)] for t in texts], dtype=float))
+    futures = [batcher.submit(text) for text in ("a", "bb", "a")]
+    assert [f.result(timeout=5)[0] for f in futures] == [1, 2, 1]
+
+
+@pytest.mark.parametrize("error", [ValueError("model failed"), SystemExit(1), KeyboardInterrupt()])
+def test_encoder_errors_fail_the_callers_and_keep_the_worker(error):
+    calls = []
+
+    def encode(texts):
+        calls.append(texts)
+        if len(calls) == 1:
+            raise error
+        return np.ones((len(texts), 2))
+
+    batcher = EmbeddingBatcher(encode)
+    with pytest.raises(Exception):
+        batcher.submit("first").result(timeout=5)
+    # The worker survived and serves the next request
+    assert batcher.submit("second").result(timeout=5).tolist() == [1.0, 1.0]
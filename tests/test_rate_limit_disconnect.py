@@ -0,0 +1,80 @@
+import asyncio
+import json
+import os
+
+os.environ.setdefault("GOOGLE_API_KEY", "test")
+os.environ.setdefault("REDIS_ENABLED", "false")
+
+import fakeredis
+import pytest
+
+import app as app_module
+from src.rate_limiter import OUTCOME_COSTS, TOKEN_BUCKET_SCRIPT, TokenBucketLimiter, note_outcome
+
+
+class SlowStreamingTeacher():
+    """Streams a long answer that ran the full pipeline."""
+
+    async def ateach_stream(self, question, mode="thorough"):
+        note_outcome("pipeline")
+        for i in range(200):
+            yield f"data: token {i}\n\n"
+            await asyncio.sleep(0.01)
+
+
+@pytest.fixture
+def limiter(monkeypatch):
+    limiter = TokenBucketLimiter(capacity=5, refill_per_minute=0.001, use_redis=False)
+    # A Redis-backed bucket whose calls take a moment, like a real Redis
+    limiter._aredis = fakeredis.FakeAsyncRedis()
+    script = limiter._aredis.register_script(TOKEN_BUCKET_SCRIPT)
+
+    async def script_over_network(**kwargs):
+        await asyncio.sleep(0.005)  # a network round trip, where a cancellation can land
+        return await script(**kwargs)
+
+    limiter._script = script_over_network
+    monkeypatch.setattr(app_module, "rate_limiter", limiter)
+    monkeypatch.setattr(app_module.teacher_registry, "get", lambda subject: SlowStreamingTeacher())
+    return limiter
+
+
+async def stream_and_disconnect(events_before_disconnect: int) -> int:
+    """POSTs to /api/chat/stream and disconnects after some events; returns the events received."""
+    disconnected = asyncio.Event()
+    requests = [{"type": "http.request", "body": json.dumps({"message": "Explain Kirchhoff's laws"}).encode(),
+                 "more_body": False}]
+    events = []
+
+    async def receive():
+        if requests:
+            return requests.pop(0)
+        await disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.body" and message.get("body"):
+            events.append(message["body"])
+            if len(events) >= events_before_disconnect:
+                disconnected.set()
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0", "spec_version": "2.3"}, "http_version": "1.1",
+        "method": "POST", "scheme": "http", "path": "/api/chat/stream", "raw_path": b"/api/chat/stream",
+        "query_string": b"", "root_path": "", "client": ("10.0.0.1", 5000), "server": ("test", 80),
+        "headers": [(b"host", b"test"), (b"content-type", b"application/json")],
+    }
+    await app_module.app(scope, receive, send)
+    return len(events)
+
+
+def test_disconnected_stream_is_still_charged(limiter):
+    async def scenario():
+        received = await stream_and_disconnect(events_before_disconnect=2)
+        await asyncio.sleep(0.2)  # let the charge finish
+        tokens = await limiter._aredis.hget(limiter.prefix + "ip:10.0.0.1", "tokens")
+        return received, float(tokens)
+
+    received, tokens = asyncio.run(scenario())
+    assert received < 200  # the stream really was cut short
+    assert tokens == pytest.approx(limiter.capacity - OUTCOME_COSTS["pipeline"], abs=0.01)
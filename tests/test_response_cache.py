@@ -0,0 +1,112 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from src.response_cache import ResponseCache
+
+
+def make_cache():
+    return ResponseCache(use_redis=False)
+
+
+def test_followers_take_over_when_the_leader_is_cancelled():
+    async def scenario():
+        cache = make_cache()
+        started = asyncio.Event()
+        calls = []
+
+        async def slow_compute():
+            calls.append("leader")
+            started.set()
+            await asyncio.sleep(10)
+            return "never"
+
+        async def compute():
+            calls.append("follower")
+            return "answer"
+
+        leader = asyncio.create_task(cache.aget_or_compute("k", slow_compute))
+        await started.wait()
+        followers = [asyncio.create_task(cache.aget_or_compute("k", compute)) for _ in range(3)]
+        await asyncio.sleep(0)
+        leader.cancel()
+        results = await asyncio.gather(*followers)
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return cache, calls, results
+
+    cache, calls, results = asyncio.run(scenario())
+    assert results == ["answer"] * 3
+    assert calls == ["leader", "follower"]  # exactly one follower recomputed
+    assert cache.stats()["in_flight"] == 0
+
+
+def test_followers_get_the_leaders_error():
+    async def scenario():
+        cache = make_cache()
+        release = asyncio.Event()
+
+        async def failing():
+            await release.wait()
+            raise ValueError("LLM failed")
+
+        async def compute():
+            return "answer"
+
+        leader = asyncio.create_task(cache.aget_or_compute("k", failing))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(cache.aget_or_compute("k", compute))
+        await asyncio.sleep(0)
+        release.set()
+        return await asyncio.gather(leader, follower, return_exceptions=True)
+
+    leader_result, follower_result = asyncio.run(scenario())
+    assert isinstance(leader_result, ValueError)
+    assert isinstance(follower_result, ValueError)
+
+
+class _Abandoned(BaseException):
+    """Stands in for GeneratorExit when a sync stream is closed."""
+
+
+def test_sync_followers_take_over_when_the_leader_is_abandoned():
+    cache = make_cache()
+    started, release = threading.Event(), threading.Event()
+
+    def abandoned():
+        started.set()
+        release.wait()
+        raise _Abandoned()
+
+    def leader():
+        with pytest.raises(_Abandoned):
+            cache.get_or_compute("k", abandoned)
+
+    leader_thread = threading.Thread(target=leader)
+    leader_thread.start()
+    started.wait()
+    results = []
+    follower = threading.Thread(target=lambda: results.append(cache.get_or_compute("k", lambda: "answer")))
+    follower.start()
+    time.sleep(0.1)  # let the follower start waiting on the leader's flight
+    release.set()
+    leader_thread.join(5)
+    follower.join(5)
+    assert results == ["answer"]
+    assert cache.stats()["in_flight"] == 0
+
+
+def test_stage_lookups_are_counted_apart_from_answers():
+    from src.metrics import cache_lookups
+
+    def count(cache):
+        return cache_lookups.labels(cache=cache, result="miss")._value.get()
+
+    cache = make_cache()
+    answers, stages = count("local"), count("stage_local")
+    cache.get("physics:q")
+    cache.get("stage:classify:q", metric_label="stage")
+    assert count("local") == answers + 1
+    assert count("stage_local") == stages + 1
@@ -0,0 +1,43 @@
+import os
+
+os.environ.setdefault("REDIS_ENABLED", "false")
+
+from src.teacher_registry import DEFAULT_SUBJECT, TeacherRegistry
+
+
+def make_registry(monkeypatch):
+    registry = TeacherRegistry("test-key", subjects=["maths", "physics"])
+    builds = []
+
+    def build(config):
+        builds.append(config)
+        return {subject: object() for subject in registry.subjects}
+
+    monkeypatch.setattr(registry, "_build", build)
+    return registry, builds
+
+
+def test_get_builds_once_and_ignores_env_changes(monkeypatch):
+    registry, builds = make_registry(monkeypatch)
+    monkeypatch.setenv("LLM_MODEL", "model-a")
+    teacher = registry.get("maths")
+    monkeypatch.setenv("LLM_MODEL", "model-b")
+    assert registry.get("maths") is teacher
+    assert builds == [("model-a", "test-key")]
+
+
+def test_reload_swaps_in_new_teachers(monkeypatch):
+    registry, builds = make_registry(monkeypatch)
+    monkeypatch.setenv("LLM_MODEL", "model-a")
+    registry.start()
+    teacher = registry.get("physics")
+    monkeypatch.setenv("LLM_MODEL", "model-b")
+    registry.reload()
+    assert builds[-1] == ("model-b", "test-key")
+    assert registry.get("physics") is not teacher
+
+
+def test_unknown_subject_falls_back_to_default(monkeypatch):
+    registry, _ = make_registry(monkeypatch)
+    registry.start()
+    assert registry.get("Biology") is registry.get(DEFAULT_SUBJECT)